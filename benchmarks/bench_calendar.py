@@ -0,0 +1,90 @@
+"""
+Benchmark for deriving one week's availability from a large .ics export.
+
+Usage:
+    python -m benchmarks.bench_calendar [--years 20] [--events-per-day 8] [--recurring 200]
+"""
+
+import time
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from scripts.calendar_intake import CalendarEnricher, CalendarIndex
+
+SUMMARIES = ['打ち合わせ', '歯医者', '出張', '飲み会', '来客2名', '買い物', '習い事', '外食']
+
+
+def write_calendar(path: Path, years: int, events_per_day: int, recurring: int, seed: int = 0) -> int:
+    rng = np.random.default_rng(seed)
+    start = date.today() - timedelta(days=365 * years)
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='\r\n') as f:
+        f.write("BEGIN:VCALENDAR\nVERSION:2.0\nPRODID:-//bench//EN\n")
+        for i in range(recurring):
+            day = start + timedelta(days=int(rng.integers(0, 365 * years)))
+            until = '' if i % 4 == 0 else f";UNTIL={(day + timedelta(days=365)).strftime('%Y%m%d')}T000000Z"
+            f.write(f"BEGIN:VEVENT\nUID:r{i}\nDTSTART;TZID=Asia/Tokyo:{day.strftime('%Y%m%d')}T190000\n"
+                    f"DURATION:PT1H\nRRULE:FREQ=WEEKLY{until}\nSUMMARY:{SUMMARIES[i % len(SUMMARIES)]}\n"
+                    "END:VEVENT\n")
+            count += 1
+        for offset in range(365 * years + 30):
+            day = (start + timedelta(days=offset)).strftime('%Y%m%d')
+            for hour in rng.integers(7, 22, events_per_day):
+                f.write(f"BEGIN:VEVENT\nUID:e{count}\nDTSTART;TZID=Asia/Tokyo:{day}T{hour:02d}0000\n"
+                        f"DTEND;TZID=Asia/Tokyo:{day}T{hour:02d}3000\n"
+                        f"SUMMARY:{SUMMARIES[int(rng.integers(0, len(SUMMARIES)))]}\n"
+                        "DESCRIPTION:ベンチマーク用の予定です。\nEND:VEVENT\n")
+                count += 1
+        f.write("END:VCALENDAR\n")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark calendar availability lookups")
+    parser.add_argument('--years', type=int, default=20)
+    parser.add_argument('--events-per-day', type=int, default=8)
+    parser.add_argument('--recurring', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'calendar.ics'
+        events = write_calendar(path, args.years, args.events_per_day, args.recurring)
+        print(f"{events} events, {path.stat().st_size / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        index = CalendarIndex(path)
+        print(f"Index built in {time.perf_counter() - start:.2f}s")
+
+        enricher = CalendarEnricher([str(path)])
+        week_start = date.today() - timedelta(days=date.today().weekday())
+        enricher.availability(week_start)  # Builds the cached index
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            availability = enricher.availability(week_start)
+            timings.append(time.perf_counter() - start)
+
+        # Memory is measured in a separate pass, tracing slows everything down
+        tracemalloc.start()
+        CalendarIndex(path)
+        _, build_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        enricher.availability(week_start)
+        _, query_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        candidates = sum(1 for _ in index.candidates(week_start - timedelta(days=1), week_start + timedelta(days=7)))
+        print(f"Week of {week_start}: {candidates} candidate events, "
+              f"{np.median(timings) * 1000:.1f} ms (median of {args.repeat})")
+        print(f"Peak memory: index build {build_peak / 1e6:.1f} MB, week query {query_peak / 1e6:.2f} MB")
+        print(f"away_days={availability.away_days} guests_expected={availability.guests_expected}")
+
+
+if __name__ == "__main__":
+    main()
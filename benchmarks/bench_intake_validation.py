@@ -0,0 +1,64 @@
+"""
+Throughput benchmark for bulk intake validation.
+
+Compares the per-file path used by MenuGenerator.load_intake_data
+(json.loads followed by IntakeData(**data)) with streaming JSONL validation
+through the cached TypeAdapter.
+
+Usage:
+    python -m benchmarks.bench_intake_validation [--records 100000]
+"""
+
+import io
+import json
+import time
+import argparse
+
+from schemas.intake_schema import IntakeData, EXAMPLE_INTAKE
+from schemas.intake_validation import iter_intake_lines
+
+
+def build_records(count: int) -> bytes:
+    """JSONL payload with a small fraction of invalid records"""
+    lines = []
+    for i in range(count):
+        record = dict(EXAMPLE_INTAKE, user_id=f"U{i:09d}", conversation_id=f"conv_{i}")
+        if i % 100 == 0:
+            record['days_needed'] = 9  # Out of range
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def bench_dict_path(payload: bytes) -> int:
+    valid = 0
+    for line in io.BytesIO(payload):
+        try:
+            IntakeData(**json.loads(line))
+            valid += 1
+        except ValueError:
+            pass
+    return valid
+
+
+def bench_streaming(payload: bytes) -> int:
+    return sum(1 for result in iter_intake_lines(io.BytesIO(payload)) if result.ok)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk intake validation")
+    parser.add_argument('--records', type=int, default=100_000)
+    args = parser.parse_args()
+
+    payload = build_records(args.records)
+    print(f"{args.records} records, {len(payload) / 1e6:.1f} MB")
+
+    for name, func in [('json.loads + IntakeData(**data)', bench_dict_path),
+                       ('TypeAdapter.validate_json (streaming)', bench_streaming)]:
+        start = time.perf_counter()
+        valid = func(payload)
+        elapsed = time.perf_counter() - start
+        print(f"{name:40s} {elapsed:6.2f}s  {args.records / elapsed:>10,.0f} records/s  ({valid} valid)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark for batch nutrition scoring of many household-weeks.
+
+Usage:
+    python -m benchmarks.bench_nutrition [--weeks 1000] [--recipes 50000] [--ingredients 2000]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from benchmarks.bench_pantry_optimizer import build_catalog
+from scripts.nutrition import FoodComposition, NutritionScorer
+
+SOURCES = ['魚', '肉', '豆腐・大豆製品', '卵']
+GROUPS = SOURCES + ['野菜', '穀類', '調味料']
+
+
+def build_composition(ingredients: int, seed: int = 0) -> FoodComposition:
+    rng = np.random.default_rng(seed)
+    return FoodComposition([
+        {
+            'name': f"食材{j}",
+            'group': GROUPS[j % len(GROUPS)],
+            'energy': float(rng.uniform(20, 400)),
+            'protein': float(rng.uniform(0, 25)),
+            'fat': float(rng.uniform(0, 30)),
+            'carbohydrate': float(rng.uniform(0, 70)),
+        }
+        for j in range(ingredients)
+    ])
+
+
+def build_week_plans(weeks: int, recipes: int, dishes_per_day: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    plans = []
+    for _ in range(weeks):
+        plan = []
+        for d in range(7):
+            names = [f"料理{r}" for r in rng.integers(0, recipes, dishes_per_day)]
+            if rng.random() < 0.1:
+                names = ['外食・外泊']
+            plan.append({'date': '', 'day': '', 'meals': {'夕食': [{'name': n, 'cooking_time': 20} for n in names]}})
+        plans.append(plan)
+    return plans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch nutrition scoring")
+    parser.add_argument('--weeks', type=int, default=1_000)
+    parser.add_argument('--recipes', type=int, default=50_000)
+    parser.add_argument('--ingredients', type=int, default=2_000)
+    parser.add_argument('--dishes-per-day', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.recipes, args.ingredients)
+    composition = build_composition(args.ingredients)
+
+    start = time.perf_counter()
+    scorer = NutritionScorer(catalog, composition, SOURCES, staple='食材5', staple_grams=150,
+                             min_vegetable_grams=120)
+    print(f"Recipe matrices for {len(catalog)} recipes built in {time.perf_counter() - start:.2f}s")
+
+    plans = build_week_plans(args.weeks, args.recipes, args.dishes_per_day)
+    encode_timings, score_timings = [], []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        encoded = scorer.encode(plans)
+        encode_timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        result = scorer.score_encoded(*encoded)
+        score_timings.append(time.perf_counter() - start)
+
+    encode_ms = np.median(encode_timings) * 1000
+    score_ms = np.median(score_timings) * 1000
+    print(f"{args.weeks} weeks: encode {encode_ms:.1f} ms, score {score_ms:.1f} ms (median of {args.repeat})")
+    print(f"Imbalanced weeks: {int(result.imbalanced.sum())}/{args.weeks}")
+    for name, flag in result.flags.items():
+        print(f"  {name}: {int(flag.sum())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark for pantry-aware dish selection on a large synthetic catalog.
+
+Usage:
+    python -m benchmarks.bench_pantry_optimizer [--recipes 50000] [--ingredients 2000]
+"""
+
+import time
+import argparse
+from datetime import date
+
+import numpy as np
+
+from scripts.recipe_catalog import RecipeCatalog
+from scripts.pantry_optimizer import PantryOptimizer
+
+
+def build_catalog(recipes: int, ingredients: int, seed: int = 0) -> RecipeCatalog:
+    rng = np.random.default_rng(seed)
+    categories = ['和食', '洋食', '中華', 'その他']
+    # Zipf-like ingredient popularity, as in real recipe collections
+    popularity = 1.0 / np.arange(1, ingredients + 1)
+    popularity /= popularity.sum()
+
+    records = []
+    for i in range(recipes):
+        count = int(rng.integers(3, 12))
+        chosen = rng.choice(ingredients, size=count, replace=False, p=popularity)
+        records.append({
+            'name': f"料理{i}",
+            'category': categories[i % len(categories)],
+            'cooking_time': int(rng.integers(10, 120)),
+            'ingredients': [{'name': f"食材{j}", 'quantity': 100, 'unit': 'g'} for j in chosen],
+        })
+    return RecipeCatalog(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pantry optimizer")
+    parser.add_argument('--recipes', type=int, default=50_000)
+    parser.add_argument('--ingredients', type=int, default=2_000)
+    parser.add_argument('--pantry', type=int, default=40, help="Items in stock")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = build_catalog(args.recipes, args.ingredients)
+    print(f"Catalog: {len(catalog)} recipes, {catalog.ingredient_count} ingredients, "
+          f"{catalog.indices.size} entries (built in {time.perf_counter() - start:.2f}s)")
+
+    rng = np.random.default_rng(1)
+    pantry = [{'name': f"食材{j}", 'quantity': 1} for j in rng.choice(args.ingredients // 4, args.pantry, replace=False)]
+    avoid = [f"食材{j}" for j in (3, 17, 42)]
+    optimizer = PantryOptimizer(catalog)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        hints = optimizer.suggest(pantry, days=7, avoid_ingredients=avoid, max_cooking_time=45,
+                                  week_start=date(2024, 1, 15))
+        timings.append(time.perf_counter() - start)
+
+    timings_ms = np.array(timings) * 1000
+    print(f"Solve one week: median {np.median(timings_ms):.1f} ms, max {timings_ms.max():.1f} ms")
+    for hint in hints:
+        print(f"  {hint['name']}: {len(hint['pantry_ingredients'])} pantry ingredients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for building the recipe link index and looking up a week's dishes.
+
+Usage:
+    python -m benchmarks.bench_recipe_links [--recipes 1000000] [--dishes 21]
+"""
+
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from scripts.recipe_links import RecipeLinkIndex
+
+SITES = ['cookpad.com', 'kurashiru.com', 'recipe.rakuten.co.jp', 'delishkitchen.tv', 'orangepage.net']
+PREFIXES = ['簡単', '絶品', '時短', '基本の', 'やみつき', 'レンジで', '作り置き', 'ヘルシー', 'ご飯がすすむ', '']
+INGREDIENTS = ['鶏肉', '豚肉', '牛肉', '鮭', 'さば', '豆腐', '卵', 'キャベツ', '玉ねぎ', 'じゃがいも', 'なす',
+               'ほうれん草', 'ブロッコリー', '大根', 'にんじん', 'きのこ', 'ピーマン', 'かぼちゃ', 'ごぼう', '白菜']
+DISHES = ['炒め', '煮物', '照り焼き', '唐揚げ', 'サラダ', '味噌汁', 'グラタン', 'カレー', '南蛮漬け', 'おひたし',
+          'ハンバーグ', 'ムニエル', '生姜焼き', 'きんぴら', '豚汁', '餃子', '肉じゃが', '親子丼', 'チャーハン', '春巻き']
+
+
+def write_export(path: Path, recipes: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    prefixes = rng.integers(0, len(PREFIXES), recipes)
+    first = rng.integers(0, len(INGREDIENTS), recipes)
+    second = rng.integers(0, len(INGREDIENTS), recipes)
+    dishes = rng.integers(0, len(DISHES), recipes)
+    sites = rng.integers(0, len(SITES), recipes)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(recipes):
+            title = f"{PREFIXES[prefixes[i]]}{INGREDIENTS[first[i]]}と{INGREDIENTS[second[i]]}の{DISHES[dishes[i]]}"
+            f.write(json.dumps({'url': f"https://{SITES[sites[i]]}/recipe/{i}", 'title': title},
+                               ensure_ascii=False) + '\n')
+
+
+def week_dishes(count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    names = [f"{INGREDIENTS[rng.integers(len(INGREDIENTS))]}の{DISHES[rng.integers(len(DISHES))]}"
+             for _ in range(count - 3)]
+    return names + ['肉じゃが', '豚汁', '存在しない料理']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recipe link index")
+    parser.add_argument('--recipes', type=int, default=1_000_000)
+    parser.add_argument('--dishes', type=int, default=21)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        export_path = Path(tmp) / 'recipes.jsonl'
+        index_path = Path(tmp) / 'recipe_links.sqlite3'
+        write_export(export_path, args.recipes)
+
+        start = time.perf_counter()
+        count = RecipeLinkIndex.build([export_path], index_path)
+        print(f"Indexed {count} recipes in {time.perf_counter() - start:.1f}s, "
+              f"{index_path.stat().st_size / 1e6:.0f} MB")
+
+        index = RecipeLinkIndex(index_path)
+        dishes = week_dishes(args.dishes)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            links = index.lookup(dishes, SITES[:3])
+            timings.append(time.perf_counter() - start)
+        print(f"{len(dishes)} dishes: {len(links)} linked in {np.median(timings) * 1000:.1f} ms "
+              f"(median of {args.repeat}, one query)")
+        for dish in dishes[:3] + dishes[-3:]:
+            link = links.get(dish)
+            print(f"  {dish}: {f'{link.title} <{link.url}>' if link else 'no match'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -43,12 +43,6 @@ class IntakeData(BaseModel):
     # Metadata
     user_id: Optional[str] = Field(None, description="Slack user ID who provided this intake")
     conversation_id: Optional[str] = Field(None, description="Dify conversation ID")
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat(),
-            date: lambda v: v.isoformat()
-        }
 
 
 class DifySlotData(BaseModel):
@@ -0,0 +1,72 @@
+"""
+Bulk and streaming validation of intake data.
+
+Intakes are validated straight from JSON bytes with a cached pydantic
+TypeAdapter, skipping the intermediate dict that json.load would build.
+JSONL sources are streamed line by line and invalid lines are reported as
+structured errors instead of aborting the batch.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from schemas.intake_schema import IntakeData
+
+
+class IntakeLineResult(NamedTuple):
+    """Validation outcome for one JSONL line"""
+
+    line: int
+    intake: Optional[IntakeData]
+    errors: Optional[List[Dict[str, Any]]]
+
+    @property
+    def ok(self) -> bool:
+        return self.errors is None
+
+
+@lru_cache(maxsize=None)
+def intake_adapter() -> TypeAdapter:
+    """Shared TypeAdapter for IntakeData (building one compiles the validator)"""
+    return TypeAdapter(IntakeData)
+
+
+def format_errors(error: ValidationError) -> List[Dict[str, Any]]:
+    """JSON-serializable error details without documentation URLs"""
+    return [
+        {
+            'type': e['type'],
+            'loc': list(e['loc']),
+            'msg': e['msg'],
+        }
+        for e in error.errors(include_url=False)
+    ]
+
+
+def validate_intake_json(data: Union[str, bytes]) -> IntakeData:
+    """Validate one intake JSON document"""
+    return intake_adapter().validate_json(data)
+
+
+def iter_intake_lines(lines: Iterable[bytes]) -> Iterator[IntakeLineResult]:
+    """Validate an iterable of JSONL lines, yielding one result per non-blank line"""
+    adapter = intake_adapter()
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield IntakeLineResult(line_number, adapter.validate_json(line), None)
+        except ValidationError as e:
+            yield IntakeLineResult(line_number, None, format_errors(e))
+
+
+def iter_intakes_jsonl(source: Union[str, Path, BinaryIO]) -> Iterator[IntakeLineResult]:
+    """Stream-validate a JSONL file of intakes with constant memory"""
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            yield from iter_intake_lines(f)
+    else:
+        yield from iter_intake_lines(source)
@@ -0,0 +1,138 @@
+"""
+Schema definitions for config/rules.yaml.
+Every section is optional; a missing section means the feature is disabled
+and its fields take the defaults below. Unknown keys are rejected so a typo
+fails when the file is loaded instead of being silently ignored.
+"""
+
+from typing import Annotated, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+Weekday = Annotated[int, Field(ge=0, le=6)]
+TimeOfDay = Annotated[str, Field(pattern=r'^\d{2}:\d{2}$')]  # Quoted in YAML, 18:00 unquoted is a number
+
+
+class RulesSection(BaseModel):
+    """Base for rules.yaml sections"""
+
+    model_config = ConfigDict(extra='forbid')
+
+
+class DefaultSettings(RulesSection):
+    """Menu settings used when no intake.json is available"""
+
+    days_needed: int = Field(default=7, ge=1, le=7, description="Number of days to generate meals for")
+    away_days: List[Weekday] = Field(default=[], description="Days when no meals are needed (0=Monday, 6=Sunday)")
+    avoid_ingredients: List[str] = Field(default=[], description="Ingredients to avoid")
+    max_cooking_time: int = Field(default=60, ge=10, le=180, description="Maximum cooking time in minutes")
+    priority_recipe_sites: List[str] = Field(default=[], description="Preferred recipe sites in order of priority")
+    dietary_preferences: List[str] = Field(default=[], description="vegetarian, vegan, gluten-free, etc.")
+
+
+class MealType(RulesSection):
+    name: str
+    enabled: bool = False
+
+
+class RecipePreferences(RulesSection):
+    cuisine_types: List[str] = Field(default=[])
+    difficulty_level: Literal['easy', 'medium', 'hard'] = 'medium'
+    variety_preference: Literal['low', 'medium', 'high'] = 'high'
+
+
+class NutritionRules(RulesSection):
+    """Balance check against a local food composition table (scripts/nutrition.py)"""
+
+    consider_balance: bool = False
+    protein_sources: List[str] = Field(default=[])
+    vegetable_emphasis: bool = False
+    composition_table: str = 'data/food_composition.json'
+    staple: Optional[str] = Field(None, description="Served with every cooked meal, not listed in recipes")
+    staple_grams: float = Field(default=0, ge=0)
+    energy_ratio: Dict[Literal['protein', 'fat', 'carbohydrate'], Tuple[float, float]] = Field(
+        default={}, description="Share of energy per serving, percent")
+    max_same_protein_days: int = Field(default=2, ge=1)
+    min_vegetable_grams: float = Field(default=0, ge=0, description="Per serving per meal")
+    max_regenerations: int = Field(default=0, ge=0)
+
+
+class RecipeLinksRules(RulesSection):
+    """Local recipe link index built from the priority sites' sitemaps (scripts/recipe_links.py)"""
+
+    enabled: bool = False
+    path: str = 'data/recipe_links.sqlite3'
+
+
+class PantryRules(RulesSection):
+    enabled: bool = False
+    path: str = 'data/pantry.json'
+    max_hints: int = Field(default=7, ge=0)
+
+
+class ShoppingListRules(RulesSection):
+    enabled: bool = False
+    household_size: int = Field(default=2, ge=1, description="Servings per meal before guests_expected is added")
+
+
+class HistoryRules(RulesSection):
+    enabled: bool = False
+    path: str = 'data/history'
+    avoid_recent_weeks: int = Field(default=0, ge=0)
+
+
+class ReuseRules(RulesSection):
+    enabled: bool = False
+    min_similarity: float = Field(default=0.7, ge=0, le=1)
+    max_entries: int = Field(default=500, ge=1)
+    max_repaired_fraction: float = Field(default=0.3, ge=0, le=1, description="Share of dishes repair may replace")
+    stats_path: str = 'data/reuse_stats.json'
+    spelling_variants: Dict[str, List[str]] = Field(default={}, description="canonical: [variants]")
+
+
+class CalendarRules(RulesSection):
+    enabled: bool = False
+    path: str = 'data/calendar.ics'
+    paths: Optional[List[str]] = Field(None, description="Several calendars, replaces path")
+    timezone: str = 'Asia/Tokyo'
+    away_keywords: Optional[List[str]] = None
+    guest_keywords: Optional[List[str]] = None
+    default_guests: int = Field(default=1, ge=0)
+    meal_window: Tuple[TimeOfDay, TimeOfDay] = Field(default=('18:00', '21:00'))
+
+
+class SpeculativeRules(RulesSection):
+    enabled: bool = False
+    path: str = 'data/speculative'
+
+
+class SpecialRules(RulesSection):
+    avoid_consecutive_similar: bool = False
+    weekend_special: bool = False
+    prep_time_consideration: bool = False
+
+
+class RulesConfig(RulesSection):
+    """Main structure of config/rules.yaml"""
+
+    default_settings: DefaultSettings = Field(default_factory=DefaultSettings)
+    meal_types: List[MealType] = Field(default=[])
+    recipe_preferences: RecipePreferences = Field(default_factory=RecipePreferences)
+    nutrition: NutritionRules = Field(default_factory=NutritionRules)
+    recipe_catalog: Optional[str] = Field(None, description="Local recipe catalog with ingredient amounts")
+    recipe_links: RecipeLinksRules = Field(default_factory=RecipeLinksRules)
+    pantry: PantryRules = Field(default_factory=PantryRules)
+    shopping_list: ShoppingListRules = Field(default_factory=ShoppingListRules)
+    history: HistoryRules = Field(default_factory=HistoryRules)
+    reuse: ReuseRules = Field(default_factory=ReuseRules)
+    calendar: CalendarRules = Field(default_factory=CalendarRules)
+    speculative: SpeculativeRules = Field(default_factory=SpeculativeRules)
+    special_rules: SpecialRules = Field(default_factory=SpecialRules)
+
+    @model_validator(mode='before')
+    @classmethod
+    def drop_empty_sections(cls, data):
+        """A section with no keys ("pantry:") is the same as a missing one"""
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if value is not None}
+        return data
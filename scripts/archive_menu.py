@@ -4,28 +4,54 @@ Archive previous week's menu pages in Notion
 
 import os
 import sys
+import argparse
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 from notion_client import Client
 
+from scripts.cassette import Cassette
+from scripts.deadline import RunDeadline
+from scripts.notion_mirror import NotionMenuMirror, page_week_start
+from scripts.profiling import add_profile_argument, enable_profiling, finish_profiling, profiled
+
+# Archiving is low priority: skip it rather than push the job past its deadline
+MIN_ARCHIVE_BUDGET = 60  # seconds needed to start archiving
+MIN_UPDATE_BUDGET = 5    # seconds needed to start one more page update
+
 
 class NotionArchiver:
-    def __init__(self):
-        notion_token = os.getenv('NOTION_TOKEN')
-        if not notion_token:
-            raise ValueError("NOTION_TOKEN environment variable is required")
-            
-        self.notion = Client(auth=notion_token)
-        self.database_id = os.getenv('NOTION_DATABASE_ID')
+    def __init__(self, deadline: Optional[RunDeadline] = None, notion_client: Optional[Client] = None,
+                 database_id: Optional[str] = None, mirror_path: Optional[str] = None):
+        self.deadline = deadline or RunDeadline.from_env()
+        cassette = Cassette.from_env()
+        if notion_client is None and not cassette.replaying:
+            notion_token = os.getenv('NOTION_TOKEN')
+            if not notion_token:
+                raise ValueError("NOTION_TOKEN environment variable is required")
+            notion_client = Client(auth=notion_token, timeout_ms=int(self.deadline.timeout(30) * 1000))
+        self.notion = cassette.wrap('notion', notion_client)
+        self.database_id = database_id or os.getenv('NOTION_DATABASE_ID')
         if not self.database_id:
             raise ValueError("NOTION_DATABASE_ID environment variable is required")
+        
+        retry = self.deadline.retry_with_backoff
+        if mirror_path:
+            self.mirror = NotionMenuMirror(self.notion, self.database_id, path=mirror_path, retry=retry)
+        else:
+            self.mirror = NotionMenuMirror.from_env(self.notion, self.database_id, retry=retry)
+    
+    def get_cutoff_date(self) -> str:
+        """Pages with a Week Start before this date are archived"""
+        # Get date two weeks ago to archive old pages
+        return (datetime.now() - timedelta(weeks=2)).date().isoformat()
     
     def get_previous_week_pages(self):
         """Find pages from previous weeks that should be archived"""
-        # Get date two weeks ago to archive old pages
-        cutoff_date = (datetime.now() - timedelta(weeks=2)).date().isoformat()
+        cutoff_date = self.get_cutoff_date()
         
         try:
-            response = self.notion.databases.query(
+            pages = []
+            query = dict(
                 database_id=self.database_id,
                 filter={
                     "and": [
@@ -44,17 +70,24 @@ class NotionArchiver:
                     ]
                 }
             )
+            while True:
+                response = self.notion.databases.query(**query)
+                pages.extend(response['results'])
+                if not response.get('has_more'):
+                    break
+                query['start_cursor'] = response['next_cursor']
             
-            return response['results']
+            return pages
             
         except Exception as e:
             print(f"Error querying old pages: {e}")
             return []
     
-    def update_page_status(self, page_id: str, status: str = "Archived"):
-        """Update page status to archived"""
+    @profiled('notion_write')
+    def update_page_status(self, page_id: str, status: str = "Archived") -> bool:
+        """Update page status to archived; returns whether the update succeeded"""
         try:
-            self.notion.pages.update(
+            response = self.notion.pages.update(
                 page_id=page_id,
                 properties={
                     "Status": {
@@ -64,14 +97,40 @@ class NotionArchiver:
                     }
                 }
             )
+            if self.mirror:
+                self.mirror.record_page(response)
             print(f"Updated page {page_id} status to {status}")
+            return True
             
         except Exception as e:
+            if getattr(e, 'code', None) == 'object_not_found':
+                # Deleted in Notion: the mirror would otherwise return it on every run
+                print(f"Page {page_id} no longer exists in Notion")
+                if self.mirror:
+                    self.mirror.remove_page(page_id)
+                return False
             print(f"Error updating page {page_id}: {e}")
+            return False
+    
+    @profiled('notion_lookup')
+    def get_pages_to_archive(self) -> List[Tuple[str, str]]:
+        """(page_id, week_start) pairs to archive, from the mirror when enabled"""
+        if self.mirror:
+            try:
+                self.mirror.sync()
+                return self.mirror.pages_before(self.get_cutoff_date())
+            except Exception as e:
+                print(f"Notion mirror unavailable, querying Notion directly: {e}")
+        
+        return [(page['id'], page_week_start(page) or 'Unknown') for page in self.get_previous_week_pages()]
     
     def archive_old_menus(self):
         """Archive old menu pages"""
-        old_pages = self.get_previous_week_pages()
+        if not self.deadline.has_budget(MIN_ARCHIVE_BUDGET):
+            print(f"Skipping archive: only {self.deadline.remaining():.0f}s left in the run budget")
+            return
+        
+        old_pages = self.get_pages_to_archive()
         
         if not old_pages:
             print("No old pages found to archive")
@@ -79,19 +138,29 @@ class NotionArchiver:
         
         print(f"Found {len(old_pages)} old pages to archive")
         
-        for page in old_pages:
-            page_id = page['id']
-            # Get week start for logging
-            week_start = page['properties'].get('Week Start', {}).get('date', {}).get('start', 'Unknown')
+        archived = 0
+        for position, (page_id, week_start) in enumerate(old_pages):
+            if not self.deadline.has_budget(MIN_UPDATE_BUDGET):
+                # Remaining pages still match the query and are picked up next run
+                print(f"Run budget exhausted, deferring {len(old_pages) - position} pages to the next run")
+                break
+            
             print(f"Archiving page for week {week_start}")
             
-            self.update_page_status(page_id, "Archived")
+            if self.update_page_status(page_id, "Archived"):
+                archived += 1
         
-        print(f"Successfully archived {len(old_pages)} old menu pages")
+        print(f"Successfully archived {archived} old menu pages")
 
 
 def main():
     """Main function to archive old menu pages"""
+    parser = argparse.ArgumentParser(description="Archive menu pages of past weeks in Notion")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'archive_menu')
+    
     try:
         archiver = NotionArchiver()
         archiver.archive_old_menus()
@@ -99,6 +168,8 @@ def main():
     except Exception as e:
         print(f"Error archiving old menus: {e}")
         sys.exit(1)
+    finally:
+        finish_profiling()
 
 
 if __name__ == "__main__":
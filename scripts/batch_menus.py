@@ -0,0 +1,338 @@
+"""
+Offline batch generation of the weekly menus of every tenant.
+
+Instead of one synchronous chat completion per household and meal type,
+every prompt is rendered into a JSONL request file and submitted to the
+OpenAI Batch API, which has its own (much larger) queue limits and costs
+less. The run then polls the batch and fans the results back into each
+tenant's generated_menu.json and Notion database.
+
+Progress is kept in <work-dir>/state.json after every step, so a run that
+is interrupted, or stops because the batch is still in progress when the
+run deadline is reached, continues where it left off when started again:
+the batch is not resubmitted, downloaded results are reused and tenants
+already published are skipped. The week, intake and settings each tenant's
+prompts were rendered with are kept in the state too, so menus are saved
+for that week even when the batch finishes after the week has turned or
+the household has submitted a new intake in the meantime.
+
+The state belongs to one week: a run for a later week, or after the
+previous batch is done, starts a new batch instead of resuming.
+
+Nutrition-driven regeneration (nutrition.max_regenerations) is not applied
+in batch mode; the assessment is still recorded with each menu.
+
+Usage:
+    python -m scripts.batch_menus [--tenants config/tenants.yaml] [--work-dir data/batch] [--poll-interval 60]
+                                  [--week-start 2024-01-15]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from openai import OpenAI
+from notion_client import Client
+
+from schemas.intake_validation import intake_adapter
+from scripts.cassette import Cassette
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+from scripts.notion_update import NotionMenuUpdater
+from scripts.profiling import add_profile_argument, enable_profiling, finish_profiling, profiled
+from scripts.rate_limit import NOTION_REQUESTS_PER_SECOND, RateLimitedProxy, RateLimiter
+from scripts.tenants import DEFAULT_TENANTS_PATH, Tenant, TenantRegistry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+COMPLETION_WINDOW = '24h'
+FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+def custom_id(tenant_id: str, meal_type: str) -> str:
+    return f"{tenant_id}/{meal_type}"
+
+
+class BatchMenuRunner:
+    def __init__(self, tenants: List[Tenant], deadline: Optional[RunDeadline] = None, openai_client=None,
+                 notion_factory: Optional[Callable[[Tenant], object]] = None, work_dir: str = 'data/batch',
+                 poll_interval: float = 60, sleep: Callable[[float], None] = time.sleep,
+                 week_start: Optional[date] = None):
+        self.logger = logging.getLogger(__name__)
+        self.tenants = {tenant.id: tenant for tenant in tenants}
+        if week_start is None:
+            # Current week's Monday, as generate_menu defaults to
+            today = datetime.now().date()
+            week_start = today - timedelta(days=today.weekday())
+        self.week_start = week_start
+        self.deadline = deadline or RunDeadline.from_env()
+        cassette = Cassette.from_env()
+        if openai_client is None and not cassette.replaying:
+            openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # Tenant generators get the plain client, which they wrap themselves
+        self.generator_client = openai_client
+        self.openai_client = cassette.wrap('openai', openai_client)
+        self.notion_factory = notion_factory or default_notion_factory
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.requests_path = self.work_dir / 'requests.jsonl'
+        self.results_path = self.work_dir / 'results.jsonl'
+        self.state_path = self.work_dir / 'state.json'
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+        self._notion_clients: Dict[str, object] = {}
+        self.state = self.load_state()
+
+    def _retry_with_backoff(self, func, max_retries=3, base_delay=2):
+        """Execute function with exponential backoff retry bounded by the run deadline"""
+        return self.deadline.retry_with_backoff(func, max_retries, base_delay, logger=self.logger)
+
+    def load_state(self) -> Dict:
+        """Saved progress of an unfinished batch for this week, otherwise a new state"""
+        if not self.state_path.exists():
+            return {'published': {}, 'failed': {}}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('stage') == 'done' or state.get('week_start', '') < self.week_start.isoformat():
+            self.logger.info(f"Starting a new batch for week {self.week_start} (saved batch: week "
+                             f"{state.get('week_start', 'unknown')}, {state.get('stage', 'not prepared')})")
+            return {'published': {}, 'failed': {}}
+        return state
+
+    def save_state(self):
+        tmp_path = self.state_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def generator(self, tenant: Tenant) -> MenuGenerator:
+        return MenuGenerator(deadline=self.deadline, openai_client=self.generator_client,
+                             intake_path=str(tenant.intake_path), user_id=tenant.user_id,
+                             week_start=self.week_start, rules_override=tenant.rules_path)
+
+    def prepared_generator(self, tenant: Tenant) -> MenuGenerator:
+        """Generator for the week, intake and settings the tenant's requests were prepared with"""
+        prepared = self.state.get('prepared', {}).get(tenant.id)
+        if prepared is None:  # State saved before the prepared settings were recorded
+            return self.generator(tenant)
+        intake = intake_adapter().validate_python(prepared['intake']) if prepared['intake'] is not None else None
+        return MenuGenerator(deadline=self.deadline, openai_client=self.generator_client, intake_data=intake,
+                             intake_path=None, user_id=tenant.user_id, rules_override=tenant.rules_path,
+                             week_start=date.fromisoformat(prepared['week_start']), settings=prepared['settings'])
+
+    # Steps
+
+    @profiled('batch_prepare')
+    def prepare(self) -> int:
+        """Render every tenant's prompts into the batch request file; returns the number of requests"""
+        count = 0
+        prepared = {}
+        tmp_path = self.requests_path.with_suffix('.jsonl.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for tenant in self.tenants.values():
+                generator = self.generator(tenant)
+                settings = generator.get_menu_settings()
+                intake = generator.intake_data
+                prepared[tenant.id] = {'week_start': generator.get_week_start().isoformat(), 'settings': settings,
+                                       'intake': intake.model_dump(mode='json') if intake is not None else None}
+                for meal_type in generator.get_meal_types():
+                    request = {
+                        'custom_id': custom_id(tenant.id, meal_type),
+                        'method': 'POST',
+                        'url': BATCH_ENDPOINT,
+                        'body': generator.menu_request(generator.create_menu_prompt(settings, meal_type)),
+                    }
+                    f.write(json.dumps(request, ensure_ascii=False) + '\n')
+                    count += 1
+        os.replace(tmp_path, self.requests_path)
+
+        self.state.update(stage='prepared', week_start=self.week_start.isoformat(), requests=count,
+                          tenants=list(self.tenants), prepared=prepared)
+        self.save_state()
+        self.logger.info(f"Wrote {count} batch requests for {len(self.tenants)} tenants to {self.requests_path}")
+        return count
+
+    @profiled('batch_submit')
+    def submit(self) -> str:
+        """Upload the request file and create the batch; returns the batch id"""
+        with open(self.requests_path, 'rb') as f:
+            input_file = self._retry_with_backoff(lambda: self.openai_client.files.create(file=f, purpose='batch'))
+        batch = self._retry_with_backoff(lambda: self.openai_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=COMPLETION_WINDOW,
+        ))
+
+        self.state.update(stage='submitted', input_file_id=input_file.id, batch_id=batch.id, batch_status=batch.status)
+        self.save_state()
+        self.logger.info(f"Submitted batch {batch.id} ({self.state['requests']} requests)")
+        return batch.id
+
+    def poll(self) -> bool:
+        """Wait for the batch while the run deadline allows; returns whether it reached a final status"""
+        while True:
+            batch = self._retry_with_backoff(lambda: self.openai_client.batches.retrieve(self.state['batch_id']))
+            self.state.update(batch_status=batch.status, output_file_id=batch.output_file_id,
+                              error_file_id=getattr(batch, 'error_file_id', None))
+            self.save_state()
+            if batch.status in FINAL_STATUSES:
+                self.logger.info(f"Batch {batch.id} {batch.status}")
+                return True
+
+            counts = getattr(batch, 'request_counts', None)
+            progress = f" ({counts.completed}/{counts.total})" if counts is not None else ''
+            if not self.deadline.has_budget(self.poll_interval):
+                self.logger.info(f"Batch {batch.id} still {batch.status}{progress}; run again to resume")
+                return False
+            self.logger.info(f"Batch {batch.id} {batch.status}{progress}, checking again in {self.poll_interval}s")
+            self.sleep(self.poll_interval)
+
+    @profiled('batch_download')
+    def download(self):
+        """Save the batch output (and errors) to the results file"""
+        lines = []
+        for file_id in (self.state.get('output_file_id'), self.state.get('error_file_id')):
+            if file_id:
+                content = self._retry_with_backoff(lambda: self.openai_client.files.content(file_id))
+                lines.extend(line for line in content.text.splitlines() if line.strip())
+
+        tmp_path = self.results_path.with_suffix('.jsonl.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(line + '\n' for line in lines))
+        os.replace(tmp_path, self.results_path)
+
+        self.state.update(stage='downloaded')
+        self.save_state()
+
+    def load_results(self) -> Dict[str, Dict[str, str]]:
+        """Menu content per tenant and meal type; failed requests are recorded in the state"""
+        contents: Dict[str, Dict[str, str]] = {}
+        with open(self.results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                result = json.loads(line)
+                tenant_id, meal_type = result['custom_id'].split('/', 1)
+                response = result.get('response') or {}
+                if result.get('error') or response.get('status_code') != 200:
+                    error = result.get('error') or response.get('body', {}).get('error') or response
+                    self.state['failed'][tenant_id] = f"{meal_type}: {error}"
+                    continue
+                content = response['body']['choices'][0]['message']['content']
+                contents.setdefault(tenant_id, {})[meal_type] = content
+        return contents
+
+    def notion_client(self, tenant: Tenant):
+        if tenant.notion_token_key not in self._notion_clients:
+            self._notion_clients[tenant.notion_token_key] = self.notion_factory(tenant)
+        return self._notion_clients[tenant.notion_token_key]
+
+    @profiled('batch_publish')
+    def publish(self) -> Dict[str, str]:
+        """Save and publish every tenant's menu not yet published; returns page ids by tenant"""
+        contents = self.load_results()
+        for tenant_id in self.state['tenants']:
+            if tenant_id in self.state['published'] or tenant_id not in self.tenants:
+                continue
+            tenant = self.tenants[tenant_id]
+            try:
+                generator = self.prepared_generator(tenant)
+                meal_types = generator.get_meal_types()
+                missing = [meal_type for meal_type in meal_types if meal_type not in contents.get(tenant_id, {})]
+                if missing:
+                    self.state['failed'].setdefault(tenant_id, f"no batch result for {', '.join(missing)}")
+                    continue
+
+                menu_content = generator.combine_menu_contents({meal_type: contents[tenant_id][meal_type]
+                                                                for meal_type in meal_types})
+                menu_data = generator.save_menu_data(menu_content, output_path=str(tenant.menu_path))
+                updater = NotionMenuUpdater(deadline=self.deadline, notion_client=self.notion_client(tenant),
+                                            database_id=tenant.notion_database_id,
+                                            mirror_path=str(tenant.mirror_path))
+                self.state['published'][tenant_id] = updater.update_menu(menu_data)
+                self.state['failed'].pop(tenant_id, None)
+                self.logger.info(f"Tenant {tenant_id}: published {self.state['published'][tenant_id]}")
+            except Exception as e:
+                self.logger.error(f"Tenant {tenant_id} failed: {e}")
+                self.state['failed'][tenant_id] = str(e)
+            finally:
+                # Saved after each tenant so a rerun never publishes a tenant twice
+                self.save_state()
+        return self.state['published']
+
+    def run(self) -> Dict:
+        """Run or resume the batch; returns the state"""
+        if 'stage' not in self.state:
+            self.prepare()
+        if 'batch_id' not in self.state:
+            self.submit()
+        if self.state['stage'] == 'submitted':
+            if not self.poll():
+                return self.state
+            if self.state['batch_status'] != 'completed' and not self.state.get('output_file_id'):
+                raise RuntimeError(f"Batch {self.state['batch_id']} {self.state['batch_status']} without results")
+            self.download()
+        self.publish()
+        self.state['stage'] = 'done' if not self.state['failed'] else 'downloaded'
+        self.save_state()
+        return self.state
+
+
+def default_notion_factory(tenant: Tenant):
+    client = Client(auth=tenant.notion_token(), timeout_ms=60000)
+    return RateLimitedProxy(client, RateLimiter(NOTION_REQUESTS_PER_SECOND))
+
+
+def main():
+    """Main function to generate all tenants' menus through the Batch API"""
+    parser = argparse.ArgumentParser(description="Generate and publish every tenant's menu through the Batch API")
+    parser.add_argument('--tenants', default=DEFAULT_TENANTS_PATH, help="Tenant registry YAML")
+    parser.add_argument('--only', nargs='+', metavar='ID', help="Run only these tenants")
+    parser.add_argument('--work-dir', default='data/batch', help="Request, result and state files")
+    parser.add_argument('--poll-interval', type=float, default=60, help="Seconds between batch status checks")
+    parser.add_argument('--restart', action='store_true', help="Discard saved progress and start a new batch")
+    parser.add_argument('--week-start', type=date.fromisoformat, help="Monday of the week (default: current week)")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'batch_menus')
+
+    try:
+        if args.restart:
+            for name in ('state.json', 'requests.jsonl', 'results.jsonl'):
+                (Path(args.work_dir) / name).unlink(missing_ok=True)
+
+        tenants = TenantRegistry.load(args.tenants).select(args.only)
+        runner = BatchMenuRunner(tenants, work_dir=args.work_dir, poll_interval=args.poll_interval,
+                                 week_start=args.week_start)
+        state = runner.run()
+
+        if state['stage'] == 'submitted':
+            print(f"Batch {state['batch_id']} is {state['batch_status']}; run again to resume")
+            return
+        for tenant_id, page_id in state['published'].items():
+            print(f"{tenant_id}: {page_id}")
+        for tenant_id, error in state['failed'].items():
+            print(f"{tenant_id}: FAILED {error}")
+        print(f"{len(state['published'])}/{len(state['tenants'])} tenants published")
+        if state['failed']:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"Error running batch: {e}")
+        sys.exit(1)
+    finally:
+        finish_profiling()
+
+
+if __name__ == "__main__":
+    main()
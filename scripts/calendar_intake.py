@@ -0,0 +1,451 @@
+"""
+Derive away_days and guests_expected from iCalendar (.ics) exports.
+
+Calendars exported from Google Calendar and others can hold many years of
+events, so they are never loaded whole. A first pass streams the file and
+records, for every VEVENT, its byte range and the date range it can affect
+(DTSTART to DTEND, or to the recurrence's UNTIL; open-ended for COUNT or
+endless rules) in compact arrays sorted by DTSTART. A week query bisects
+those arrays, then seeks to and parses only the few events that can touch
+the week; recurring events are expanded lazily up to the end of the week.
+The index is kept per file (path, size, mtime) for the life of the process.
+
+An event whose SUMMARY or CATEGORIES contains an away keyword (外泊, 出張,
+旅行, ...) marks every day whose dinner window it overlaps as an away day.
+Guest events (来客, ...) add their guest count ("来客3名", default 1) to
+the days they overlap; guests_expected is the largest daily count.
+
+Usage:
+    python -m scripts.calendar_intake --ics data/calendar.ics --week-start 2024-01-15 [--update data/intake.json]
+"""
+
+import os
+import re
+import sys
+import json
+import array
+import logging
+import argparse
+import threading
+import unicodedata
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from dateutil.rrule import rrulestr
+
+from schemas.intake_schema import IntakeData
+
+DEFAULT_TIMEZONE = 'Asia/Tokyo'
+DEFAULT_AWAY_KEYWORDS = ['外泊', '出張', '旅行', '帰省', '外食', '飲み会']
+DEFAULT_GUEST_KEYWORDS = ['来客', 'お客', 'ゲスト', 'ホームパーティ']
+DEFAULT_MEAL_WINDOW = ('18:00', '21:00')
+
+OPEN_END = 2 ** 62  # End ordinal of recurring events without UNTIL
+GUEST_COUNT_PATTERN = re.compile(r'(\d+)\s*(?:名|人|people|guests?)', re.IGNORECASE)
+UNTIL_PATTERN = re.compile(r'UNTIL=(\d{8})(T\d{6}Z?)?', re.IGNORECASE)
+DURATION_PATTERN = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+
+class CalendarAvailability(NamedTuple):
+    away_days: List[int]    # 0=Monday
+    guests_expected: int
+    events: List[str]       # Summaries of the events that contributed
+
+
+class Occurrence(NamedTuple):
+    start: datetime
+    end: datetime
+    summary: str
+    categories: str
+
+
+# Content lines
+
+def unfold(lines: Iterator[str]) -> Iterator[str]:
+    """Join folded content lines (continuations start with a space or tab)"""
+    pending = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+
+def parse_content_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Split 'NAME;PARAM=value:VALUE' into name, params and value (quoted params may contain ':')"""
+    quoted = False
+    for i, c in enumerate(line):
+        if c == '"':
+            quoted = not quoted
+        elif c == ':' and not quoted:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        return line.upper(), {}, ''
+    name, *params = head.split(';')
+    parsed = {}
+    for param in params:
+        key, _, param_value = param.partition('=')
+        parsed[key.upper()] = param_value.strip('"')
+    return name.upper(), parsed, value
+
+
+def _date_ordinal(value: str) -> Optional[int]:
+    """Ordinal of the literal date of a DATE or DATE-TIME value (time zone ignored)"""
+    try:
+        return date(int(value[0:4]), int(value[4:6]), int(value[6:8])).toordinal()
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_duration(value: str) -> timedelta:
+    match = DURATION_PATTERN.match(value.strip())
+    if not match:
+        return timedelta(0)
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                         minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
+
+
+# Index
+
+class CalendarIndex:
+    """Byte ranges of a calendar's events sorted by DTSTART, built in one streaming pass"""
+
+    _instances: Dict[Tuple[str, int, int], 'CalendarIndex'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = Path(path)
+        offsets, lengths, starts, ends = array.array('q'), array.array('q'), array.array('q'), array.array('q')
+        for offset, length, start, end in self._scan():
+            offsets.append(offset)
+            lengths.append(length)
+            starts.append(start)
+            ends.append(end)
+
+        order = np.argsort(np.frombuffer(starts, dtype=np.int64), kind='stable')
+        self.offsets = np.frombuffer(offsets, dtype=np.int64)[order]
+        self.lengths = np.frombuffer(lengths, dtype=np.int64)[order]
+        self.starts = np.frombuffer(starts, dtype=np.int64)[order]
+        self.ends = np.frombuffer(ends, dtype=np.int64)[order]
+        # Latest end among events sorted up to each position, so a query can skip everything before
+        self.max_end_before = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    @classmethod
+    def for_file(cls, path) -> 'CalendarIndex':
+        """Process-wide index of a file, rebuilt when the file changes"""
+        stat = os.stat(path)
+        key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                for stale in [k for k in cls._instances if k[0] == key[0]]:
+                    del cls._instances[stale]
+                cls._instances[key] = cls(path)
+            return cls._instances[key]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _scan(self) -> Iterator[Tuple[int, int, int, int]]:
+        """(offset, length, first date ordinal, end date ordinal) of every VEVENT"""
+        position = 0
+        event_offset = None
+        depth = 0
+        fields: Dict[str, str] = {}
+        pending = None  # (name, value) of the current logical line, extended by continuations
+
+        def finish_line():
+            if pending is not None and event_offset is not None and depth == 0 and pending[0] not in fields:
+                fields[pending[0]] = pending[1]
+
+        with open(self.path, 'rb') as f:
+            for raw in f:
+                line_offset = position
+                position += len(raw)
+                if raw[:1] in (b' ', b'\t'):
+                    if pending is not None:
+                        pending = (pending[0], pending[1] + raw[1:].rstrip(b'\r\n').decode('utf-8', 'replace'))
+                    continue
+                finish_line()
+                pending = None
+
+                if raw.startswith(b'BEGIN:'):
+                    if raw.rstrip(b'\r\n') == b'BEGIN:VEVENT':
+                        event_offset, depth, fields = line_offset, 0, {}
+                    elif event_offset is not None:
+                        depth += 1
+                    continue
+                if raw.startswith(b'END:'):
+                    if raw.rstrip(b'\r\n') == b'END:VEVENT' and event_offset is not None:
+                        span = self._span(fields)
+                        if span is not None:
+                            yield (event_offset, position - event_offset) + span
+                        event_offset = None
+                    elif event_offset is not None:
+                        depth -= 1
+                    continue
+                if event_offset is None or depth:
+                    continue
+
+                # Only the properties that bound the event's dates are kept during the scan
+                name = raw.split(b':', 1)[0].split(b';', 1)[0].upper()
+                if name in (b'DTSTART', b'DTEND', b'DURATION', b'RRULE', b'RDATE', b'RECURRENCE-ID'):
+                    text = raw.rstrip(b'\r\n').decode('utf-8', 'replace')
+                    pending = (name.decode('ascii'), parse_content_line(text)[2])
+            finish_line()
+
+    @staticmethod
+    def _span(fields: Dict[str, str]) -> Optional[Tuple[int, int]]:
+        start = _date_ordinal(fields.get('DTSTART', ''))
+        if start is None:
+            return None
+        replaced = None
+        if 'RECURRENCE-ID' in fields:
+            # An override also hides the instance it replaces, which may lie before or after it
+            replaced = _date_ordinal(fields['RECURRENCE-ID'])
+            if replaced is not None:
+                start = min(start, replaced)
+
+        if 'RDATE' in fields:
+            return start, OPEN_END
+        if 'RRULE' in fields:
+            until = UNTIL_PATTERN.search(fields['RRULE'])
+            if not until:
+                return start, OPEN_END
+            end = _date_ordinal(until.group(1)) + 1
+        elif 'DTEND' in fields:
+            end = _date_ordinal(fields['DTEND']) or start
+        else:
+            end = start + max(0, parse_duration(fields.get('DURATION', '')).days)
+        if replaced is not None:
+            end = max(end, replaced + 1)
+        # One day of slack on each side covers time zone differences and multi-day durations
+        return start - 1, max(end, start) + 2
+
+    def candidates(self, first: date, last: date) -> Iterator[Tuple[int, int]]:
+        """Byte ranges of events that may overlap [first, last]"""
+        first_ordinal, last_ordinal = first.toordinal(), last.toordinal()
+        stop = int(np.searchsorted(self.starts, last_ordinal, side='right'))
+        # Events before this position all end before the window
+        begin = int(np.searchsorted(self.max_end_before[:stop], first_ordinal, side='left'))
+        selected = begin + np.flatnonzero(self.ends[begin:stop] >= first_ordinal)
+        for i in selected:
+            yield int(self.offsets[i]), int(self.lengths[i])
+
+    def read_events(self, first: date, last: date) -> Iterator[Dict[str, List[Tuple[Dict[str, str], str]]]]:
+        """Parsed properties (name -> [(params, value)]) of the candidate events"""
+        with open(self.path, 'rb') as f:
+            for offset, length in self.candidates(first, last):
+                f.seek(offset)
+                text = f.read(length).decode('utf-8', 'replace')
+                properties: Dict[str, List[Tuple[Dict[str, str], str]]] = {}
+                depth = 0
+                for line in unfold(text.splitlines()):
+                    name, params, value = parse_content_line(line)
+                    if name == 'BEGIN':
+                        depth += value.upper() != 'VEVENT'
+                    elif name == 'END':
+                        depth -= value.upper() != 'VEVENT'
+                    elif depth == 0:
+                        properties.setdefault(name, []).append((params, value))
+                yield properties
+
+
+# Events
+
+class CalendarEnricher:
+    def __init__(self, paths: List[str], timezone_name: str = DEFAULT_TIMEZONE,
+                 away_keywords: Optional[List[str]] = None, guest_keywords: Optional[List[str]] = None,
+                 default_guests: int = 1, meal_window: Tuple[str, str] = DEFAULT_MEAL_WINDOW):
+        self.logger = logging.getLogger(__name__)
+        self.paths = [Path(path) for path in paths]
+        self.tz = ZoneInfo(timezone_name)
+        self.away_keywords = [self._normalize(k) for k in away_keywords or DEFAULT_AWAY_KEYWORDS]
+        self.guest_keywords = [self._normalize(k) for k in guest_keywords or DEFAULT_GUEST_KEYWORDS]
+        self.default_guests = default_guests
+        self.meal_window = tuple(time.fromisoformat(value) for value in meal_window)
+
+    @classmethod
+    def from_config(cls, config: Dict) -> Optional['CalendarEnricher']:
+        """Enricher for the calendar section of rules.yaml, or None when disabled"""
+        calendar_config = config.get('calendar') or {}
+        if not calendar_config.get('enabled'):
+            return None
+        paths = calendar_config.get('paths') or [calendar_config.get('path', 'data/calendar.ics')]
+        return cls(paths, calendar_config.get('timezone', DEFAULT_TIMEZONE), calendar_config.get('away_keywords'),
+                   calendar_config.get('guest_keywords'), calendar_config.get('default_guests', 1),
+                   tuple(calendar_config.get('meal_window', DEFAULT_MEAL_WINDOW)))
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return unicodedata.normalize('NFKC', text).lower()
+
+    def _datetime(self, params: Dict[str, str], value: str) -> Tuple[datetime, bool]:
+        """Local (naive, in self.tz wall time) datetime of a DATE or DATE-TIME value, and whether it is a date"""
+        value = value.strip()
+        if params.get('VALUE') == 'DATE' or len(value) == 8:
+            return datetime(int(value[0:4]), int(value[4:6]), int(value[6:8])), True
+        parsed = datetime.strptime(value[:15], '%Y%m%dT%H%M%S')
+        if value.endswith('Z'):
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        elif 'TZID' in params:
+            try:
+                parsed = parsed.replace(tzinfo=ZoneInfo(params['TZID']))
+            except (ZoneInfoNotFoundError, ValueError):
+                pass  # Unknown zone: treat as local wall time
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(self.tz).replace(tzinfo=None)
+        return parsed, False
+
+    def _datetimes(self, entries: List[Tuple[Dict[str, str], str]]) -> List[datetime]:
+        return [self._datetime(params, value)[0] for params, entry in entries for value in entry.split(',') if value]
+
+    def _rule(self, value: str, dtstart: datetime):
+        # Expansion runs in local wall time, so a UTC UNTIL is converted to local time as well
+        def local_until(match):
+            if match.group(2) and match.group(2).endswith('Z'):
+                until = datetime.strptime(match.group(1) + match.group(2)[:7], '%Y%m%dT%H%M%S')
+                until = until.replace(tzinfo=timezone.utc).astimezone(self.tz)
+                return f"UNTIL={until.strftime('%Y%m%dT%H%M%S')}"
+            if not match.group(2):
+                return f"UNTIL={match.group(1)}T235959"
+            return match.group(0)
+        return rrulestr(f"RRULE:{UNTIL_PATTERN.sub(local_until, value)}", dtstart=dtstart)
+
+    def occurrences(self, week_start: date) -> Iterator[Occurrence]:
+        """Occurrences overlapping the week (local wall time)"""
+        window_start = datetime.combine(week_start, time())
+        window_end = window_start + timedelta(days=7)
+        first, last = week_start - timedelta(days=1), week_start + timedelta(days=7)
+
+        for path in self.paths:
+            if not path.exists():
+                self.logger.warning(f"Calendar not found: {path}")
+                continue
+            index = CalendarIndex.for_file(path)
+            events = list(index.read_events(first, last))
+
+            # Instances replaced by an override (RECURRENCE-ID) are skipped when expanding the master
+            overridden = {(event['UID'][0][1], self._datetime(*event['RECURRENCE-ID'][0])[0])
+                          for event in events if 'RECURRENCE-ID' in event and 'UID' in event}
+
+            for event in events:
+                if 'DTSTART' not in event:
+                    continue
+                if event.get('STATUS', [({}, '')])[0][1].upper() == 'CANCELLED':
+                    continue
+                start, all_day = self._datetime(*event['DTSTART'][0])
+                if 'DTEND' in event:
+                    duration = self._datetime(*event['DTEND'][0])[0] - start
+                elif 'DURATION' in event:
+                    duration = parse_duration(event['DURATION'][0][1])
+                else:
+                    duration = timedelta(days=1) if all_day else timedelta(0)
+                summary = event.get('SUMMARY', [({}, '')])[0][1]
+                categories = ','.join(value for _, value in event.get('CATEGORIES', []))
+
+                if 'RRULE' in event and 'RECURRENCE-ID' not in event:
+                    uid = event.get('UID', [({}, '')])[0][1]
+                    excluded = set(self._datetimes(event.get('EXDATE', [])))
+                    rule = self._rule(event['RRULE'][0][1], start)
+                    starts = set(rule.between(window_start - duration, window_end, inc=True))
+                    starts.update(d for d in self._datetimes(event.get('RDATE', []))
+                                  if window_start - duration <= d < window_end)
+                    starts = sorted(d for d in starts if d not in excluded and (uid, d) not in overridden)
+                else:
+                    starts = [start]
+
+                for occurrence_start in starts:
+                    occurrence_end = occurrence_start + duration
+                    if occurrence_end > window_start and occurrence_start < window_end:
+                        yield Occurrence(occurrence_start, occurrence_end, summary, categories)
+
+    def _keywords_in(self, occurrence: Occurrence, keywords: List[str]) -> bool:
+        text = self._normalize(f"{occurrence.summary} {occurrence.categories}")
+        return any(keyword in text for keyword in keywords)
+
+    def availability(self, week_start: date) -> CalendarAvailability:
+        away_days = set()
+        guests = [0] * 7
+        events = []
+        meals = [(datetime.combine(week_start + timedelta(days=i), self.meal_window[0]),
+                  datetime.combine(week_start + timedelta(days=i), self.meal_window[1])) for i in range(7)]
+
+        for occurrence in self.occurrences(week_start):
+            overlapped = [i for i, (meal_start, meal_end) in enumerate(meals)
+                          if occurrence.start < meal_end and occurrence.end > meal_start]
+            if not overlapped:
+                continue
+            if self._keywords_in(occurrence, self.away_keywords):
+                away_days.update(overlapped)
+                events.append(occurrence.summary)
+            elif self._keywords_in(occurrence, self.guest_keywords):
+                match = GUEST_COUNT_PATTERN.search(unicodedata.normalize('NFKC', occurrence.summary))
+                count = int(match.group(1)) if match else self.default_guests
+                for i in overlapped:
+                    guests[i] += count
+                events.append(occurrence.summary)
+
+        # Guests are only cooked for on days at home
+        guests_expected = max((count for i, count in enumerate(guests) if i not in away_days), default=0)
+        return CalendarAvailability(sorted(away_days), guests_expected, events)
+
+    def enrich(self, intake: IntakeData) -> IntakeData:
+        """Intake with calendar away days and guests added to the ones entered by hand"""
+        availability = self.availability(intake.week_start)
+        if not availability.events:
+            return intake
+        self.logger.info(f"Calendar: away days {availability.away_days}, "
+                         f"{availability.guests_expected} guests ({', '.join(availability.events)})")
+        return intake.model_copy(update={
+            'away_days': sorted(set(intake.away_days) | set(availability.away_days)),
+            'guests_expected': max(intake.guests_expected, availability.guests_expected),
+        })
+
+
+def main():
+    """Print (and optionally apply) the availability derived from calendars"""
+    parser = argparse.ArgumentParser(description="Derive away days and guests from .ics calendars")
+    parser.add_argument('--ics', nargs='+', required=True, help="Calendar exports")
+    parser.add_argument('--week-start', type=date.fromisoformat, help="Monday of the week (default: the intake's)")
+    parser.add_argument('--timezone', default=DEFAULT_TIMEZONE, help="Household time zone")
+    parser.add_argument('--update', metavar='INTAKE', help="Add the result to this intake.json")
+    args = parser.parse_args()
+
+    try:
+        enricher = CalendarEnricher(args.ics, args.timezone)
+        if args.update:
+            with open(args.update, 'r', encoding='utf-8') as f:
+                intake = IntakeData(**json.load(f))
+            if args.week_start:
+                intake = intake.model_copy(update={'week_start': args.week_start})
+            intake = enricher.enrich(intake)
+            with open(args.update, 'w', encoding='utf-8') as f:
+                json.dump(intake.model_dump(mode='json'), f, ensure_ascii=False, indent=2)
+            print(f"Updated {args.update}: away_days={intake.away_days}, guests_expected={intake.guests_expected}")
+            return
+
+        week_start = args.week_start or date.today() - timedelta(days=date.today().weekday())
+        availability = enricher.availability(week_start)
+        print(f"Week of {week_start}: away_days={availability.away_days}, "
+              f"guests_expected={availability.guests_expected}")
+        for summary in availability.events:
+            print(f"  {summary}")
+
+    except Exception as e:
+        print(f"Error reading calendars: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Record and replay of external API calls (Gist, OpenAI, Notion).
+
+With CASSETTE_MODE=record every request made through a wrapped client is
+executed and appended, with its response (or error) and latency, to the
+JSONL cassette at CASSETTE_PATH. With CASSETTE_MODE=replay the same calls
+are answered from the cassette without network access or credentials;
+CASSETTE_LATENCY=1 additionally sleeps for the recorded latency so timings
+stay representative.
+
+Replayed calls are matched by service, method and request body, volatile
+arguments such as timeouts being ignored; a call with no matching
+interaction raises CassetteMiss, so a changed request is noticed instead of
+answered with another call's response. With CASSETTE_MATCH=loose the next
+unused interaction of the same method is served instead, for runs whose
+requests contain timestamps.
+
+Recorded errors are raised again as their original type (looked up among
+the loaded modules, without calling its constructor) with the message and
+the code/status attributes callers branch on, e.g. a Notion
+object_not_found or a requests.RequestException. An error type that is
+not loaded is raised as ReplayedError carrying the same attributes.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_CASSETTE_PATH = 'data/cassette.jsonl'
+
+# Request arguments that differ between otherwise identical runs
+VOLATILE_ARGUMENTS = {'timeout'}
+# Error attributes kept with a recorded error (Notion APIResponseError code and HTTP status)
+ERROR_ATTRIBUTES = ('code', 'status')
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when the cassette has no interaction for a call"""
+
+
+class ReplayedError(RuntimeError):
+    """Error recorded for a call, raised again on replay"""
+
+
+def _jsonable(value: Any) -> Any:
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _encode_response(value: Any) -> Dict:
+    # SDK response models (OpenAI) are replayed as attribute-access objects, plain data as-is
+    if hasattr(value, 'model_dump'):
+        return {'type': 'object', 'value': value.model_dump(mode='json')}
+    return {'type': 'json', 'value': _jsonable(value)}
+
+
+def _namespace(value: Any) -> Any:
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+def _encode_error(error: Exception) -> Dict:
+    encoded = {'module': type(error).__module__, 'type': type(error).__qualname__, 'message': str(error)}
+    for name in ERROR_ATTRIBUTES:
+        value = getattr(error, name, None)
+        if isinstance(value, (str, int, float, bool)):
+            encoded[name] = value
+    return encoded
+
+
+def _decode_error(error: Dict) -> Exception:
+    """The recorded exception type when its module is loaded, otherwise a ReplayedError"""
+    cls: Any = sys.modules.get(error.get('module', ''))
+    for name in error['type'].split('.'):
+        cls = getattr(cls, name, None)
+    if isinstance(cls, type) and issubclass(cls, Exception):
+        # SDK errors take response objects in __init__, so only the message and attributes are restored
+        exception = cls.__new__(cls, error['message'])
+        exception.args = (error['message'],)
+    else:
+        exception = ReplayedError(f"{error['type']}: {error['message']}")
+    for name in ERROR_ATTRIBUTES:
+        if name in error:
+            setattr(exception, name, error[name])
+    return exception
+
+
+def _decode_response(response: Dict) -> Any:
+    if response['type'] == 'object':
+        return _namespace(response['value'])
+    return response['value']
+
+
+def request_key(service: str, method: str, request: Dict) -> str:
+    stable = {key: value for key, value in request.get('kwargs', {}).items() if key not in VOLATILE_ARGUMENTS}
+    content = json.dumps([service, method, request.get('args', []), stable], sort_keys=True,
+                         ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class Cassette:
+    _instances: Dict[Tuple[Optional[str], str, bool], 'Cassette'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: str = DEFAULT_CASSETTE_PATH, mode: Optional[str] = None, simulate_latency: bool = False,
+                 loose: bool = False):
+        if mode not in (None, 'record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.mode = mode
+        self.simulate_latency = simulate_latency
+        self.loose = loose
+        self._lock = threading.Lock()
+        self._interactions: List[Dict] = []
+        self._used: List[bool] = []
+
+        if mode == 'replay':
+            if not self.path.exists():
+                raise FileNotFoundError(f"Cassette not found: {self.path}")
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._interactions = [json.loads(line) for line in f if line.strip()]
+            self._used = [False] * len(self._interactions)
+            self.logger.info(f"Replaying {len(self._interactions)} interactions from {self.path}")
+        elif mode == 'record':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.logger.info(f"Recording API interactions to {self.path}")
+
+    @classmethod
+    def from_env(cls) -> 'Cassette':
+        """Process-wide cassette configured by CASSETTE_MODE, CASSETTE_PATH, CASSETTE_LATENCY and CASSETTE_MATCH"""
+        mode = os.getenv('CASSETTE_MODE') or None
+        path = os.getenv('CASSETTE_PATH', DEFAULT_CASSETTE_PATH)
+        match = os.getenv('CASSETTE_MATCH', 'exact').lower()
+        if match not in ('exact', 'loose'):
+            raise ValueError(f"Unknown cassette match: {match}")
+        key = (mode, path, match == 'loose')
+        with cls._instances_lock:
+            if key not in cls._instances:
+                simulate_latency = os.getenv('CASSETTE_LATENCY', '').lower() in ('1', 'true', 'yes')
+                cls._instances[key] = cls(path, mode, simulate_latency, loose=match == 'loose')
+            return cls._instances[key]
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == 'record'
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def wrap(self, service: str, client: Any) -> Any:
+        """Client whose calls go through the cassette (the client itself when inactive)"""
+        if self.mode is None:
+            return client
+        return CassetteProxy(self, service, client)
+
+    def call(self, service: str, method: str, request: Dict, func: Callable[[], Any]) -> Any:
+        """Run one API call through the cassette"""
+        if self.replaying:
+            return self._replay(service, method, request)
+        if not self.recording:
+            return func()
+
+        start = time.perf_counter()
+        interaction = {'service': service, 'method': method, 'request': _jsonable(request),
+                       'key': request_key(service, method, request)}
+        try:
+            result = func()
+        except Exception as e:
+            interaction.update(error=_encode_error(e),
+                               latency=time.perf_counter() - start)
+            self._append(interaction)
+            raise
+        interaction.update(response=_encode_response(result), latency=time.perf_counter() - start)
+        self._append(interaction)
+        return result
+
+    def _append(self, interaction: Dict):
+        line = json.dumps(interaction, ensure_ascii=False) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def _replay(self, service: str, method: str, request: Dict) -> Any:
+        key = request_key(service, method, request)
+        with self._lock:
+            candidates = [i for i, interaction in enumerate(self._interactions)
+                          if not self._used[i] and interaction['service'] == service and interaction['method'] == method]
+            exact = [i for i in candidates if self._interactions[i]['key'] == key]
+            if not candidates:
+                raise CassetteMiss(f"No recorded {service} {method} call left in {self.path}")
+            if not exact and not self.loose:
+                raise CassetteMiss(f"No recorded {service} {method} call matches the request in {self.path} "
+                                   f"(set CASSETTE_MATCH=loose to replay in order)")
+            index = (exact or candidates)[0]
+            self._used[index] = True
+        interaction = self._interactions[index]
+
+        if self.simulate_latency:
+            time.sleep(interaction.get('latency', 0))
+        if 'error' in interaction:
+            raise _decode_error(interaction['error'])
+        return _decode_response(interaction['response'])
+
+
+class CassetteProxy:
+    """Attribute chain over an SDK client (e.g. notion.pages.create) whose calls go through a cassette"""
+
+    def __init__(self, cassette: Cassette, service: str, target: Any, path: Tuple[str, ...] = ()):
+        self._cassette = cassette
+        self._service = service
+        self._target = target
+        self._path = path
+
+    def __getattr__(self, name: str) -> 'CassetteProxy':
+        target = getattr(self._target, name) if self._target is not None else None
+        return CassetteProxy(self._cassette, self._service, target, self._path + (name,))
+
+    def __call__(self, *args, **kwargs):
+        request = {'args': list(args), 'kwargs': kwargs}
+        return self._cassette.call(self._service, '.'.join(self._path), request,
+                                   lambda: self._target(*args, **kwargs))
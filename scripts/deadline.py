@@ -0,0 +1,108 @@
+"""
+Shared run deadline for the weekly menu pipeline.
+
+Every stage (fetch, generate, Notion update, archive) reads the same
+deadline so that timeouts and retries are derived from the time the whole
+job has left instead of per-stage hardcoded values.
+"""
+
+import os
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage is started or retried after the run deadline"""
+
+
+class RunDeadline:
+    """Wall-clock deadline shared by every stage of a pipeline run.
+
+    The deadline is read from ``RUN_DEADLINE`` (ISO 8601 timestamp, set once
+    at the start of the workflow) or ``RUN_BUDGET_SECONDS`` (relative to the
+    current process start). Without either, the run is unbounded and the
+    stage defaults apply unchanged.
+    """
+
+    def __init__(self, deadline_at: Optional[float] = None):
+        # Epoch seconds; wall clock so the value can be shared across processes
+        self.deadline_at = deadline_at
+
+    @classmethod
+    def from_env(cls) -> 'RunDeadline':
+        """Build the deadline from RUN_DEADLINE or RUN_BUDGET_SECONDS"""
+        deadline = os.getenv('RUN_DEADLINE')
+        if deadline:
+            parsed = datetime.fromisoformat(deadline.replace('Z', '+00:00'))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return cls(parsed.timestamp())
+
+        budget = os.getenv('RUN_BUDGET_SECONDS')
+        if budget:
+            return cls(time.time() + float(budget))
+
+        return cls()
+
+    @classmethod
+    def after(cls, seconds: float) -> 'RunDeadline':
+        """Deadline ``seconds`` from now"""
+        return cls(time.time() + seconds)
+
+    def capped(self, seconds: float) -> 'RunDeadline':
+        """Deadline ``seconds`` from now, or this deadline when it comes first"""
+        deadline_at = time.time() + seconds
+        if self.deadline_at is not None:
+            deadline_at = min(deadline_at, self.deadline_at)
+        return RunDeadline(deadline_at)
+
+    @property
+    def bounded(self) -> bool:
+        return self.deadline_at is not None
+
+    def remaining(self) -> float:
+        """Seconds left until the deadline (infinite when unbounded)"""
+        if self.deadline_at is None:
+            return float('inf')
+        return max(0.0, self.deadline_at - time.time())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has_budget(self, seconds: float) -> bool:
+        """Whether at least ``seconds`` remain before the deadline"""
+        return self.remaining() >= seconds
+
+    def timeout(self, default: float, minimum: float = 1.0) -> float:
+        """Per-request timeout: the stage default capped by the time left"""
+        return max(minimum, min(default, self.remaining()))
+
+    def retry_with_backoff(self, func: Callable[[], T], max_retries: int = 3, base_delay: float = 1,
+                           logger: Optional[logging.Logger] = None) -> T:
+        """Execute function with exponential backoff, never sleeping past the deadline"""
+        logger = logger or logging.getLogger(__name__)
+
+        for attempt in range(max_retries):
+            if self.expired():
+                raise DeadlineExceeded("Run deadline exceeded before attempt could start")
+
+            try:
+                return func()
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    logger.error(f"Final attempt failed: {e}")
+                    raise
+
+                delay = base_delay * (2 ** attempt)
+                # Leave at least one second for the retried request itself
+                if not self.has_budget(delay + 1):
+                    logger.error(f"Attempt {attempt + 1} failed: {e}. "
+                                 f"No time left for a retry ({self.remaining():.1f}s remaining)")
+                    raise
+
+                logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
+                time.sleep(delay)
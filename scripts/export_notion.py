@@ -0,0 +1,175 @@
+"""
+Export every page of the Notion menu database to JSONL.
+
+Pages are read one query page (up to 100 pages) at a time; the block
+children of those pages are fetched concurrently through a shared rate
+limiter, and each page is written as one JSON line with its blocks, so
+memory stays constant regardless of the database size.
+
+After every query page the next cursor and the output size are saved to a
+state file. An interrupted export resumes from that cursor, discarding any
+lines written after the last saved state.
+
+Usage:
+    python scripts/export_notion.py [--output data/export/menus.jsonl] [--concurrency 4]
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from notion_client import Client
+
+from scripts.deadline import RunDeadline
+from scripts.rate_limit import NOTION_REQUESTS_PER_SECOND, RateLimiter
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+
+class NotionExporter:
+    def __init__(self, deadline: Optional[RunDeadline] = None, notion_client: Optional[Client] = None,
+                 concurrency: int = 4, rate: float = NOTION_REQUESTS_PER_SECOND):
+        self.logger = logging.getLogger(__name__)
+        self.deadline = deadline or RunDeadline.from_env()
+        if notion_client is None:
+            notion_token = os.getenv('NOTION_TOKEN')
+            if not notion_token:
+                raise ValueError("NOTION_TOKEN environment variable is required")
+            notion_client = Client(auth=notion_token, timeout_ms=int(self.deadline.timeout(60) * 1000))
+        self.notion = notion_client
+
+        self.database_id = os.getenv('NOTION_DATABASE_ID')
+        if not self.database_id:
+            raise ValueError("NOTION_DATABASE_ID environment variable is required")
+
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+
+    def _request(self, func):
+        """Rate-limited request with retry bounded by the run deadline"""
+        return self.deadline.retry_with_backoff(lambda: self.limiter.call(func), max_retries=3, base_delay=2,
+                                                logger=self.logger)
+
+    def load_state(self, state_path: Path) -> Dict:
+        if not state_path.exists():
+            return {}
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('database_id') != self.database_id:
+            raise ValueError(f"State file {state_path} belongs to another database")
+        return state
+
+    def save_state(self, state_path: Path, state: Dict):
+        tmp_path = state_path.with_suffix(state_path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def fetch_blocks(self, block_id: str) -> List[Dict]:
+        """All child blocks of a page or block, nested children included"""
+        blocks = []
+        cursor = None
+        while True:
+            kwargs = {'block_id': block_id, 'page_size': 100}
+            if cursor:
+                kwargs['start_cursor'] = cursor
+            response = self._request(lambda: self.notion.blocks.children.list(**kwargs))
+            for block in response['results']:
+                if block.get('has_children'):
+                    block['children'] = self.fetch_blocks(block['id'])
+                blocks.append(block)
+            if not response.get('has_more'):
+                return blocks
+            cursor = response['next_cursor']
+
+    def export(self, output_path: Path, state_path: Path) -> int:
+        """Export the database; returns the number of pages written in this run"""
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        state = self.load_state(state_path)
+        if state.get('done'):
+            self.logger.info(f"Export to {output_path} already complete, nothing to do")
+            return 0
+
+        cursor = state.get('cursor')
+        exported = state.get('exported', 0)
+        written = 0
+
+        with open(output_path, 'ab') as output, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            # Drop lines written after the last saved state (interrupted batch)
+            output.seek(0, os.SEEK_END)
+            if output.tell() < state.get('output_size', 0):
+                raise ValueError(f"{output_path} is shorter than recorded in {state_path}; use --restart")
+            output.truncate(state.get('output_size', 0))
+            output.seek(0, os.SEEK_END)
+            if cursor:
+                self.logger.info(f"Resuming export after {exported} pages")
+
+            while True:
+                query = {'database_id': self.database_id, 'page_size': 100,
+                         'sorts': [{'timestamp': 'created_time', 'direction': 'ascending'}]}
+                if cursor:
+                    query['start_cursor'] = cursor
+                response = self._request(lambda: self.notion.databases.query(**query))
+
+                pages = response['results']
+                # map() keeps query order while block fetches run concurrently
+                for page, blocks in zip(pages, executor.map(lambda page: self.fetch_blocks(page['id']), pages)):
+                    record = dict(page, blocks=blocks)
+                    output.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+                output.flush()
+                os.fsync(output.fileno())
+
+                written += len(pages)
+                exported += len(pages)
+                cursor = response.get('next_cursor') if response.get('has_more') else None
+                self.save_state(state_path, {
+                    'database_id': self.database_id,
+                    'cursor': cursor,
+                    'exported': exported,
+                    'output_size': output.tell(),
+                    'done': cursor is None,
+                })
+                self.logger.info(f"Exported {exported} pages")
+
+                if cursor is None:
+                    return written
+
+
+def main():
+    """Main function to export the menu database"""
+    parser = argparse.ArgumentParser(description="Export the Notion menu database to JSONL")
+    parser.add_argument('--output', default='data/export/menus.jsonl', help="JSONL output file")
+    parser.add_argument('--state', help="Resume state file (default: <output>.state.json)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Pages whose blocks are fetched in parallel")
+    parser.add_argument('--rate', type=float, default=NOTION_REQUESTS_PER_SECOND, help="Requests per second")
+    parser.add_argument('--restart', action='store_true', help="Discard saved progress and start over")
+    args = parser.parse_args()
+
+    output_path = Path(args.output)
+    state_path = Path(args.state) if args.state else output_path.with_suffix('.state.json')
+
+    try:
+        if args.restart:
+            output_path.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+
+        exporter = NotionExporter(concurrency=args.concurrency, rate=args.rate)
+        written = exporter.export(output_path, state_path)
+        print(f"Exported {written} pages to {output_path}")
+
+    except Exception as e:
+        print(f"Error exporting Notion database: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,15 @@ import os
 import sys
 import json
 import requests
-import time
 import logging
+import argparse
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from scripts.cassette import Cassette
+from scripts.deadline import RunDeadline
+from scripts.profiling import add_profile_argument, enable_profiling, finish_profiling, profiled
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -30,24 +34,18 @@ def get_current_week_start():
     return monday.date()
 
 
-def retry_with_backoff(func, max_retries=3, base_delay=1):
-    """Execute function with exponential backoff retry"""
-    for attempt in range(max_retries):
-        try:
-            return func()
-        except Exception as e:
-            if attempt == max_retries - 1:
-                logger.error(f"Final attempt failed: {e}")
-                raise
-            
-            delay = base_delay * (2 ** attempt)
-            logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
-            time.sleep(delay)
+def retry_with_backoff(func, max_retries=3, base_delay=1, deadline=None):
+    """Execute function with exponential backoff retry bounded by the run deadline"""
+    deadline = deadline or RunDeadline.from_env()
+    return deadline.retry_with_backoff(func, max_retries, base_delay, logger=logger)
 
 
-def fetch_from_gist(gist_id, github_token):
+@profiled('fetch_intake')
+def fetch_from_gist(gist_id, github_token, deadline=None):
     """Fetch intake.json from GitHub Gist with retry logic"""
-    if not gist_id or not github_token:
+    deadline = deadline or RunDeadline.from_env()
+    cassette = Cassette.from_env()
+    if not gist_id or (not github_token and not cassette.replaying):
         logger.error("Missing GIST_ID or GITHUB_TOKEN environment variables")
         return None
     
@@ -58,14 +56,17 @@ def fetch_from_gist(gist_id, github_token):
     
     url = f'https://api.github.com/gists/{gist_id}'
     
-    def _make_request():
-        logger.info(f"Fetching from GitHub Gist: {gist_id}")
-        response = requests.get(url, headers=headers, timeout=30)
+    def _fetch_gist():
+        response = requests.get(url, headers=headers, timeout=deadline.timeout(30))
         response.raise_for_status()
         return response.json()
     
+    def _make_request():
+        logger.info(f"Fetching from GitHub Gist: {gist_id}")
+        return cassette.call('gist', 'gists.get', {'args': [url], 'kwargs': {}}, _fetch_gist)
+    
     try:
-        gist_data = retry_with_backoff(_make_request, max_retries=3, base_delay=2)
+        gist_data = retry_with_backoff(_make_request, max_retries=3, base_delay=2, deadline=deadline)
         
         # Look for intake files for current week
         week_start = get_current_week_start()
@@ -102,6 +103,7 @@ def fetch_from_gist(gist_id, github_token):
         return None
 
 
+@profiled('save_intake')
 def save_intake_locally(intake_data):
     """Save intake data to local file for menu generation script"""
     intake_path = Path('data/intake.json')
@@ -115,21 +117,30 @@ def save_intake_locally(intake_data):
 
 def main():
     """Main function to fetch and save intake data"""
+    parser = argparse.ArgumentParser(description="Fetch this week's intake from the GitHub Gist")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'fetch_intake')
+    
     gist_id = os.getenv('GIST_ID')
     github_token = os.getenv('GITHUB_TOKEN')
     
     logger.info("Attempting to fetch intake.json...")
     
-    # Try to fetch from GitHub Gist
-    intake_data = fetch_from_gist(gist_id, github_token)
-    
-    if intake_data:
-        logger.info("Successfully fetched intake data")
-        save_intake_locally(intake_data)
-        sys.exit(0)
-    else:
-        logger.warning("Could not fetch intake data, will use rules.yaml fallback")
-        sys.exit(1)
+    try:
+        # Try to fetch from GitHub Gist
+        intake_data = fetch_from_gist(gist_id, github_token)
+        
+        if intake_data:
+            logger.info("Successfully fetched intake data")
+            save_intake_locally(intake_data)
+            sys.exit(0)
+        else:
+            logger.warning("Could not fetch intake data, will use rules.yaml fallback")
+            sys.exit(1)
+    finally:
+        finish_profiling()
 
 
 if __name__ == "__main__":
@@ -5,15 +5,33 @@ Generate weekly menu using OpenAI API based on intake.json and rules.yaml
 import os
 import sys
 import json
-import yaml
-import time
 import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta, date
 from typing import Dict, List, Optional
 
 from openai import OpenAI
+from pydantic import ValidationError
 from schemas.intake_schema import IntakeData
+from schemas.intake_validation import format_errors, intake_adapter
+from scripts.calendar_intake import CalendarAvailability, CalendarEnricher
+from scripts.cassette import Cassette
+from scripts.deadline import RunDeadline
+from scripts.menu_history import MenuHistory
+from scripts.menu_reuse import (DEFAULT_MAX_ENTRIES, DEFAULT_MAX_REPAIRED_FRACTION, DEFAULT_MIN_SIMILARITY,
+                                DEFAULT_STATS_PATH, MenuRepairer, MenuSimilarityIndex, ReuseStats,
+                                canonicalize_settings, spelling_table)
+from scripts.menu_structure import NO_COOKING_ITEMS, merge_week_plans, parse_week_plan, render_week_plan
+from scripts.nutrition import FoodComposition, NutritionScorer
+from scripts.pantry_optimizer import PantryOptimizer, load_pantry
+from scripts.profiling import add_profile_argument, enable_profiling, finish_profiling, profiled
+from scripts.recipe_catalog import RecipeCatalog
+from scripts.recipe_links import RecipeLinkIndex
+from scripts.rules_config import DEFAULT_RULES_PATH, load_rules
+from scripts.shopping_list import build_shopping_list
+from scripts.speculative import DEFAULT_SPECULATIVE_PATH, SpeculativeMenuCache, settings_fingerprint
 
 # Configure logging
 logging.basicConfig(
@@ -21,41 +39,57 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+DEFAULT_MEAL_TYPE = '夕食'
+
 
 class MenuGenerator:
-    def __init__(self):
+    def __init__(self, deadline: Optional[RunDeadline] = None, openai_client: Optional[OpenAI] = None,
+                 intake_data: Optional[IntakeData] = None, intake_path: Optional[str] = 'data/intake.json',
+                 user_id: Optional[str] = None, week_start: Optional[date] = None,
+                 rules_override: Optional[str] = None, settings: Optional[Dict] = None):
         self.logger = logging.getLogger(__name__)
-        self.openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.deadline = deadline or RunDeadline.from_env()
+        cassette = Cassette.from_env()
+        # Long-running callers pass a shared client to reuse its connection pool
+        if openai_client is None and not cassette.replaying:
+            openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.openai_client = cassette.wrap('openai', openai_client)
         self.openai_model = os.getenv('OPENAI_MODEL', 'gpt-4')  # Default to gpt-4 if not specified
+        self.rules_override = rules_override
         self.config = self.load_config()
-        self.intake_data = self.load_intake_data()
+        self.intake_path = intake_path
+        self.user_id = user_id
+        self.week_start = week_start
+        self.settings = settings
+        self.intake_data = intake_data if intake_data is not None else self.load_intake_data()
+        self.intake_data = self.enrich_intake(self.intake_data)
+        self._pantry_hints = None
+        self._pantry = None
+        self._recipe_catalog = None
+        self._recipe_catalog_loaded = False
+        self._nutrition_scorer = None
+        self._nutrition_scorer_loaded = False
+        self._history = None
+        self._recent_dishes = None
+        self._speculative_cache = None
+        self._spellings = None
+        self.reused_from = None
         
     def _retry_with_backoff(self, func, max_retries=3, base_delay=1):
-        """Execute function with exponential backoff retry"""
-        for attempt in range(max_retries):
-            try:
-                return func()
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    self.logger.error(f"Final attempt failed: {e}")
-                    raise
-                
-                delay = base_delay * (2 ** attempt)
-                self.logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
-                time.sleep(delay)
+        """Execute function with exponential backoff retry bounded by the run deadline"""
+        return self.deadline.retry_with_backoff(func, max_retries, base_delay, logger=self.logger)
         
+    @profiled('load_config')
     def load_config(self) -> Dict:
-        """Load default rules from yaml file"""
-        config_path = Path('config/rules.yaml')
-        if not config_path.exists():
-            raise FileNotFoundError(f"Config file not found: {config_path}")
-            
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+        """Load validated rules, merged with the tenant's override file if any"""
+        return load_rules(DEFAULT_RULES_PATH, self.rules_override)
     
+    @profiled('load_intake_data')
     def load_intake_data(self) -> Optional[IntakeData]:
         """Load intake data if available"""
-        intake_path = Path('data/intake.json')
+        if self.intake_path is None:
+            return None
+        intake_path = Path(self.intake_path)
         if not intake_path.exists():
             print("No intake.json found, using default rules only")
             return None
@@ -63,13 +97,39 @@ class MenuGenerator:
         try:
             with open(intake_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-            return IntakeData(**data)
+            return intake_adapter().validate_python(data)
+        except ValidationError as e:
+            self.logger.warning(f"Invalid intake data, using default rules only: {format_errors(e)}")
+            return None
         except Exception as e:
-            print(f"Error loading intake data: {e}")
+            self.logger.warning(f"Error loading intake data, using default rules only: {e}")
             return None
     
+    def enrich_intake(self, intake: Optional[IntakeData]) -> Optional[IntakeData]:
+        """Add away days and guests from the household's calendars, if enabled in rules.yaml"""
+        if intake is None:
+            return None
+        try:
+            enricher = CalendarEnricher.from_config(self.config)
+            return enricher.enrich(intake) if enricher is not None else intake
+        except Exception as e:
+            self.logger.warning(f"Error reading calendars, using the intake as entered: {e}")
+            return intake
+    
+    def get_calendar_availability(self) -> Optional[CalendarAvailability]:
+        """Away days and guests from the household's calendars for runs without an intake"""
+        try:
+            enricher = CalendarEnricher.from_config(self.config)
+            return enricher.availability(self.get_week_start()) if enricher is not None else None
+        except Exception as e:
+            self.logger.warning(f"Error reading calendars, using default rules only: {e}")
+            return None
+    
+    @profiled('menu_settings')
     def get_menu_settings(self) -> Dict:
-        """Merge default settings with intake data"""
+        """Merge default settings with intake data, unless the caller fixed the settings"""
+        if self.settings is not None:
+            return dict(self.settings)
         settings = self.config['default_settings'].copy()
         
         if self.intake_data:
@@ -88,25 +148,222 @@ class MenuGenerator:
                 settings['guests_expected'] = self.intake_data.guests_expected
             if self.intake_data.special_occasions:
                 settings['special_occasions'] = self.intake_data.special_occasions
+        else:
+            availability = self.get_calendar_availability()
+            if availability is not None and availability.events:
+                settings['away_days'] = sorted(set(settings['away_days']) | set(availability.away_days))
+                if availability.guests_expected > 0:
+                    settings['guests_expected'] = availability.guests_expected
+        
+        if (self.config.get('reuse') or {}).get('enabled'):
+            settings = canonicalize_settings(settings, self.get_spellings())
+        
+        recent_dishes = self.get_recent_dishes()
+        if recent_dishes:
+            settings['recent_dishes'] = recent_dishes
+        
+        pantry_hints = self.get_pantry_hints(settings)
+        if pantry_hints:
+            settings['pantry_hints'] = pantry_hints
                 
         return settings
     
+    def get_history(self) -> Optional[MenuHistory]:
+        """Local menu history, if enabled in rules.yaml"""
+        history_config = self.config.get('history') or {}
+        if self._history is None and history_config.get('enabled'):
+            try:
+                self._history = MenuHistory(history_config.get('path', 'data/history'))
+            except Exception as e:
+                self.logger.warning(f"Error opening menu history: {e}")
+        return self._history
+    
+    def get_user_id(self) -> Optional[str]:
+        if self.user_id:
+            return self.user_id
+        return self.intake_data.user_id if self.intake_data else None
+    
+    def get_recent_dishes(self) -> List[str]:
+        """Dishes served in the previous weeks, read from the local history"""
+        if self._recent_dishes is not None:
+            return self._recent_dishes
+        
+        self._recent_dishes = []
+        history = self.get_history()
+        weeks = (self.config.get('history') or {}).get('avoid_recent_weeks', 0)
+        if history is None or not weeks:
+            return self._recent_dishes
+        
+        try:
+            for menu_data in history.recent(self.get_user_id(), self.get_week_start(), weeks):
+                for day in menu_data.get('week_plan', []):
+                    for dishes in day['meals'].values():
+                        self._recent_dishes.extend(dish['name'] for dish in dishes
+                                                   if dish['name'] not in NO_COOKING_ITEMS)
+            self._recent_dishes = list(dict.fromkeys(self._recent_dishes))
+        except Exception as e:
+            self.logger.warning(f"Error reading menu history: {e}")
+        return self._recent_dishes
+    
+    def record_history(self, menu_data: Dict):
+        """Append the generated menu and the intake behind it to the local history"""
+        history = self.get_history()
+        if history is None:
+            return
+        
+        try:
+            if self.intake_data:
+                history.append_intake(self.intake_data, self.get_user_id())
+            history.append_menu(menu_data, self.get_user_id())
+            self.logger.info(f"Recorded menu for week {menu_data['week_start']} in {history.path}")
+        except Exception as e:
+            self.logger.warning(f"Error recording menu history: {e}")
+    
+    def get_recipe_catalog(self) -> Optional[RecipeCatalog]:
+        """Local recipe catalog, if one is configured and present"""
+        if not self._recipe_catalog_loaded:
+            self._recipe_catalog_loaded = True
+            catalog_path = Path(self.config.get('recipe_catalog') or 'data/recipes.json')
+            if catalog_path.exists():
+                try:
+                    self._recipe_catalog = RecipeCatalog.load(catalog_path)
+                except Exception as e:
+                    self.logger.warning(f"Error loading recipe catalog: {e}")
+        return self._recipe_catalog
+    
+    @profiled('recipe_links')
+    def get_recipe_links(self, week_plan: List[Dict], settings: Dict) -> Dict[str, Dict]:
+        """Recipe link per dish from the local index, searched in priority_recipe_sites order"""
+        links_config = self.config.get('recipe_links') or {}
+        index_path = Path(links_config.get('path', 'data/recipe_links.sqlite3'))
+        if not links_config.get('enabled') or not index_path.exists():
+            return {}
+        
+        dishes = [dish['name'] for day in week_plan for dishes in day['meals'].values() for dish in dishes
+                  if dish['name'] not in NO_COOKING_ITEMS]
+        try:
+            index = RecipeLinkIndex(index_path)
+            try:
+                links = index.lookup(dishes, settings.get('priority_recipe_sites'))
+            finally:
+                index.close()
+            self.logger.info(f"Found recipe links for {len(links)}/{len(set(dishes))} dishes")
+            return {name: link._asdict() for name, link in links.items()}
+        except Exception as e:
+            self.logger.warning(f"Error looking up recipe links: {e}")
+            return {}
+    
+    def get_pantry(self) -> List[Dict]:
+        """Pantry stock, empty when pantry tracking is disabled or no file exists"""
+        if self._pantry is None:
+            self._pantry = []
+            pantry_config = self.config.get('pantry') or {}
+            pantry_path = Path(pantry_config.get('path', 'data/pantry.json'))
+            if pantry_config.get('enabled') and pantry_path.exists():
+                try:
+                    self._pantry = load_pantry(pantry_path)
+                except Exception as e:
+                    self.logger.warning(f"Error loading pantry: {e}")
+        return self._pantry
+    
+    def get_pantry_hints(self, settings: Dict) -> List[Dict]:
+        """Dishes from the local recipe catalog that use up pantry stock"""
+        if self._pantry_hints is not None:
+            return self._pantry_hints
+        
+        self._pantry_hints = []
+        pantry_config = self.config.get('pantry') or {}
+        if not pantry_config.get('enabled'):
+            return self._pantry_hints
+        
+        pantry = self.get_pantry()
+        catalog = self.get_recipe_catalog()
+        if not pantry or catalog is None:
+            self.logger.info("No pantry or recipe catalog found, skipping pantry hints")
+            return self._pantry_hints
+        
+        try:
+            self._pantry_hints = PantryOptimizer(catalog).suggest(
+                pantry,
+                days=min(settings['days_needed'], pantry_config.get('max_hints', 7)),
+                avoid_ingredients=settings['avoid_ingredients'],
+                max_cooking_time=settings['max_cooking_time'],
+                week_start=self.get_week_start()
+            )
+            self.logger.info(f"Selected {len(self._pantry_hints)} pantry-based dish hints")
+        except Exception as e:
+            self.logger.warning(f"Error computing pantry hints: {e}")
+        
+        return self._pantry_hints
+    
+    def get_shopping_list(self, week_plan: List[Dict], settings: Dict) -> Optional[Dict]:
+        """Consolidated shopping list for the week, or None without a recipe catalog"""
+        shopping_config = self.config.get('shopping_list') or {}
+        catalog = self.get_recipe_catalog()
+        if not shopping_config.get('enabled') or catalog is None:
+            return None
+        
+        try:
+            return build_shopping_list(
+                week_plan, catalog,
+                servings=shopping_config.get('household_size', 2) + settings.get('guests_expected', 0),
+                pantry=self.get_pantry()
+            )
+        except Exception as e:
+            self.logger.warning(f"Error building shopping list: {e}")
+            return None
+    
+    def get_nutrition_scorer(self) -> Optional[NutritionScorer]:
+        """Nutrition scorer, if balance checking is enabled and a composition table exists"""
+        if not self._nutrition_scorer_loaded:
+            self._nutrition_scorer_loaded = True
+            nutrition_config = self.config.get('nutrition') or {}
+            composition_path = Path(nutrition_config.get('composition_table', 'data/food_composition.json'))
+            catalog = self.get_recipe_catalog() if nutrition_config.get('consider_balance') else None
+            if catalog is not None and composition_path.exists():
+                try:
+                    composition = FoodComposition.load(composition_path)
+                    self._nutrition_scorer = NutritionScorer.from_config(catalog, composition, nutrition_config)
+                except Exception as e:
+                    self.logger.warning(f"Error loading food composition table: {e}")
+        return self._nutrition_scorer
+    
+    def assess_nutrition(self, week_plan: List[Dict]) -> Optional[Dict]:
+        """Nutrition summary of a week plan, or None when balance checking is unavailable"""
+        scorer = self.get_nutrition_scorer()
+        if scorer is None:
+            return None
+        
+        try:
+            return scorer.assess(week_plan)
+        except Exception as e:
+            self.logger.warning(f"Error assessing nutrition: {e}")
+            return None
+    
     def get_week_start(self) -> date:
         """Get the start date of the week to generate menu for"""
         if self.intake_data and self.intake_data.week_start:
             return self.intake_data.week_start
+        if self.week_start:
+            return self.week_start
         
         # Default to current week's Monday
         today = datetime.now().date()
         days_back = today.weekday()
         return today - timedelta(days=days_back)
     
-    def create_menu_prompt(self, settings: Dict) -> str:
+    def get_meal_types(self) -> List[str]:
+        """Meal types enabled in rules.yaml (dinner when none are enabled)"""
+        meal_types = [meal['name'] for meal in self.config.get('meal_types') or [] if meal.get('enabled')]
+        return meal_types or [DEFAULT_MEAL_TYPE]
+    
+    @profiled('prompt_build')
+    def create_menu_prompt(self, settings: Dict, meal_type: str = DEFAULT_MEAL_TYPE) -> str:
         """Create prompt for OpenAI to generate weekly menu"""
         week_start = self.get_week_start()
         
         prompt = f"""
-あなたは日本の家庭料理の献立プランナーです。{week_start.strftime('%Y年%m月%d日')}（月曜日）から始まる週の夕食献立を作成してください。
+あなたは日本の家庭料理の献立プランナーです。{week_start.strftime('%Y年%m月%d日')}（月曜日）から始まる週の{meal_type}献立を作成してください。
 
 ## 条件:
 - 必要日数: {settings['days_needed']}日分
@@ -124,6 +381,18 @@ class MenuGenerator:
             
         if settings.get('guests_expected', 0) > 0:
             prompt += f"- 来客予定: {settings['guests_expected']}名\n"
+        
+        # Pantry hints are dinner dishes
+        if settings.get('pantry_hints') and meal_type == DEFAULT_MEAL_TYPE:
+            hints = ', '.join(f"{hint['name']}（在庫: {'・'.join(hint['pantry_ingredients'])}）"
+                              for hint in settings['pantry_hints'])
+            prompt += f"- 在庫を使い切れる料理の候補（できるだけ取り入れる）: {hints}\n"
+        
+        if settings.get('recent_dishes'):
+            prompt += f"- 最近の献立に出た料理（できるだけ避ける）: {', '.join(settings['recent_dishes'])}\n"
+        
+        if settings.get('nutrition_feedback'):
+            prompt += f"- 栄養バランスの改善点（前回の案の課題）: {'、'.join(settings['nutrition_feedback'])}\n"
 
         prompt += f"""
 ## 要求事項:
@@ -137,7 +406,7 @@ class MenuGenerator:
 
 ## 出力形式:
 ```
-### {week_start.strftime('%Y年%m月%d日')}週の夕食献立
+### {week_start.strftime('%Y年%m月%d日')}週の{meal_type}献立
 
 **月曜日 ({(week_start).strftime('%m/%d')})**
 - 料理名 (調理時間: XX分)
@@ -158,22 +427,26 @@ class MenuGenerator:
         days = ['月曜日', '火曜日', '水曜日', '木曜日', '金曜日', '土曜日', '日曜日']
         return days[day_index]
     
-    def generate_menu(self) -> str:
-        """Generate weekly menu using OpenAI with retry logic"""
-        settings = self.get_menu_settings()
-        prompt = self.create_menu_prompt(settings)
-        
+    def menu_request(self, prompt: str) -> Dict:
+        """Chat completion request body for one menu prompt (shared by direct and batch requests)"""
+        return {
+            'model': self.openai_model,
+            'messages': [
+                {"role": "system", "content": "あなたは経験豊富な日本の家庭料理の献立プランナーです。バランスの取れた美味しい献立を作成することが得意です。"},
+                {"role": "user", "content": prompt}
+            ],
+            'max_tokens': 1500,
+            'temperature': 0.7,
+        }
+    
+    @profiled('generation')
+    def request_menu(self, prompt: str) -> str:
+        """Request one menu from OpenAI with retry logic"""
         def _make_openai_request():
             self.logger.info(f"Generating menu using model: {self.openai_model}")
             response = self.openai_client.chat.completions.create(
-                model=self.openai_model,
-                messages=[
-                    {"role": "system", "content": "あなたは経験豊富な日本の家庭料理の献立プランナーです。バランスの取れた美味しい献立を作成することが得意です。"},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.7,
-                timeout=30  # 30 second timeout
+                **self.menu_request(prompt),
+                timeout=self.deadline.timeout(30)  # 30 second timeout, capped by the run deadline
             )
             return response.choices[0].message.content
         
@@ -185,30 +458,211 @@ class MenuGenerator:
             self.logger.error(f"Prompt length: {len(prompt)} characters")
             raise
     
-    def save_menu_data(self, menu_content: str):
-        """Save generated menu data for Notion integration"""
+    def get_speculative_cache(self) -> Optional[SpeculativeMenuCache]:
+        """Cache of precomputed default-settings menus, if enabled in rules.yaml"""
+        speculative_config = self.config.get('speculative') or {}
+        if self._speculative_cache is None and speculative_config.get('enabled'):
+            self._speculative_cache = SpeculativeMenuCache(speculative_config.get('path', DEFAULT_SPECULATIVE_PATH))
+        return self._speculative_cache
+    
+    def use_speculative_menu(self, settings: Dict) -> Optional[str]:
+        """Precomputed menu for these settings; a precomputed menu for other settings is discarded"""
+        cache = self.get_speculative_cache()
+        if cache is None:
+            return None
+        # Keyed by the configured household, which precompute runs know without an intake
+        user_id, week_start = self.user_id, self.get_week_start()
+        entry = cache.load(user_id, week_start)
+        if entry is None:
+            return None
+        if entry['fingerprint'] == settings_fingerprint(settings, self.get_meal_types(), self.openai_model):
+            self.logger.info(f"Using menu precomputed at {entry['generated_at']}")
+            return entry['menu_content']
+        
+        self.logger.info("Settings differ from the precomputed menu, discarding it")
+        cache.discard(user_id, week_start)
+        return None
+    
+    def precompute_menu(self) -> bool:
+        """Generate and cache this week's menu ahead of time; returns False when already cached"""
+        cache = self.get_speculative_cache()
+        if cache is None:
+            raise ValueError("Speculative menus are disabled in rules.yaml")
+        settings = self.get_menu_settings()
+        if self.use_speculative_menu(settings) is not None:
+            return False
+        menu_content = self.generate_balanced_menu(settings)
+        cache.store(self.user_id, self.get_week_start(),
+                    settings_fingerprint(settings, self.get_meal_types(), self.openai_model), menu_content, settings)
+        return True
+    
+    def get_spellings(self) -> Dict[str, str]:
+        """Ingredient spelling table, extended by reuse.spelling_variants in rules.yaml"""
+        if self._spellings is None:
+            self._spellings = spelling_table((self.config.get('reuse') or {}).get('spelling_variants'))
+        return self._spellings
+    
+    def reuse_similar_menu(self, settings: Dict) -> Optional[str]:
+        """Earlier menu for near-identical settings, repaired to satisfy these settings"""
+        reuse_config = self.config.get('reuse') or {}
+        history = self.get_history() if reuse_config.get('enabled') else None
+        if history is None:
+            return None
+        
+        try:
+            stats = ReuseStats(reuse_config.get('stats_path', DEFAULT_STATS_PATH))
+            index = MenuSimilarityIndex.for_history(history, reuse_config.get('max_entries', DEFAULT_MAX_ENTRIES),
+                                                    self.get_spellings())
+            # The household's own menus for this week and its recent weeks would only serve
+            # the same dishes again (or be replaced dish by dish), so they are not candidates
+            week_start = self.get_week_start()
+            recent_weeks = max((self.config.get('history') or {}).get('avoid_recent_weeks', 0), 1)
+            exclude_weeks = [(week_start - timedelta(weeks=i)).isoformat() for i in range(recent_weeks + 1)]
+            match = index.query(settings, self.get_meal_types(), exclude_user=self.get_user_id(),
+                                exclude_weeks=exclude_weeks)
+            repaired = None
+            if match is None:
+                outcome = 'no_candidate'
+            elif match.score < reuse_config.get('min_similarity', DEFAULT_MIN_SIMILARITY):
+                outcome = 'below_threshold'
+            else:
+                repairer = MenuRepairer(self.get_recipe_catalog(), self.get_spellings(),
+                                        reuse_config.get('max_repaired_fraction', DEFAULT_MAX_REPAIRED_FRACTION))
+                repaired = repairer.repair(match.entry['week_plan'], settings)
+                outcome = 'hit' if repaired is not None else 'repair_failed'
+            
+            counts = stats.record(outcome, repaired[1] if repaired else 0)
+            self.logger.info(f"Menu reuse: {outcome} (hit rate {ReuseStats.hit_rate(counts):.1%} "
+                             f"over {counts['lookups']} lookups)")
+            if repaired is None:
+                return None
+        except Exception as e:
+            self.logger.warning(f"Error looking up similar menus: {e}")
+            return None
+        
+        week_plan, repaired_dishes = repaired
+        for i, day in enumerate(week_plan):
+            day['date'] = (week_start + timedelta(days=i)).isoformat()
+        self.reused_from = {'user_id': match.entry['user_id'], 'week_start': match.entry['week_start'],
+                            'similarity': round(match.score, 3), 'repaired_dishes': repaired_dishes}
+        self.logger.info(f"Reusing the menu of week {match.entry['week_start']} "
+                         f"(similarity {match.score:.2f}, {repaired_dishes} dishes replaced)")
+        return render_week_plan(week_plan, f"{week_start.strftime('%Y年%m月%d日')}週の献立")
+    
+    def generate_menu(self) -> str:
+        """Generate weekly menu, using a matching precomputed or near-identical earlier menu when there is one"""
+        settings = self.get_menu_settings()
+        speculative = self.use_speculative_menu(settings)
+        if speculative is not None:
+            return speculative
+        reused = self.reuse_similar_menu(settings)
+        if reused is not None:
+            return reused
+        return self.generate_balanced_menu(settings)
+    
+    def generate_balanced_menu(self, settings: Dict) -> str:
+        """Generate weekly menu, regenerating imbalanced weeks up to max_regenerations times"""
+        menu_content = self.generate_menu_content(settings)
+        
+        max_regenerations = (self.config.get('nutrition') or {}).get('max_regenerations', 0)
+        for attempt in range(max_regenerations):
+            week_plan = parse_week_plan(menu_content, self.get_week_start(), self.get_meal_types())
+            assessment = self.assess_nutrition(week_plan)
+            if not assessment or assessment['balanced']:
+                break
+            if not self.deadline.has_budget(60):
+                self.logger.warning("Not enough time left to regenerate an imbalanced menu")
+                break
+            
+            self.logger.info(f"Menu is nutritionally imbalanced, regenerating ({attempt + 1}/{max_regenerations}): "
+                             f"{'; '.join(assessment['issues'])}")
+            menu_content = self.generate_menu_content({**settings, 'nutrition_feedback': assessment['issues']})
+        
+        return menu_content
+    
+    def generate_menu_content(self, settings: Dict) -> str:
+        """Generate weekly menu for every enabled meal type"""
+        meal_types = self.get_meal_types()
+        
+        if len(meal_types) == 1:
+            return self.request_menu(self.create_menu_prompt(settings, meal_types[0]))
+        
+        # One request per meal type, run concurrently so total latency stays
+        # close to a single dinner-only request
+        prompts = {meal_type: self.create_menu_prompt(settings, meal_type) for meal_type in meal_types}
+        with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+            futures = {meal_type: executor.submit(self.request_menu, prompt) for meal_type, prompt in prompts.items()}
+            contents = {meal_type: future.result() for meal_type, future in futures.items()}
+        
+        return self.combine_menu_contents(contents)
+    
+    def combine_menu_contents(self, contents: Dict[str, str]) -> str:
+        """Merge per-meal-type menus into one weekly menu"""
+        if len(contents) == 1:
+            return next(iter(contents.values()))
+        week_start = self.get_week_start()
+        plans = {meal_type: parse_week_plan(content, week_start, [meal_type]) for meal_type, content in contents.items()}
+        return render_week_plan(merge_week_plans(plans, week_start), f"{week_start.strftime('%Y年%m月%d日')}週の献立")
+    
+    @profiled('build_menu_data')
+    def build_menu_data(self, menu_content: str) -> Dict:
+        """Build the menu record consumed by the Notion integration"""
         week_start = self.get_week_start()
         settings = self.get_menu_settings()
+        meal_types = self.get_meal_types()
+        week_plan = parse_week_plan(menu_content, week_start, meal_types)
         
         menu_data = {
             'week_start': week_start.isoformat(),
             'generated_at': datetime.now().isoformat(),
             'menu_content': menu_content,
+            'meal_types': meal_types,
+            'week_plan': week_plan,
             'settings_used': settings,
             'intake_data_available': self.intake_data is not None
         }
         
-        output_path = Path('data/generated_menu.json')
-        output_path.parent.mkdir(exist_ok=True)
+        shopping_list = self.get_shopping_list(week_plan, settings)
+        if shopping_list is not None:
+            menu_data['shopping_list'] = shopping_list
+        
+        nutrition = self.assess_nutrition(week_plan)
+        if nutrition is not None:
+            menu_data['nutrition'] = nutrition
+        
+        recipe_links = self.get_recipe_links(week_plan, settings)
+        if recipe_links:
+            menu_data['recipe_links'] = recipe_links
+        
+        if self.reused_from is not None:
+            menu_data['reused_from'] = self.reused_from
+        
+        return menu_data
+    
+    @profiled('save_menu')
+    def save_menu_data(self, menu_content: str, output_path: str = 'data/generated_menu.json') -> Dict:
+        """Save generated menu data for Notion integration"""
+        menu_data = self.build_menu_data(menu_content)
+        
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(menu_data, f, ensure_ascii=False, indent=2, default=str)
         
         print(f"Menu data saved to {output_path}")
+        self.record_history(menu_data)
+        return menu_data
 
 
 def main():
     """Main function to generate weekly menu"""
+    parser = argparse.ArgumentParser(description="Generate the weekly menu")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'generate_menu')
+    
     try:
         generator = MenuGenerator()
         print("Generating weekly menu...")
@@ -227,6 +681,8 @@ def main():
     except Exception as e:
         print(f"Error generating menu: {e}")
         sys.exit(1)
+    finally:
+        finish_profiling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+"""
+Local store for intake submissions pushed by the Dify webhook.
+
+Intakes are deduplicated by (conversation_id, week_start) and persisted as
+one JSON file per key. The intake for the latest week is also written to
+data/intake.json, which is where generate_menu.py looks for it; a late
+delivery for an earlier week is stored but does not replace it.
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+from schemas.intake_schema import IntakeData
+
+
+class IntakeStore:
+    def __init__(self, base_dir: str = 'data'):
+        self.logger = logging.getLogger(__name__)
+        self.base_dir = Path(base_dir)
+        self.intakes_dir = self.base_dir / 'intakes'
+        self.latest_path = self.base_dir / 'intake.json'
+
+    def key_path(self, intake: IntakeData) -> Path:
+        """File holding the intake for its conversation and week"""
+        conversation = intake.conversation_id or 'anonymous'
+        safe_conversation = ''.join(c if c.isalnum() or c in '-_' else '_' for c in conversation)
+        return self.intakes_dir / intake.week_start.isoformat() / f"{safe_conversation}.json"
+
+    def load(self, path: Path) -> Optional[IntakeData]:
+        if not path.exists():
+            return None
+        return IntakeData.model_validate_json(path.read_bytes())
+
+    def save(self, intake: IntakeData) -> Tuple[str, Path]:
+        """Persist an intake unless it duplicates or predates the one already stored.
+
+        Returns (status, path), status being 'stored', 'duplicate' for a
+        re-delivery of the stored intake, or 'stale' for a changed intake
+        older than the stored one, which is ignored.
+        """
+        path = self.key_path(intake)
+        ignored = self.check(intake)
+        if ignored is not None:
+            self.logger.info(f"{ignored.capitalize()} intake for {intake.conversation_id}/{intake.week_start}, "
+                             f"ignoring")
+            return ignored, path
+
+        content = intake.model_dump_json(indent=2)
+        self._write_atomic(path, content)
+        if self._is_latest_week(intake):
+            self._write_atomic(self.latest_path, content)
+        self.logger.info(f"Stored intake for week {intake.week_start} at {path}")
+        return 'stored', path
+
+    def check(self, intake: IntakeData) -> Optional[str]:
+        """'duplicate' or 'stale' when save() would ignore the intake, None when it would store it"""
+        existing = self.load(self.key_path(intake))
+        if existing is None:
+            return None
+        if self._is_duplicate(existing, intake):
+            return 'duplicate'
+        if self._is_stale(existing, intake):
+            return 'stale'
+        return None
+
+    @staticmethod
+    def _is_duplicate(existing: IntakeData, incoming: IntakeData) -> bool:
+        return existing.model_dump(exclude={'timestamp'}) == incoming.model_dump(exclude={'timestamp'})
+
+    @staticmethod
+    def _is_stale(existing: IntakeData, incoming: IntakeData) -> bool:
+        # Naive timestamps are compared as local time
+        return existing.timestamp.timestamp() >= incoming.timestamp.timestamp()
+
+    def _is_latest_week(self, intake: IntakeData) -> bool:
+        """Whether the intake is for the same week as data/intake.json or a later one"""
+        try:
+            latest = self.load(self.latest_path)
+        except ValueError as e:
+            self.logger.warning(f"Replacing unreadable {self.latest_path}: {e}")
+            return True
+        return latest is None or intake.week_start >= latest.week_start
+
+    def _write_atomic(self, path: Path, content: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
@@ -0,0 +1,209 @@
+"""
+Append-only local history of generated menus and the intakes behind them.
+
+Records are zlib-compressed JSON appended to history.log; each starts with a
+small header (magic, kind, payload length, CRC) so the log can be scanned
+and verified on its own. A sidecar index (history.idx) of fixed-width
+entries maps a digest of (user_id, week_start) and the record kind to the
+record's offset. Readers keep the index in a dict, reading only the entries
+appended since their last lookup, and read records from an mmap of the log,
+so looking up any past week is O(1), sees records of other writers, and
+never needs Notion.
+
+If a writer dies between appending a record and its index entry, the next
+open re-indexes the unindexed tail of the log; a torn final record is
+dropped by the next writer.
+"""
+
+import os
+import json
+import mmap
+import zlib
+import fcntl
+import struct
+import hashlib
+import logging
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from schemas.intake_schema import IntakeData
+
+RECORD_MAGIC = b'MH'
+RECORD_HEADER = struct.Struct('<2sBxII')   # magic, kind, payload length, crc32
+INDEX_ENTRY = struct.Struct('<16sBxxxQI')  # key digest, kind, record offset, payload length
+
+KINDS = {'menu': 1, 'intake': 2}
+
+
+def history_key(user_id: Optional[str], week_start: Union[str, date]) -> bytes:
+    """Index key of a household's week (records without a user_id share the '' household)"""
+    week = week_start.isoformat() if isinstance(week_start, date) else week_start
+    return hashlib.blake2b(f"{user_id or ''}\x00{week}".encode('utf-8'), digest_size=16).digest()
+
+
+class MenuHistory:
+    def __init__(self, path: str = 'data/history'):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.log_path = self.path / 'history.log'
+        self.index_path = self.path / 'history.idx'
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.log_path.touch(exist_ok=True)
+        self.index_path.touch(exist_ok=True)
+
+        self._index: Dict[Tuple[bytes, int], Tuple[int, int]] = {}
+        self._index_size = 0  # Bytes of the sidecar already loaded
+        self._log_end = 0     # End of the last indexed record
+        self._map: Optional[mmap.mmap] = None
+        self._load_index()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self) -> 'MenuHistory':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        self._load_index()
+        return len(self._index)
+
+    # Index maintenance
+
+    def _load_index(self):
+        """Load index entries written since the last call, then index any unindexed log tail"""
+        with open(self.index_path, 'rb') as f:
+            f.seek(self._index_size)
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for digest, kind, offset, length in INDEX_ENTRY.iter_unpack(data[:usable]):
+            self._index[(digest, kind)] = (offset, length)
+            self._log_end = max(self._log_end, offset + RECORD_HEADER.size + length)
+        self._index_size += usable
+
+        for offset, kind, length, payload in self._scan(self._log_end):
+            record = json.loads(payload)
+            self._index[(history_key(record['user_id'], record['week_start']), kind)] = (offset, length)
+            self._log_end = offset + RECORD_HEADER.size + length
+
+    def _scan(self, start: int) -> Iterator[Tuple[int, int, int, bytes]]:
+        """Complete, verified records from start: (offset, kind, payload length, payload)"""
+        with open(self.log_path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                magic, kind, length, crc = RECORD_HEADER.unpack(header)
+                compressed = f.read(length)
+                if magic != RECORD_MAGIC or len(compressed) < length or zlib.crc32(compressed) != crc:
+                    return
+                yield offset, kind, length, zlib.decompress(compressed)
+                offset += RECORD_HEADER.size + length
+
+    def _repair(self, log, index) -> int:
+        """Called under the write lock: index the unindexed log tail, drop a torn record; returns the log end"""
+        index.seek(0, os.SEEK_END)
+        size = index.tell() - index.tell() % INDEX_ENTRY.size
+        index.truncate(size)
+
+        end = 0
+        if size:
+            with open(self.index_path, 'rb') as f:
+                f.seek(size - INDEX_ENTRY.size)
+                _, _, offset, length = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+            end = offset + RECORD_HEADER.size + length
+
+        for offset, kind, length, payload in self._scan(end):
+            record = json.loads(payload)
+            index.write(INDEX_ENTRY.pack(history_key(record['user_id'], record['week_start']), kind, offset, length))
+            end = offset + RECORD_HEADER.size + length
+        index.flush()
+
+        log.seek(0, os.SEEK_END)
+        if log.tell() > end:
+            self.logger.warning(f"Dropping {log.tell() - end} bytes of incomplete history record")
+            log.truncate(end)
+        return end
+
+    # Writing
+
+    def append(self, kind: str, user_id: Optional[str], week_start: Union[str, date], data: Dict) -> int:
+        """Append a record; returns its offset in the log"""
+        week = week_start.isoformat() if isinstance(week_start, date) else week_start
+        payload = json.dumps({
+            'kind': kind,
+            'user_id': user_id or '',
+            'week_start': week,
+            'recorded_at': datetime.now().isoformat(),
+            'data': data,
+        }, ensure_ascii=False, default=str).encode('utf-8')
+        compressed = zlib.compress(payload)
+        header = RECORD_HEADER.pack(RECORD_MAGIC, KINDS[kind], len(compressed), zlib.crc32(compressed))
+
+        with open(self.log_path, 'r+b') as log, open(self.index_path, 'ab') as index:
+            # One writer at a time across threads and processes
+            fcntl.flock(log, fcntl.LOCK_EX)
+            try:
+                offset = self._repair(log, index)
+                log.seek(offset)
+                log.write(header + compressed)
+                log.flush()
+                os.fsync(log.fileno())
+
+                index.write(INDEX_ENTRY.pack(history_key(user_id, week), KINDS[kind], offset, len(compressed)))
+                index.flush()
+            finally:
+                fcntl.flock(log, fcntl.LOCK_UN)
+
+        self._load_index()
+        return offset
+
+    def append_menu(self, menu_data: Dict, user_id: Optional[str] = None) -> int:
+        return self.append('menu', user_id, menu_data['week_start'], menu_data)
+
+    def append_intake(self, intake: IntakeData, user_id: Optional[str] = None) -> int:
+        """Record an intake under user_id (the household its menu is recorded for), else its own user_id"""
+        return self.append('intake', user_id or intake.user_id, intake.week_start, intake.model_dump(mode='json'))
+
+    # Reading
+
+    def _read(self, offset: int, length: int) -> Dict:
+        end = offset + RECORD_HEADER.size + length
+        if self._map is None or len(self._map) < end:
+            self.close()
+            with open(self.log_path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = offset + RECORD_HEADER.size
+        return json.loads(zlib.decompress(self._map[start:end]))
+
+    def get(self, user_id: Optional[str], week_start: Union[str, date], kind: str = 'menu') -> Optional[Dict]:
+        """Latest record of a kind for a household's week, or None"""
+        # Pick up records appended by other writers, which may supersede an indexed one
+        self._load_index()
+        location = self._index.get((history_key(user_id, week_start), KINDS[kind]))
+        return self._read(*location)['data'] if location else None
+
+    def recent(self, user_id: Optional[str], week_start: Union[str, date], weeks: int = 4,
+               kind: str = 'menu') -> List[Dict]:
+        """Records for the weeks before week_start, newest first"""
+        if isinstance(week_start, str):
+            week_start = date.fromisoformat(week_start)
+        records = (self.get(user_id, week_start - timedelta(weeks=i), kind) for i in range(1, weeks + 1))
+        return [record for record in records if record is not None]
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Every record in append order, including superseded ones (for analytics and replays)"""
+        for _, record in self.records_after(0):
+            yield record
+
+    def records_after(self, offset: int) -> Iterator[Tuple[int, Dict]]:
+        """Records from a log offset on, each with the offset following it (for incremental readers)"""
+        for start, _, length, payload in self._scan(offset):
+            yield start + RECORD_HEADER.size + length, json.loads(payload)
@@ -0,0 +1,376 @@
+"""
+Reuse of earlier menus for near-duplicate settings.
+
+Settings are first canonicalized: list settings are sorted and deduplicated,
+ingredient names are mapped to one spelling (玉葱/タマネギ/たまねぎ → 玉ねぎ),
+max_cooking_time is rounded down to a bucket and memo whitespace is
+normalized, so intakes that differ only in presentation produce the same
+settings and prompt.
+
+MenuSimilarityIndex keeps the canonical settings of menus recorded in the
+local history. Menus with the same structure (days needed, away days,
+dietary preferences, meal types) are compared by weighted Jaccard
+similarity over their settings features (avoided ingredients, cooking time
+bucket, guests, occasions, recipe sites and memo character trigrams). When the best
+match is close enough, MenuRepairer re-validates its dishes against the new
+settings and replaces offending dishes with catalog recipes; the repaired
+menu is used instead of a new generation. Outcomes are counted in a small
+stats file (python -m scripts.menu_reuse --stats).
+"""
+
+import os
+import sys
+import json
+import fcntl
+import argparse
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from scripts.menu_history import MenuHistory
+from scripts.menu_structure import NO_COOKING_ITEMS
+from scripts.recipe_catalog import RecipeCatalog, normalize_ingredient
+
+DEFAULT_STATS_PATH = 'data/reuse_stats.json'
+DEFAULT_MIN_SIMILARITY = 0.7
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_MAX_REPAIRED_FRACTION = 0.3  # Share of cooked dishes a reused menu may have replaced
+
+# max_cooking_time is rounded down to one of these, so the reused menu never exceeds the request
+COOKING_TIME_BUCKETS = (10, 15, 20, 30, 45, 60, 90, 120, 180)
+
+# Canonical spelling: variants
+SPELLING_VARIANTS = {
+    '玉ねぎ': ['たまねぎ', '玉葱', '玉ネギ', 'オニオン'],
+    'にんじん': ['人参', 'キャロット'],
+    'じゃがいも': ['じゃが芋', '馬鈴薯', 'ポテト'],
+    'ねぎ': ['葱'],
+    'しいたけ': ['椎茸'],
+    'なす': ['茄子'],
+    'かぼちゃ': ['南瓜'],
+    'ごぼう': ['牛蒡'],
+    '卵': ['たまご', '玉子', '鶏卵'],
+    '鶏肉': ['とり肉', '鳥肉', 'チキン'],
+    '豚肉': ['ぶた肉', 'ポーク'],
+    '牛肉': ['ぎゅう肉', 'ビーフ'],
+    '鮭': ['さけ', 'しゃけ', 'サーモン'],
+    'えび': ['海老', '蝦'],
+    'いか': ['烏賊'],
+    'たこ': ['蛸'],
+    '豆腐': ['とうふ'],
+    '牛乳': ['ミルク'],
+    '小麦': ['小麦粉'],
+    'そば': ['蕎麦'],
+    '落花生': ['ピーナッツ', 'ピーナツ'],
+}
+
+# Settings that depend on the household or the week and are checked by repair instead
+PER_RUN_SETTINGS = ('recent_dishes', 'pantry_hints', 'nutrition_feedback')
+
+# Avoided ingredients and cooking time are enforced by repair, memo and occasions are not, so they weigh more
+FEATURE_WEIGHTS = {'avoid': 1.5, 'time': 1.0, 'guests': 1.0, 'occasion': 2.0, 'site': 0.5}
+MEMO_WEIGHT = 3.0  # Shared by all trigrams of the memo
+
+
+def fold_kana(text: str) -> str:
+    """Katakana to hiragana, so カボチャ and かぼちゃ compare equal"""
+    return ''.join(chr(ord(c) - 0x60) if 'ァ' <= c <= 'ヶ' else c for c in text)
+
+
+def spelling_table(extra: Optional[Dict[str, List[str]]] = None) -> Dict[str, str]:
+    """Lookup from folded variant spellings to the canonical spelling"""
+    table = {}
+    for canonical, variants in {**SPELLING_VARIANTS, **(extra or {})}.items():
+        for spelling in [canonical, *variants]:
+            table[fold_kana(normalize_ingredient(spelling))] = normalize_ingredient(canonical)
+    return table
+
+
+_DEFAULT_SPELLINGS = spelling_table()
+
+
+def canonical_ingredient(name: str, spellings: Optional[Dict[str, str]] = None) -> str:
+    normalized = normalize_ingredient(name)
+    return (spellings or _DEFAULT_SPELLINGS).get(fold_kana(normalized), normalized)
+
+
+def bucket_cooking_time(minutes: int) -> int:
+    fitting = [bucket for bucket in COOKING_TIME_BUCKETS if bucket <= minutes]
+    return fitting[-1] if fitting else minutes
+
+
+def canonical_text(text: str) -> str:
+    """Memo text without case, width, whitespace and punctuation differences"""
+    return ''.join(c for c in fold_kana(unicodedata.normalize('NFKC', text).lower())
+                   if unicodedata.category(c)[0] in 'LN')
+
+
+def canonicalize_settings(settings: Dict, spellings: Optional[Dict[str, str]] = None) -> Dict:
+    """Settings with presentation-only differences removed"""
+    canonical = dict(settings)
+    canonical['away_days'] = sorted(set(settings.get('away_days') or []))
+    canonical['avoid_ingredients'] = sorted({canonical_ingredient(name, spellings)
+                                             for name in settings.get('avoid_ingredients') or []})
+    canonical['dietary_preferences'] = sorted({normalize_ingredient(item)
+                                               for item in settings.get('dietary_preferences') or []})
+    canonical['max_cooking_time'] = bucket_cooking_time(settings['max_cooking_time'])
+    # Recipe sites are listed by priority, so only duplicates are removed
+    sites = [site.strip().lower().removeprefix('www.') for site in settings.get('priority_recipe_sites') or []]
+    canonical['priority_recipe_sites'] = list(dict.fromkeys(sites))
+    if settings.get('special_occasions'):
+        canonical['special_occasions'] = sorted({item.strip() for item in settings['special_occasions']})
+    if settings.get('special_memo'):
+        canonical['special_memo'] = ' '.join(unicodedata.normalize('NFKC', settings['special_memo']).split())
+    return canonical
+
+
+def structure_key(settings: Dict, meal_types: List[str]) -> Tuple:
+    """Settings a reused menu must match exactly (dietary restrictions cannot be checked by repair)"""
+    return (settings['days_needed'], tuple(settings['away_days']), tuple(settings['dietary_preferences']),
+            tuple(meal_types))
+
+
+def settings_features(settings: Dict) -> Dict[str, float]:
+    features = {f"avoid:{name}": FEATURE_WEIGHTS['avoid'] for name in settings['avoid_ingredients']}
+    features.update((f"occasion:{item}", FEATURE_WEIGHTS['occasion'])
+                    for item in settings.get('special_occasions') or [])
+    features.update((f"site:{site}", FEATURE_WEIGHTS['site']) for site in settings['priority_recipe_sites'][:3])
+    features[f"time:{settings['max_cooking_time']}"] = FEATURE_WEIGHTS['time']
+    features[f"guests:{settings.get('guests_expected', 0)}"] = FEATURE_WEIGHTS['guests']
+
+    memo = canonical_text(settings.get('special_memo') or '')
+    trigrams = {memo[i:i + 3] for i in range(max(1, len(memo) - 2))} if memo else set()
+    features.update((f"memo:{trigram}", MEMO_WEIGHT / len(trigrams)) for trigram in trigrams)
+    return features
+
+
+def similarity(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """Weighted Jaccard similarity of two feature maps"""
+    keys = a.keys() | b.keys()
+    union = sum(max(a.get(key, 0.0), b.get(key, 0.0)) for key in keys)
+    if not union:
+        return 1.0
+    return sum(min(a.get(key, 0.0), b.get(key, 0.0)) for key in keys) / union
+
+
+class ReuseMatch(NamedTuple):
+    score: float
+    entry: Dict
+
+
+class MenuSimilarityIndex:
+    _instances: Dict[str, 'MenuSimilarityIndex'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, spellings: Optional[Dict[str, str]] = None):
+        self.max_entries = max_entries
+        self.spellings = spellings
+        self.entries: Dict[Tuple, List[Dict]] = {}
+        self._order: List[Tuple] = []  # Structure key of each entry, oldest first
+        self._offset = 0               # History log position already indexed
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_history(cls, history: MenuHistory, max_entries: int = DEFAULT_MAX_ENTRIES,
+                    spellings: Optional[Dict[str, str]] = None) -> 'MenuSimilarityIndex':
+        """Process-wide index of a history, brought up to date with records appended since the last call"""
+        with cls._instances_lock:
+            key = str(history.path.resolve())
+            if key not in cls._instances:
+                cls._instances[key] = cls(max_entries, spellings)
+            index = cls._instances[key]
+        index.refresh(history)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def refresh(self, history: MenuHistory):
+        with self._lock:
+            for offset, record in history.records_after(self._offset):
+                if record['kind'] == 'menu' and record['data'].get('settings_used'):
+                    self._add(record['user_id'], record['data'])
+                self._offset = offset
+
+    def add(self, user_id: Optional[str], menu_data: Dict):
+        with self._lock:
+            self._add(user_id, menu_data)
+
+    def _add(self, user_id: Optional[str], menu_data: Dict):
+        settings = {key: value for key, value in menu_data['settings_used'].items() if key not in PER_RUN_SETTINGS}
+        settings = canonicalize_settings(settings, self.spellings)
+        meal_types = menu_data.get('meal_types') or []
+        key = structure_key(settings, meal_types)
+        self.entries.setdefault(key, []).append({
+            'user_id': user_id or '',
+            'week_start': menu_data['week_start'],
+            'meal_types': meal_types,
+            'week_plan': menu_data['week_plan'],
+            'settings': settings,
+            'features': settings_features(settings),
+        })
+        self._order.append(key)
+
+        if len(self._order) > self.max_entries:
+            oldest = self._order.pop(0)
+            self.entries[oldest].pop(0)
+
+    def query(self, settings: Dict, meal_types: List[str], exclude_user: Optional[str] = None,
+              exclude_weeks: Iterable[str] = ()) -> Optional[ReuseMatch]:
+        """Most similar indexed menu with the same structure (latest wins ties).
+
+        Menus of exclude_user for exclude_weeks are skipped: a household's own
+        recent menus consist of recent dishes and would just be served again.
+        """
+        features = settings_features(settings)
+        exclude_weeks = set(exclude_weeks)
+        best = None
+        with self._lock:
+            for entry in self.entries.get(structure_key(settings, meal_types), []):
+                if entry['user_id'] == (exclude_user or '') and entry['week_start'] in exclude_weeks:
+                    continue
+                score = similarity(features, entry['features'])
+                if best is None or score >= best.score:
+                    best = ReuseMatch(score, entry)
+        return best
+
+
+class MenuRepairer:
+    """Validates a reused week plan against new settings and swaps offending dishes for catalog recipes"""
+
+    def __init__(self, catalog: Optional[RecipeCatalog] = None, spellings: Optional[Dict[str, str]] = None,
+                 max_repaired_fraction: float = DEFAULT_MAX_REPAIRED_FRACTION):
+        self.catalog = catalog
+        self.spellings = spellings
+        self.max_repaired_fraction = max_repaired_fraction
+        if catalog is not None:
+            self._canonical_ingredients = np.asarray([canonical_ingredient(name, spellings)
+                                                      for name in catalog.ingredient_names], dtype=object)
+
+    def _avoided_recipes(self, avoid: Iterable[str]) -> np.ndarray:
+        """Boolean mask of catalog recipes containing an avoided ingredient"""
+        avoided_ids = np.flatnonzero(np.isin(self._canonical_ingredients, list(avoid)))
+        hits = np.isin(self.catalog.indices, avoided_ids).astype(np.float64)
+        return self.catalog.row_sums(hits) > 0
+
+    def violation(self, dish: Dict, settings: Dict, avoided: Optional[np.ndarray]) -> Optional[str]:
+        name = dish['name']
+        recipe = self.catalog.find(name) if self.catalog is not None else None
+        cooking_time = dish.get('cooking_time')
+        if cooking_time is None and recipe is not None:
+            cooking_time = int(self.catalog.cooking_time[recipe])
+        if cooking_time is not None and cooking_time > settings['max_cooking_time']:
+            return 'cooking time'
+        if name in (settings.get('recent_dishes') or []):
+            return 'recent'
+        canonical_name = canonical_ingredient(name, self.spellings)
+        if any(ingredient in canonical_name for ingredient in settings['avoid_ingredients']):
+            return 'avoided ingredient'
+        if recipe is not None and avoided is not None and avoided[recipe]:
+            return 'avoided ingredient'
+        return None
+
+    def replacement(self, dish: Dict, settings: Dict, avoided: np.ndarray, used: set) -> Optional[Dict]:
+        if self.catalog is None:
+            return None
+        usable = (self.catalog.cooking_time <= settings['max_cooking_time']) & ~avoided
+        excluded = used | set(settings.get('recent_dishes') or [])
+        candidates = [i for i in np.flatnonzero(usable) if self.catalog.names[i] not in excluded]
+        if not candidates:
+            return None
+        # Prefer a recipe of the same category as the dish it replaces
+        original = self.catalog.find(dish['name'])
+        if original is not None:
+            same_category = [i for i in candidates if self.catalog.category[i] == self.catalog.category[original]]
+            candidates = same_category or candidates
+        recipe = candidates[0]
+        return {'name': self.catalog.names[recipe], 'cooking_time': int(self.catalog.cooking_time[recipe])}
+
+    def repair(self, week_plan: List[Dict], settings: Dict) -> Optional[Tuple[List[Dict], int]]:
+        """Repaired copy of the plan and the number of replaced dishes.
+
+        None when a dish cannot be replaced or more than max_repaired_fraction
+        of the cooked dishes would be, at which point the menu is no longer
+        the one that matched.
+        """
+        avoided = self._avoided_recipes(settings['avoid_ingredients']) if self.catalog is not None else None
+        plan = [dict(day, meals={meal: [dict(dish) for dish in dishes] for meal, dishes in day['meals'].items()})
+                for day in week_plan]
+        used = {dish['name'] for day in plan for dishes in day['meals'].values() for dish in dishes}
+        cooked = sum(dish['name'] not in NO_COOKING_ITEMS
+                     for day in plan for dishes in day['meals'].values() for dish in dishes)
+        repaired = 0
+        for day in plan:
+            for dishes in day['meals'].values():
+                for i, dish in enumerate(dishes):
+                    if dish['name'] in NO_COOKING_ITEMS or not self.violation(dish, settings, avoided):
+                        continue
+                    replacement = self.replacement(dish, settings, avoided, used) if avoided is not None else None
+                    if replacement is None:
+                        return None
+                    dishes[i] = replacement
+                    used.add(replacement['name'])
+                    repaired += 1
+                    if repaired > self.max_repaired_fraction * cooked:
+                        return None
+        return plan, repaired
+
+
+class ReuseStats:
+    """Reuse outcome counters shared by every run on this machine"""
+
+    OUTCOMES = ('hit', 'no_candidate', 'below_threshold', 'repair_failed')
+
+    def __init__(self, path: str = DEFAULT_STATS_PATH):
+        self.path = Path(path)
+
+    def load(self) -> Dict:
+        if not self.path.exists():
+            return {'lookups': 0, 'repaired_dishes': 0, **{outcome: 0 for outcome in self.OUTCOMES}}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def record(self, outcome: str, repaired_dishes: int = 0) -> Dict:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix('.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = self.load()
+            stats['lookups'] += 1
+            stats[outcome] = stats.get(outcome, 0) + 1
+            stats['repaired_dishes'] += repaired_dishes
+            tmp_path = self.path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=2)
+            os.replace(tmp_path, self.path)
+        return stats
+
+    @staticmethod
+    def hit_rate(stats: Dict) -> float:
+        return stats['hit'] / stats['lookups'] if stats['lookups'] else 0.0
+
+    def report(self) -> str:
+        stats = self.load()
+        lines = [f"Lookups: {stats['lookups']}", f"Hit rate: {self.hit_rate(stats):.1%}"]
+        lines.extend(f"  {outcome}: {stats.get(outcome, 0)}" for outcome in self.OUTCOMES)
+        lines.append(f"Dishes repaired in reused menus: {stats['repaired_dishes']}")
+        return '\n'.join(lines)
+
+
+def main():
+    """Print reuse hit rates"""
+    parser = argparse.ArgumentParser(description="Near-duplicate menu reuse statistics")
+    parser.add_argument('--stats', default=DEFAULT_STATS_PATH, help="Stats file")
+    args = parser.parse_args()
+
+    try:
+        print(ReuseStats(args.stats).report())
+    except Exception as e:
+        print(f"Error reading reuse stats: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
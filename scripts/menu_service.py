@@ -0,0 +1,356 @@
+"""
+Long-running menu service.
+
+Accepts IntakeData submissions over HTTP on localhost, queues generation and
+Notion publish jobs and processes them on a bounded worker pool that reuses
+warm OpenAI/Notion clients (and their connection pools) across jobs.
+
+Endpoints:
+    POST /intake        Submit an intake JSON document, returns a job id
+    POST /webhook/intake
+                        Push endpoint for Dify's HTTP Request tool: stores the
+                        intake (deduplicated by conversation/week) and
+                        optionally queues generation immediately
+    GET  /jobs/<id>     Job status
+    GET  /status        Queue depth, worker count and job counts
+
+Usage:
+    python -m scripts.menu_service --port 8080 --workers 2
+"""
+
+import os
+import sys
+import hmac
+import json
+import uuid
+import asyncio
+import logging
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+from typing import Dict, Optional, Tuple
+
+from openai import OpenAI
+from notion_client import Client
+from pydantic import BaseModel, Field, ValidationError
+
+from schemas.intake_schema import IntakeData
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+from scripts.intake_store import IntakeStore
+from scripts.notion_update import NotionMenuUpdater
+from scripts.profiling import add_profile_argument, enable_profiling, finish_profiling, profiled
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+MAX_BODY_BYTES = 1024 * 1024   # Intake documents are a few KB
+READ_TIMEOUT = 10              # Seconds to receive a complete request
+JOB_BUDGET_SECONDS = 600       # Run deadline for a single generate + publish job
+MAX_RETAINED_JOBS = 1000       # Finished jobs kept for status queries
+
+HTTP_REASONS = {
+    200: 'OK',
+    202: 'Accepted',
+    400: 'Bad Request',
+    401: 'Unauthorized',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    422: 'Unprocessable Entity',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class HTTPError(Exception):
+    """Error returned to the client as a JSON response"""
+
+    def __init__(self, status: int, message: str, **detail):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.detail = detail
+
+
+class Job(BaseModel):
+    """Status of one generation and publish job"""
+
+    job_id: str
+    status: str = Field(default="queued", description="queued, generating, publishing, done or failed")
+    week_start: date
+    user_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+    page_id: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+
+class MenuService:
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, workers: int = 2, queue_size: int = 100,
+                 openai_client: Optional[OpenAI] = None, notion_client: Optional[Client] = None,
+                 job_budget: float = JOB_BUDGET_SECONDS, intake_store: Optional[IntakeStore] = None,
+                 webhook_trigger: bool = False, webhook_token: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_size = queue_size
+        self.job_budget = job_budget
+
+        # Warm clients shared by every job
+        self.openai_client = openai_client or OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        if notion_client is None and os.getenv('NOTION_TOKEN'):
+            notion_client = Client(auth=os.getenv('NOTION_TOKEN'))
+        self.notion_client = notion_client
+        if self.notion_client is None:
+            self.logger.warning("NOTION_TOKEN not set, jobs will generate menus without publishing")
+
+        # Webhook intakes are persisted for the scheduled run and optionally
+        # generated right away
+        self.intake_store = intake_store or IntakeStore()
+        self.webhook_trigger = webhook_trigger
+        self.webhook_token = webhook_token if webhook_token is not None else os.getenv('INTAKE_WEBHOOK_TOKEN')
+
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.routes = {
+            ('POST', '/intake'): self.handle_intake,
+            ('POST', '/webhook/intake'): self.handle_webhook_intake,
+            ('GET', '/status'): self.handle_status,
+        }
+        self.queue: Optional[asyncio.Queue] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker_tasks = []
+
+    # Job processing
+
+    def submit(self, intake: IntakeData) -> Job:
+        """Queue a generation job for a validated intake"""
+        job = Job(job_id=uuid.uuid4().hex, week_start=intake.week_start, user_id=intake.user_id)
+        try:
+            self.queue.put_nowait((job.job_id, intake))
+        except asyncio.QueueFull:
+            raise HTTPError(503, "Job queue is full", queue_depth=self.queue.qsize())
+
+        self.jobs[job.job_id] = job
+        self._prune_jobs()
+        self.logger.info(f"Queued job {job.job_id} for week {job.week_start}")
+        return job
+
+    def _prune_jobs(self):
+        """Drop the oldest finished jobs beyond the retention limit"""
+        excess = len(self.jobs) - MAX_RETAINED_JOBS
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished][:max(excess, 0)]:
+            del self.jobs[job_id]
+
+    def _set_status(self, job: Job, status: str):
+        job.status = status
+        job.updated_at = datetime.now()
+        self.logger.info(f"Job {job.job_id}: {status}")
+
+    @profiled('job')
+    def run_job(self, job: Job, intake: IntakeData):
+        """Generate and publish one menu (runs on a worker thread)"""
+        deadline = RunDeadline.after(self.job_budget)
+        try:
+            self._set_status(job, "generating")
+            generator = MenuGenerator(deadline=deadline, openai_client=self.openai_client, intake_data=intake)
+            menu_data = generator.build_menu_data(generator.generate_menu())
+            generator.record_history(menu_data)
+
+            if self.notion_client is not None:
+                self._set_status(job, "publishing")
+                updater = NotionMenuUpdater(deadline=deadline, notion_client=self.notion_client)
+                job.page_id = updater.update_menu(menu_data)
+
+            self._set_status(job, "done")
+        except Exception as e:
+            self.logger.error(f"Job {job.job_id} failed: {e}")
+            job.error = str(e)
+            self._set_status(job, "failed")
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, intake = await self.queue.get()
+            try:
+                await loop.run_in_executor(self._executor, self.run_job, self.jobs[job_id], intake)
+            finally:
+                self.queue.task_done()
+
+    # HTTP handlers
+
+    async def handle_intake(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict]:
+        intake = parse_intake(body)
+        job = self.submit(intake)
+        return 202, {'job_id': job.job_id, 'status': job.status}
+
+    async def handle_webhook_intake(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict]:
+        if self.webhook_token:
+            token = headers.get('x-webhook-token', '')
+            if not hmac.compare_digest(token.encode('utf-8'), self.webhook_token.encode('utf-8')):
+                raise HTTPError(401, "Invalid webhook token")
+
+        intake = parse_intake(body)
+        ignored = self.intake_store.check(intake)
+        if ignored is not None:
+            return 200, {'status': ignored}
+
+        # Stored only once its job is queued: an intake rejected with 503 is not a duplicate on redelivery
+        job = self.submit(intake) if self.webhook_trigger else None
+        self.intake_store.save(intake)
+        if job is None:
+            return 202, {'status': 'stored'}
+        return 202, {'status': 'stored', 'job_id': job.job_id}
+
+    async def handle_status(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, Dict]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+
+        return 200, {
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue_size,
+            'workers': self.workers,
+            'jobs': counts,
+        }
+
+    def handle_job(self, job_id: str) -> Tuple[int, Dict]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"Unknown job: {job_id}")
+        return 200, job.model_dump(mode='json')
+
+    async def _dispatch(self, reader: asyncio.StreamReader) -> Tuple[int, Dict]:
+        request_line = await reader.readline()
+        try:
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        content_length = headers.get('content-length') or '0'
+        # int() would also accept signs, blanks and underscores
+        if not (content_length.isascii() and content_length.isdigit()):
+            raise HTTPError(400, "Invalid Content-Length")
+        length = int(content_length)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+
+        path = target.split('?', 1)[0]
+        if method == 'GET' and path.startswith('/jobs/'):
+            return self.handle_job(path[len('/jobs/'):])
+
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                raise HTTPError(405, f"Method {method} not allowed for {path}")
+            raise HTTPError(404, f"Unknown path: {path}")
+        return await handler(body, headers)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, payload = await asyncio.wait_for(self._dispatch(reader), READ_TIMEOUT)
+        except HTTPError as e:
+            status, payload = e.status, {'error': e.message, **e.detail}
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            status, payload = 400, {'error': "Incomplete request"}
+        except Exception as e:
+            self.logger.error(f"Error handling request: {e}")
+            status, payload = 500, {'error': "Internal server error"}
+
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n")
+        try:
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    # Lifecycle
+
+    async def start(self):
+        """Bind the HTTP server and start the worker pool"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='menu-worker')
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.logger.info(f"Menu service listening on http://{self.host}:{self.port} with {self.workers} workers")
+
+    async def stop(self):
+        """Stop accepting requests and shut the worker pool down"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def parse_intake(body: bytes) -> IntakeData:
+    """Validate a request body against the intake schema"""
+    try:
+        return IntakeData.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPError(422, "Invalid intake data", errors=json.loads(e.json(include_url=False)))
+
+
+def main():
+    """Main function to run the menu service"""
+    parser = argparse.ArgumentParser(description="Run the weekly menu service")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to bind (default: localhost only)")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2, help="Concurrent generation jobs")
+    parser.add_argument('--queue-size', type=int, default=100, help="Maximum queued jobs")
+    parser.add_argument('--webhook-trigger', action='store_true',
+                        help="Generate immediately when an intake arrives on /webhook/intake")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'menu_service')
+
+    try:
+        service = MenuService(host=args.host, port=args.port, workers=args.workers, queue_size=args.queue_size,
+                              webhook_trigger=args.webhook_trigger)
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("Menu service stopped")
+    except Exception as e:
+        logging.error(f"Error running menu service: {e}")
+        sys.exit(1)
+    finally:
+        finish_profiling()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Structured representation of a generated weekly menu.
+
+The LLM returns markdown with one bold header per day and one bullet per
+dish. This module parses that text into a week plan (one entry per day with
+dishes grouped by meal type) and renders a week plan back into the same
+markdown layout, so that per-meal-type results can be merged into a single
+menu and later stages can work on dishes instead of text.
+"""
+
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+DAY_NAMES = ['月曜日', '火曜日', '水曜日', '木曜日', '金曜日', '土曜日', '日曜日']
+
+# Items the prompt asks for on days without cooking
+NO_COOKING_ITEMS = ('外食・外泊', 'お休み')
+
+DAY_HEADER_PATTERN = re.compile(r'^\*\*(?P<day>[月火水木金土日]曜日)')
+MEAL_PREFIX_PATTERN = re.compile(r'^(?P<meal>[^:：]+)[:：]\s*(?P<item>.+)$')
+COOKING_TIME_PATTERN = re.compile(r'^(?P<name>.*?)\s*[(（]\s*調理時間\s*[:：]\s*(?P<minutes>\d+)\s*分\s*[)）]\s*$')
+
+
+def parse_dish(item: str) -> Dict:
+    """Split a bullet such as "肉じゃが (調理時間: 30分)" into name and minutes"""
+    match = COOKING_TIME_PATTERN.match(item)
+    if match:
+        return {'name': match.group('name').strip(), 'cooking_time': int(match.group('minutes'))}
+    return {'name': item.strip(), 'cooking_time': None}
+
+
+def empty_week_plan(week_start: date) -> List[Dict]:
+    return [
+        {'date': (week_start + timedelta(days=i)).isoformat(), 'day': DAY_NAMES[i], 'meals': {}}
+        for i in range(7)
+    ]
+
+
+def parse_week_plan(menu_content: str, week_start: date, meal_types: Optional[List[str]] = None) -> List[Dict]:
+    """Parse menu markdown into a week plan.
+
+    Bullets prefixed with a known meal type ("- 朝食: ...") are filed under
+    that meal; other bullets belong to the first meal type (dinner when no
+    meal types are given).
+    """
+    meal_types = meal_types or ['夕食']
+    plan = empty_week_plan(week_start)
+    current = None
+
+    for line in menu_content.split('\n'):
+        line = line.strip()
+        header = DAY_HEADER_PATTERN.match(line)
+        if header:
+            current = plan[DAY_NAMES.index(header.group('day'))]
+            continue
+        if current is None or not line.startswith('- '):
+            continue
+
+        item = line[2:].strip()
+        meal_type = meal_types[0]
+        prefixed = MEAL_PREFIX_PATTERN.match(item)
+        if prefixed and prefixed.group('meal').strip() in meal_types:
+            meal_type, item = prefixed.group('meal').strip(), prefixed.group('item')
+        current['meals'].setdefault(meal_type, []).append(parse_dish(item))
+
+    return plan
+
+
+def merge_week_plans(plans: Dict[str, List[Dict]], week_start: date) -> List[Dict]:
+    """Combine single-meal-type plans into one plan with every meal per day"""
+    merged = empty_week_plan(week_start)
+    for meal_type, plan in plans.items():
+        for merged_day, day in zip(merged, plan):
+            dishes = [dish for dishes in day['meals'].values() for dish in dishes]
+            if dishes:
+                merged_day['meals'][meal_type] = dishes
+    return merged
+
+
+def format_dish(dish: Dict) -> str:
+    if dish.get('cooking_time') is None:
+        return dish['name']
+    return f"{dish['name']} (調理時間: {dish['cooking_time']}分)"
+
+
+def render_week_plan(plan: List[Dict], title: str) -> str:
+    """Render a multi-meal week plan as menu markdown with one section per day"""
+    lines = [f"### {title}", ""]
+    for day in plan:
+        day_date = date.fromisoformat(day['date'])
+        lines.append(f"**{day['day']} ({day_date.strftime('%m/%d')})**")
+
+        items = [(meal_type, dish) for meal_type, dishes in day['meals'].items() for dish in dishes]
+        no_cooking = {dish['name'] for _, dish in items if dish['name'] in NO_COOKING_ITEMS}
+        if items and len(no_cooking) == 1 and all(dish['name'] in NO_COOKING_ITEMS for _, dish in items):
+            # Every meal is skipped for the same reason: show it once
+            lines.append(f"- {no_cooking.pop()}")
+        else:
+            lines.extend(f"- {meal_type}: {format_dish(dish)}" for meal_type, dish in items)
+        lines.append("")
+
+    return '\n'.join(lines).rstrip() + '\n'
@@ -0,0 +1,191 @@
+"""
+Local SQLite mirror of the Notion menu database.
+
+The mirror keeps page id, Week Start, Status, a content hash and
+last_edited_time for every menu page. It is kept current by incremental
+sync (only pages edited since the last sync are queried), so lookups such as
+"page for week X" or "pages older than a cutoff" are answered from a local
+index and Notion is only hit for writes.
+
+databases.query never returns trashed or archived pages, so a page deleted
+in the Notion UI is never removed by sync. Callers that act on a mirrored
+page (archiving the week's page before republishing) use
+live_page_for_week, which checks the page with pages.retrieve and drops it
+from the mirror when it is gone.
+
+Enable it by pointing NOTION_MIRROR_PATH at the database file.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id TEXT PRIMARY KEY,
+    week_start TEXT,
+    status TEXT,
+    content_hash TEXT,
+    last_edited_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_week_start ON pages (week_start);
+CREATE TABLE IF NOT EXISTS sync_state (
+    database_id TEXT PRIMARY KEY,
+    last_edited_time TEXT
+);
+"""
+
+
+def page_content_hash(page: Dict) -> str:
+    """Stable hash of a page's properties"""
+    content = json.dumps(page.get('properties', {}), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def page_week_start(page: Dict) -> Optional[str]:
+    date_value = page.get('properties', {}).get('Week Start', {}).get('date') or {}
+    return date_value.get('start')
+
+
+def page_status(page: Dict) -> Optional[str]:
+    select_value = page.get('properties', {}).get('Status', {}).get('select') or {}
+    return select_value.get('name')
+
+
+class NotionMenuMirror:
+    def __init__(self, notion, database_id: str, path: str = 'data/notion_mirror.sqlite3',
+                 retry: Optional[Callable] = None):
+        self.logger = logging.getLogger(__name__)
+        self.notion = notion
+        self.database_id = database_id
+        self.path = Path(path)
+        # Wraps each query, e.g. a caller's deadline-aware retry helper
+        self.retry = retry or (lambda func: func())
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls, notion, database_id: str, retry: Optional[Callable] = None) -> Optional['NotionMenuMirror']:
+        """Mirror at NOTION_MIRROR_PATH, or None when mirroring is disabled"""
+        path = os.getenv('NOTION_MIRROR_PATH')
+        if not path:
+            return None
+        return cls(notion, database_id, path=path, retry=retry)
+
+    def close(self):
+        self.db.close()
+
+    @property
+    def watermark(self) -> Optional[str]:
+        row = self.db.execute(
+            "SELECT last_edited_time FROM sync_state WHERE database_id = ?", (self.database_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync(self) -> int:
+        """Pull pages edited since the last sync; returns the number of pages updated.
+
+        Notion rounds last_edited_time to the minute, so the query uses
+        on_or_after and re-reads pages edited in the watermark minute.
+        """
+        watermark = self.watermark
+        query = {
+            'database_id': self.database_id,
+            'sorts': [{'timestamp': 'last_edited_time', 'direction': 'ascending'}],
+            'page_size': 100,
+        }
+        if watermark:
+            query['filter'] = {'timestamp': 'last_edited_time', 'last_edited_time': {'on_or_after': watermark}}
+
+        updated = 0
+        latest = watermark
+        cursor = None
+        while True:
+            if cursor:
+                query['start_cursor'] = cursor
+            response = self.retry(lambda: self.notion.databases.query(**query))
+
+            with self.db:
+                for page in response['results']:
+                    self._upsert(page)
+                    updated += 1
+                    latest = max(latest or '', page['last_edited_time'])
+                if latest:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO sync_state (database_id, last_edited_time) VALUES (?, ?)",
+                        (self.database_id, latest)
+                    )
+
+            if not response.get('has_more'):
+                break
+            cursor = response['next_cursor']
+
+        self.logger.info(f"Notion mirror synced {updated} pages (since {watermark or 'beginning'})")
+        return updated
+
+    def _upsert(self, page: Dict):
+        if page.get('archived') or page.get('in_trash'):
+            self.db.execute("DELETE FROM pages WHERE page_id = ?", (page['id'],))
+            return
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages (page_id, week_start, status, content_hash, last_edited_time) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (page['id'], page_week_start(page), page_status(page), page_content_hash(page), page['last_edited_time'])
+        )
+
+    def record_page(self, page: Dict):
+        """Apply a page returned by a Notion write without re-querying"""
+        with self.db:
+            self._upsert(page)
+
+    def remove_page(self, page_id: str):
+        with self.db:
+            self.db.execute("DELETE FROM pages WHERE page_id = ?", (page_id,))
+
+    def page_for_week(self, week_start: str) -> Optional[str]:
+        """Most recently edited page whose Week Start equals week_start"""
+        row = self.db.execute(
+            "SELECT page_id FROM pages WHERE week_start = ? ORDER BY last_edited_time DESC LIMIT 1",
+            (week_start,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _retrieve_live(self, page_id: str) -> Optional[Dict]:
+        """Page as Notion has it now, or None when it was deleted, trashed or archived"""
+        def _retrieve():
+            try:
+                return self.notion.pages.retrieve(page_id=page_id)
+            except Exception as e:
+                # A missing page is an answer, not a failure worth retrying
+                if getattr(e, 'code', None) == 'object_not_found':
+                    return None
+                raise
+
+        page = self.retry(_retrieve)
+        if page is None or page.get('archived') or page.get('in_trash'):
+            return None
+        return page
+
+    def live_page_for_week(self, week_start: str) -> Optional[str]:
+        """page_for_week, skipping (and forgetting) pages that no longer exist in Notion"""
+        while True:
+            page_id = self.page_for_week(week_start)
+            if page_id is None or self._retrieve_live(page_id) is not None:
+                return page_id
+            self.logger.info(f"Mirrored page {page_id} was deleted in Notion, removing it from the mirror")
+            self.remove_page(page_id)
+
+    def pages_before(self, cutoff: str, exclude_status: str = 'Archived') -> List[Tuple[str, str]]:
+        """(page_id, week_start) for pages older than cutoff not in exclude_status"""
+        return self.db.execute(
+            "SELECT page_id, week_start FROM pages "
+            "WHERE week_start < ? AND (status IS NULL OR status != ?) ORDER BY week_start",
+            (cutoff, exclude_status)
+        ).fetchall()
@@ -5,13 +5,18 @@ Notion integration for updating weekly menu pages
 import os
 import sys
 import json
-import time
 import logging
+import argparse
 from pathlib import Path
 from datetime import datetime, date
 from typing import Dict, List, Optional
 
 from notion_client import Client
+from scripts.cassette import Cassette
+from scripts.deadline import RunDeadline
+from scripts.menu_structure import MEAL_PREFIX_PATTERN, parse_dish
+from scripts.notion_mirror import NotionMenuMirror
+from scripts.profiling import add_profile_argument, enable_profiling, finish_profiling, profiled
 
 # Configure logging
 logging.basicConfig(
@@ -19,33 +24,84 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Notion API request limits
+MAX_CHILDREN_PER_REQUEST = 100
+MAX_RICH_TEXT_LENGTH = 2000
+
+
+def rich_text(content: str, annotations: Optional[Dict] = None, link: Optional[str] = None) -> List[Dict]:
+    """Rich text segments for content, split at Notion's per-segment length limit"""
+    segments = []
+    for i in range(0, len(content), MAX_RICH_TEXT_LENGTH):
+        segment = {
+            "type": "text",
+            "text": {"content": content[i:i + MAX_RICH_TEXT_LENGTH]}
+        }
+        if link:
+            segment["text"]["link"] = {"url": link}
+        if annotations:
+            segment["annotations"] = annotations
+        segments.append(segment)
+    return segments
+
+
+def menu_item_rich_text(item: str, meal_types: List[str], recipe_links: Dict[str, Dict]) -> List[Dict]:
+    """Rich text of a menu bullet with the dish name linked to its recipe, if one was found"""
+    offset, dish = 0, item
+    prefixed = MEAL_PREFIX_PATTERN.match(item)
+    if prefixed and prefixed.group('meal').strip() in meal_types:
+        offset, dish = prefixed.start('item'), prefixed.group('item')
+    name = parse_dish(dish)['name']
+    link = recipe_links.get(name) if name else None
+    start = item.find(name, offset) if link else -1
+    if start < 0:
+        return rich_text(item)
+    end = start + len(name)
+    return rich_text(item[:start]) + rich_text(name, link=link['url']) + rich_text(item[end:])
+
+
+def text_block(block_type: str, content: str, annotations: Optional[Dict] = None) -> Dict:
+    """Block of the given type holding a single run of text"""
+    return {
+        "object": "block",
+        "type": block_type,
+        block_type: {
+            "rich_text": rich_text(content, annotations)
+        }
+    }
+
 
 class NotionMenuUpdater:
-    def __init__(self):
+    def __init__(self, deadline: Optional[RunDeadline] = None, notion_client: Optional[Client] = None,
+                 database_id: Optional[str] = None, mirror_path: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
-        notion_token = os.getenv('NOTION_TOKEN')
-        if not notion_token:
-            raise ValueError("NOTION_TOKEN environment variable is required")
+        self.deadline = deadline or RunDeadline.from_env()
+        cassette = Cassette.from_env()
+        if notion_client is None and not cassette.replaying:
+            notion_token = os.getenv('NOTION_TOKEN')
+            if not notion_token:
+                raise ValueError("NOTION_TOKEN environment variable is required")
             
-        self.notion = Client(auth=notion_token)
-        self.database_id = os.getenv('NOTION_DATABASE_ID')
+            notion_client = Client(auth=notion_token, timeout_ms=int(self.deadline.timeout(60) * 1000))
+        # Long-running callers pass a shared client to reuse its connection pool
+        self.notion = cassette.wrap('notion', notion_client)
+        # Multi-tenant callers pass each tenant's database instead of the environment's
+        self.database_id = database_id or os.getenv('NOTION_DATABASE_ID')
         if not self.database_id:
             raise ValueError("NOTION_DATABASE_ID environment variable is required")
+        
+        # Optional local mirror: lookups become index queries, Notion is only hit for writes
+        retry = lambda func: self._retry_with_backoff(func, max_retries=3, base_delay=2)
+        if mirror_path:
+            self.mirror = NotionMenuMirror(self.notion, self.database_id, path=mirror_path, retry=retry)
+        else:
+            self.mirror = NotionMenuMirror.from_env(self.notion, self.database_id, retry=retry)
     
     def _retry_with_backoff(self, func, max_retries=3, base_delay=1):
-        """Execute function with exponential backoff retry"""
-        for attempt in range(max_retries):
-            try:
-                return func()
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    self.logger.error(f"Final attempt failed: {e}")
-                    raise
-                
-                delay = base_delay * (2 ** attempt)
-                self.logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} seconds...")
-                time.sleep(delay)
+        """Execute function with exponential backoff retry bounded by the run deadline"""
+        return self.deadline.retry_with_backoff(func, max_retries, base_delay, logger=self.logger)
     
+    @profiled('load_menu')
     def load_generated_menu(self) -> Dict:
         """Load the generated menu data"""
         menu_path = Path('data/generated_menu.json')
@@ -55,8 +111,19 @@ class NotionMenuUpdater:
         with open(menu_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     
+    @profiled('notion_lookup')
     def find_existing_page(self, week_start: str) -> Optional[str]:
         """Find existing Notion page for the week with retry logic"""
+        if self.mirror:
+            try:
+                self.mirror.sync()
+                page_id = self.mirror.live_page_for_week(week_start)
+                if page_id:
+                    self.logger.info(f"Found existing page in mirror: {page_id}")
+                return page_id
+            except Exception as e:
+                self.logger.warning(f"Notion mirror unavailable, querying Notion directly: {e}")
+        
         def _query_database():
             self.logger.info(f"Searching for existing page for week: {week_start}")
             return self.notion.databases.query(
@@ -82,6 +149,7 @@ class NotionMenuUpdater:
             self.logger.error(f"Error searching for existing page: {e}")
             return None
     
+    @profiled('notion_write')
     def archive_existing_page(self, page_id: str):
         """Archive existing page by setting archived property to true with retry logic"""
         def _archive_page():
@@ -93,11 +161,14 @@ class NotionMenuUpdater:
         
         try:
             self._retry_with_backoff(_archive_page, max_retries=3, base_delay=2)
+            if self.mirror:
+                self.mirror.remove_page(page_id)
             self.logger.info(f"Successfully archived page: {page_id}")
         except Exception as e:
             self.logger.error(f"Error archiving page {page_id}: {e}")
             raise
     
+    @profiled('notion_write')
     def create_notion_page(self, menu_data: Dict) -> str:
         """Create new Notion page with weekly menu with retry logic"""
         week_start = menu_data['week_start']
@@ -140,20 +211,71 @@ class NotionMenuUpdater:
                 "checkbox": True
             }
         
-        # Create page content blocks
+        children = self.build_menu_blocks(menu_content, week_date, menu_data.get('meal_types'),
+                                          menu_data.get('recipe_links'))
+        if menu_data.get('shopping_list'):
+            children += self.build_shopping_list_blocks(menu_data['shopping_list'])
+        
+        # Notion accepts at most MAX_CHILDREN_PER_REQUEST blocks per request: the page
+        # is created with the first batch and the rest is appended in order
+        batches = [children[i:i + MAX_CHILDREN_PER_REQUEST]
+                   for i in range(0, len(children), MAX_CHILDREN_PER_REQUEST)] or [[]]
+        
+        def _create_page():
+            self.logger.info(f"Creating Notion page for week: {week_start}")
+            return self.notion.pages.create(
+                parent={"database_id": self.database_id},
+                properties=properties,
+                children=batches[0]
+            )
+        
+        try:
+            response = self._retry_with_backoff(_create_page, max_retries=3, base_delay=2)
+            page_id = response['id']
+            
+        except Exception as e:
+            self.logger.error(f"Error creating Notion page: {e}")
+            self.logger.error(f"Database ID: {self.database_id}")
+            self.logger.error(f"Week start: {week_start}")
+            raise
+        
+        try:
+            self.append_blocks(page_id, batches[1:])
+        except Exception as e:
+            # Don't leave a truncated menu behind
+            self.logger.error(f"Error appending blocks to page {page_id}: {e}")
+            try:
+                self.archive_existing_page(page_id)
+            except Exception as archive_error:
+                # The append failure is what the caller needs to see
+                self.logger.error(f"Truncated page {page_id} left in place: {archive_error}")
+            raise
+        
+        if self.mirror:
+            self.mirror.record_page(response)
+        self.logger.info(f"Successfully created Notion page: {page_id} ({len(children)} blocks)")
+        return page_id
+    
+    @profiled('notion_append')
+    def append_blocks(self, page_id: str, batches: List[List[Dict]]):
+        """Append block batches to a page in order, retrying each batch on its own"""
+        for index, batch in enumerate(batches, start=1):
+            def _append_batch():
+                self.logger.info(f"Appending block batch {index}/{len(batches)} ({len(batch)} blocks)")
+                return self.notion.blocks.children.append(block_id=page_id, children=batch)
+            
+            self._retry_with_backoff(_append_batch, max_retries=3, base_delay=2)
+    
+    @profiled('block_building')
+    def build_menu_blocks(self, menu_content: str, week_date: date, meal_types: Optional[List[str]] = None,
+                          recipe_links: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+        """Convert generated menu text into Notion blocks"""
+        meal_types = meal_types or ['夕食']
+        recipe_links = recipe_links or {}
+        # Multi-meal menus already carry the meal type on each item
+        menu_label = f"{meal_types[0]}献立" if len(meal_types) == 1 else "献立"
         children = [
-            {
-                "object": "block",
-                "type": "heading_2",
-                "heading_2": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {"content": f"{week_date.strftime('%Y年%m月%d日')}週の夕食献立"}
-                        }
-                    ]
-                }
-            },
+            text_block("heading_2", f"{week_date.strftime('%Y年%m月%d日')}週の{menu_label}"),
             {
                 "object": "block",
                 "type": "divider",
@@ -162,113 +284,69 @@ class NotionMenuUpdater:
         ]
         
         # Parse menu content and add as blocks
-        menu_lines = menu_content.split('\n')
         current_paragraph = []
         
-        for line in menu_lines:
+        for line in menu_content.split('\n'):
             line = line.strip()
             if not line:
                 if current_paragraph:
                     # Add accumulated paragraph
-                    children.append({
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {"content": '\n'.join(current_paragraph)}
-                                }
-                            ]
-                        }
-                    })
+                    children.append(text_block("paragraph", '\n'.join(current_paragraph)))
                     current_paragraph = []
             elif line.startswith('**') and line.endswith('**'):
                 # Day header
                 if current_paragraph:
-                    children.append({
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [
-                                {
-                                    "type": "text",
-                                    "text": {"content": '\n'.join(current_paragraph)}
-                                }
-                            ]
-                        }
-                    })
+                    children.append(text_block("paragraph", '\n'.join(current_paragraph)))
                     current_paragraph = []
                 
-                day_name = line.strip('*')
-                children.append({
-                    "object": "block",
-                    "type": "heading_3",
-                    "heading_3": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {"content": day_name},
-                                "annotations": {"bold": True}
-                            }
-                        ]
-                    }
-                })
+                children.append(text_block("heading_3", line.strip('*'), annotations={"bold": True}))
             elif line.startswith('- '):
-                # Menu item
-                children.append({
-                    "object": "block",
-                    "type": "bulleted_list_item",
-                    "bulleted_list_item": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {"content": line[2:]}  # Remove "- " prefix
-                            }
-                        ]
-                    }
-                })
+                # Menu item, without the "- " prefix, with the dish linked to its recipe
+                block = text_block("bulleted_list_item", line[2:])
+                if recipe_links:
+                    block["bulleted_list_item"]["rich_text"] = menu_item_rich_text(line[2:], meal_types, recipe_links)
+                children.append(block)
             else:
                 current_paragraph.append(line)
         
         # Add any remaining paragraph
         if current_paragraph:
-            children.append({
+            children.append(text_block("paragraph", '\n'.join(current_paragraph)))
+        
+        return children
+    
+    @profiled('block_building')
+    def build_shopping_list_blocks(self, shopping_list: Dict) -> List[Dict]:
+        """Shopping list section: one checklist item per ingredient"""
+        children = [
+            {
                 "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {
-                            "type": "text",
-                            "text": {"content": '\n'.join(current_paragraph)}
-                        }
-                    ]
-                }
-            })
+                "type": "divider",
+                "divider": {}
+            },
+            text_block("heading_2", f"買い物リスト（{shopping_list['servings']:g}人分）")
+        ]
         
-        def _create_page():
-            self.logger.info(f"Creating Notion page for week: {week_start}")
-            return self.notion.pages.create(
-                parent={"database_id": self.database_id},
-                properties=properties,
-                children=children
-            )
+        for item in shopping_list['items']:
+            label = f"{item['name']} {item['display']}".strip()
+            block = text_block("to_do", label)
+            block["to_do"]["checked"] = False
+            children.append(block)
         
-        try:
-            response = self._retry_with_backoff(_create_page, max_retries=3, base_delay=2)
-            page_id = response['id']
-            self.logger.info(f"Successfully created Notion page: {page_id}")
-            return page_id
-            
-        except Exception as e:
-            self.logger.error(f"Error creating Notion page: {e}")
-            self.logger.error(f"Database ID: {self.database_id}")
-            self.logger.error(f"Week start: {week_start}")
-            raise
+        if not shopping_list['items']:
+            children.append(text_block("paragraph", "買い足しが必要な食材はありません"))
+        
+        if shopping_list.get('unmatched_dishes'):
+            children.append(text_block(
+                "paragraph", f"材料が登録されていない料理: {', '.join(shopping_list['unmatched_dishes'])}"
+            ))
+        
+        return children
     
-    def update_menu(self):
+    def update_menu(self, menu_data: Optional[Dict] = None):
         """Main function to update Notion with generated menu"""
-        menu_data = self.load_generated_menu()
+        if menu_data is None:
+            menu_data = self.load_generated_menu()
         week_start = menu_data['week_start']
         
         # Check for existing page
@@ -288,6 +366,12 @@ class NotionMenuUpdater:
 
 def main():
     """Main function to update Notion with weekly menu"""
+    parser = argparse.ArgumentParser(description="Publish the generated menu to Notion")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'notion_update')
+    
     try:
         updater = NotionMenuUpdater()
         page_id = updater.update_menu()
@@ -296,6 +380,8 @@ def main():
     except Exception as e:
         logging.error(f"Error updating Notion: {e}")
         sys.exit(1)
+    finally:
+        finish_profiling()
 
 
 if __name__ == "__main__":
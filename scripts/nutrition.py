@@ -0,0 +1,272 @@
+"""
+Nutrition balance scoring backed by a local food composition table.
+
+Each catalog recipe is reduced once to a per-serving nutrient vector and a
+per-serving protein amount by protein source, using the recipe × ingredient
+matrix and the composition table (values per 100 g, see
+data/food_composition_example.json). A batch of menus is encoded as a
+(weeks, 7, dishes) array of recipe ids, so per-day and per-week totals,
+PFC energy ratios, protein-source rotation and vegetable amounts for every
+week are a few array operations regardless of the batch size.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scripts.menu_structure import DAY_NAMES, NO_COOKING_ITEMS
+from scripts.recipe_catalog import RecipeCatalog, normalize_ingredient
+from scripts.shopping_list import normalize_unit
+
+NUTRIENTS = ('energy', 'protein', 'fat', 'carbohydrate')
+
+# kcal per gram of protein, fat and carbohydrate (Atwater factors)
+MACRO_ENERGY = np.array([4.0, 9.0, 4.0])
+MACRO_LABELS = {'protein': 'たんぱく質', 'fat': '脂質', 'carbohydrate': '炭水化物'}
+
+VEGETABLE_GROUP = '野菜'
+
+# Target share of energy per macro in percent (dietary reference intakes for Japanese adults)
+DEFAULT_ENERGY_RATIO = {'protein': (13, 20), 'fat': (20, 30), 'carbohydrate': (50, 65)}
+
+
+class FoodComposition:
+    def __init__(self, records: Iterable[Dict]):
+        self.index: Dict[str, int] = {}
+        values: List[List[float]] = []
+        self.groups: List[str] = []
+        # Grams per count unit, e.g. {"個": 50} for eggs
+        self.unit_grams: List[Dict[str, float]] = []
+
+        for record in records:
+            key = normalize_ingredient(record['name'])
+            if key in self.index:
+                continue
+            self.index[key] = len(values)
+            values.append([float(record.get(nutrient) or 0) for nutrient in NUTRIENTS])
+            self.groups.append(record.get('group') or '')
+            self.unit_grams.append({normalize_ingredient(unit): float(grams)
+                                    for unit, grams in (record.get('unit_grams') or {}).items()})
+
+        # Nutrients per 100 g
+        self.values = np.asarray(values, dtype=np.float64).reshape(-1, len(NUTRIENTS))
+
+    @classmethod
+    def load(cls, path) -> 'FoodComposition':
+        with open(Path(path), 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def grams(self, food: int, unit: str) -> float:
+        """Grams of one unit of a food (liquids are taken as 1 g/ml; 0 when unknown)"""
+        base, factor = normalize_unit(unit)
+        if base in ('g', 'ml'):
+            return factor
+        if not factor:
+            return 0.0
+        return self.unit_grams[food].get(normalize_ingredient(unit or ''), 0.0)
+
+
+class WeekNutrition(NamedTuple):
+    daily: np.ndarray          # (weeks, 7, nutrients) per serving
+    weekly: np.ndarray         # (weeks, nutrients) per serving
+    energy_ratio: np.ndarray   # (weeks, 3) percent of energy from protein, fat, carbohydrate
+    main_source: np.ndarray    # (weeks, 7) protein source index of each day, -1 when none
+    max_streak: np.ndarray     # (weeks,) longest run of days with the same protein source
+    streak_source: np.ndarray  # (weeks,) source of that run
+    sources_used: np.ndarray   # (weeks, sources) whether each protein source appears
+    vegetables: np.ndarray     # (weeks,) average vegetable grams per cooked meal
+    coverage: np.ndarray       # (weeks,) share of dishes found in the catalog
+    flags: Dict[str, np.ndarray]
+    imbalanced: np.ndarray     # (weeks,) any flag raised on a week with enough coverage
+
+
+class NutritionScorer:
+    def __init__(self, catalog: RecipeCatalog, composition: FoodComposition, protein_sources: Sequence[str] = (),
+                 energy_ratio: Optional[Dict[str, Tuple[float, float]]] = None, max_same_protein_days: int = 2,
+                 min_vegetable_grams: float = 0.0, staple: Optional[str] = None, staple_grams: float = 0.0,
+                 min_coverage: float = 0.5):
+        self.catalog = catalog
+        self.composition = composition
+        self.protein_sources = list(protein_sources)
+        self.energy_ratio = {**DEFAULT_ENERGY_RATIO, **(energy_ratio or {})}
+        self.max_same_protein_days = max_same_protein_days
+        self.min_vegetable_grams = min_vegetable_grams
+        self.min_coverage = min_coverage
+
+        # Staple (e.g. rice) served with every cooked meal but not part of the recipes
+        self.staple_values = np.zeros(len(NUTRIENTS))
+        staple_id = composition.index.get(normalize_ingredient(staple)) if staple else None
+        if staple_id is not None:
+            self.staple_values = composition.values[staple_id] * staple_grams / 100
+
+        # Per-serving recipe matrices with a trailing zero row for padding id -1
+        nutrients, sources, vegetables = self._recipe_matrices()
+        self.recipe_nutrients = np.vstack([nutrients, np.zeros((1, len(NUTRIENTS)))])
+        self.recipe_sources = np.vstack([sources, np.zeros((1, len(self.protein_sources)))])
+        self.recipe_vegetables = np.append(vegetables, 0.0)
+
+    @classmethod
+    def from_config(cls, catalog: RecipeCatalog, composition: FoodComposition,
+                    nutrition_config: Dict) -> 'NutritionScorer':
+        """Scorer configured from the nutrition section of rules.yaml"""
+        energy_ratio = {macro: tuple(bounds) for macro, bounds in (nutrition_config.get('energy_ratio') or {}).items()}
+        return cls(
+            catalog, composition,
+            protein_sources=nutrition_config.get('protein_sources') or [],
+            energy_ratio=energy_ratio,
+            max_same_protein_days=nutrition_config.get('max_same_protein_days', 2),
+            min_vegetable_grams=(nutrition_config.get('min_vegetable_grams', 0)
+                                 if nutrition_config.get('vegetable_emphasis') else 0),
+            staple=nutrition_config.get('staple'),
+            staple_grams=nutrition_config.get('staple_grams', 0),
+        )
+
+    def _recipe_matrices(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        catalog, composition = self.catalog, self.composition
+
+        # Composition row of each catalog ingredient (-1 when not in the table)
+        food = np.asarray([composition.index.get(name, -1) for name in catalog.ingredient_names] + [-1],
+                          dtype=np.int64)
+        entry_food = food[catalog.indices]
+
+        # Grams per unit, looked up once per distinct (food, unit) pair
+        units, unit_inverse = np.unique(catalog.units, return_inverse=True)
+        pairs, pair_inverse = np.unique(entry_food * len(units) + unit_inverse, return_inverse=True)
+        pair_grams = np.asarray([
+            composition.grams(int(pair // len(units)), units[pair % len(units)]) if pair >= 0 else 0.0
+            for pair in pairs
+        ], dtype=np.float64)
+
+        entry_grams = catalog.quantities * pair_grams[pair_inverse] / catalog.servings[catalog.rows]
+        values = np.vstack([composition.values, np.zeros((1, len(NUTRIENTS)))])  # -1 -> zeros
+        entry_values = values[entry_food] * (entry_grams / 100)[:, None]
+        nutrients = np.stack([catalog.row_sums(entry_values[:, k]) for k in range(len(NUTRIENTS))], axis=1)
+
+        source_index = {source: i for i, source in enumerate(self.protein_sources)}
+        food_source = np.asarray([source_index.get(group, -1) for group in composition.groups] + [-1], dtype=np.int64)
+        entry_source = food_source[entry_food]
+        has_source = entry_source >= 0
+        source_count = len(self.protein_sources)
+        sources = np.bincount(
+            catalog.rows[has_source].astype(np.int64) * source_count + entry_source[has_source],
+            weights=entry_values[has_source, NUTRIENTS.index('protein')],
+            minlength=len(catalog) * source_count
+        ).reshape(len(catalog), source_count)
+
+        vegetable_food = np.asarray([group == VEGETABLE_GROUP for group in composition.groups] + [False])
+        vegetables = catalog.row_sums(entry_grams * vegetable_food[entry_food])
+        return nutrients, sources, vegetables
+
+    def encode(self, week_plans: Sequence[List[Dict]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Recipe ids (weeks, 7, dishes), cooked meals per day (weeks, 7) and catalog coverage (weeks,)"""
+        days = [[[self.catalog.find(dish['name'])
+                  for dishes in day['meals'].values() for dish in dishes
+                  if dish['name'] not in NO_COOKING_ITEMS]
+                 for day in plan]
+                for plan in week_plans]
+        width = max((len(dishes) for plan in days for dishes in plan), default=0) or 1
+
+        recipes = np.full((len(week_plans), 7, width), -1, dtype=np.int64)
+        meals = np.zeros((len(week_plans), 7), dtype=np.int64)
+        coverage = np.zeros(len(week_plans))
+        for w, (plan, week_plan) in enumerate(zip(days, week_plans)):
+            total = matched = 0
+            for d, (dishes, day) in enumerate(zip(plan, week_plan)):
+                found = [recipe for recipe in dishes if recipe is not None]
+                recipes[w, d, :len(found)] = found
+                total += len(dishes)
+                matched += len(found)
+                if found:
+                    meals[w, d] = sum(1 for meal_dishes in day['meals'].values()
+                                      if any(dish['name'] not in NO_COOKING_ITEMS for dish in meal_dishes))
+            coverage[w] = matched / total if total else 0.0
+        return recipes, meals, coverage
+
+    def score(self, week_plans: Sequence[List[Dict]]) -> WeekNutrition:
+        return self.score_encoded(*self.encode(week_plans))
+
+    def score_encoded(self, recipes: np.ndarray, meals: np.ndarray, coverage: np.ndarray) -> WeekNutrition:
+        """Score a batch of encoded weeks in one vectorized pass"""
+        daily = self.recipe_nutrients[recipes].sum(axis=2) + meals[..., None] * self.staple_values
+        weekly = daily.sum(axis=1)
+
+        macro_energy = weekly[:, 1:] * MACRO_ENERGY
+        total_energy = macro_energy.sum(axis=1, keepdims=True)
+        energy_ratio = np.divide(macro_energy * 100, total_energy,
+                                 out=np.zeros_like(macro_energy), where=total_energy > 0)
+
+        # Protein source of each day: the one contributing the most protein
+        day_sources = self.recipe_sources[recipes].sum(axis=2)
+        if self.protein_sources:
+            main_source = np.where(day_sources.max(axis=2) > 0, day_sources.argmax(axis=2), -1)
+        else:
+            main_source = np.full(meals.shape, -1)
+
+        run = (main_source[:, 0] >= 0).astype(np.int64)
+        max_streak, streak_source = run.copy(), main_source[:, 0].copy()
+        for d in range(1, 7):
+            same = (main_source[:, d] == main_source[:, d - 1]) & (main_source[:, d] >= 0)
+            run = np.where(same, run + 1, (main_source[:, d] >= 0).astype(np.int64))
+            longer = run > max_streak
+            max_streak = np.where(longer, run, max_streak)
+            streak_source = np.where(longer, main_source[:, d], streak_source)
+
+        source_count = len(self.protein_sources)
+        sources_used = (main_source[..., None] == np.arange(source_count)).any(axis=1)
+        source_days = (main_source >= 0).sum(axis=1)
+
+        cooked_meals = meals.sum(axis=1)
+        vegetables = np.divide(self.recipe_vegetables[recipes].sum(axis=(1, 2)), cooked_meals,
+                               out=np.zeros(len(meals)), where=cooked_meals > 0)
+
+        flags = {}
+        for i, macro in enumerate(MACRO_LABELS):
+            low, high = self.energy_ratio[macro]
+            flags[f'{macro}_low'] = energy_ratio[:, i] < low
+            flags[f'{macro}_high'] = energy_ratio[:, i] > high
+        flags['protein_streak'] = max_streak > self.max_same_protein_days
+        flags['protein_missing'] = (source_days >= source_count) & ~sources_used.all(axis=1)
+        flags['vegetables_low'] = vegetables < self.min_vegetable_grams
+
+        assessable = (coverage >= self.min_coverage) & (cooked_meals > 0)
+        imbalanced = assessable & np.logical_or.reduce(list(flags.values()))
+        return WeekNutrition(daily, weekly, energy_ratio, main_source, max_streak, streak_source,
+                             sources_used, vegetables, coverage, flags, imbalanced)
+
+    def describe(self, result: WeekNutrition, week: int = 0) -> List[str]:
+        """Issues of one scored week, phrased for the menu prompt"""
+        issues = []
+        for i, (macro, label) in enumerate(MACRO_LABELS.items()):
+            low, high = self.energy_ratio[macro]
+            ratio = result.energy_ratio[week, i]
+            if result.flags[f'{macro}_low'][week] or result.flags[f'{macro}_high'][week]:
+                level = '低い' if result.flags[f'{macro}_low'][week] else '高い'
+                issues.append(f"{label}のエネルギー比率が{level}（{ratio:.0f}%、目安 {low}〜{high}%）")
+        if result.flags['protein_streak'][week]:
+            source = self.protein_sources[result.streak_source[week]]
+            issues.append(f"同じたんぱく源（{source}）が{result.max_streak[week]}日続いている")
+        if result.flags['protein_missing'][week]:
+            missing = [source for source, used in zip(self.protein_sources, result.sources_used[week]) if not used]
+            issues.append(f"たんぱく源に{'・'.join(missing)}が使われていない")
+        if result.flags['vegetables_low'][week]:
+            issues.append(f"野菜が少ない（1食あたり平均{result.vegetables[week]:.0f}g、目安 {self.min_vegetable_grams:g}g）")
+        return issues
+
+    def assess(self, week_plan: List[Dict]) -> Dict:
+        """Nutrition summary of a single week for generated_menu.json"""
+        result = self.score([week_plan])
+        return {
+            'per_serving': {nutrient: round(float(value), 1) for nutrient, value in zip(NUTRIENTS, result.weekly[0])},
+            'daily_energy': {day: round(float(value), 1) for day, value in zip(DAY_NAMES, result.daily[0, :, 0])},
+            'energy_ratio': {macro: round(float(value), 1)
+                             for macro, value in zip(MACRO_LABELS, result.energy_ratio[0])},
+            'protein_rotation': [self.protein_sources[s] if s >= 0 else None for s in result.main_source[0]],
+            'coverage': round(float(result.coverage[0]), 2),
+            'balanced': not bool(result.imbalanced[0]),
+            'issues': self.describe(result, 0) if result.imbalanced[0] else [],
+        }
@@ -0,0 +1,141 @@
+"""
+Pantry-aware dish selection.
+
+Picks dishes from the local recipe catalog that use up ingredients already
+in stock, subject to the intake's avoid_ingredients, max_cooking_time and a
+variety penalty. The chosen dishes are passed to create_menu_prompt as hints.
+
+The solver is a greedy selection over the recipe × ingredient matrix: each
+step scores every feasible recipe in one vectorized pass, takes the best
+one and discounts the stock it consumes so that later picks favour the
+remaining pantry items.
+"""
+
+import csv
+import json
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from scripts.recipe_catalog import RecipeCatalog, normalize_ingredient
+
+
+def load_pantry(path) -> List[Dict]:
+    """Load pantry items from JSON or CSV.
+
+    JSON may be a list of {"name", "quantity", "unit", "expires"} objects or a
+    {name: quantity} mapping; CSV needs a "name" column and may carry the
+    other fields as columns.
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = [{'name': name, 'quantity': quantity} for name, quantity in rows.items()]
+
+    pantry = []
+    for row in rows:
+        if not row.get('name'):
+            continue
+        expires = row.get('expires') or None
+        pantry.append({
+            'name': row['name'].strip(),
+            'quantity': float(row['quantity']) if row.get('quantity') not in (None, '') else None,
+            'unit': row.get('unit') or '',
+            'expires': date.fromisoformat(expires) if expires else None,
+        })
+    return pantry
+
+
+class PantryOptimizer:
+    def __init__(self, catalog: RecipeCatalog, variety_penalty: float = 0.5, reuse_decay: float = 0.3,
+                 expiry_bonus: float = 1.0, expiry_days: int = 3, shopping_cost: float = 0.05):
+        self.catalog = catalog
+        self.variety_penalty = variety_penalty  # Per dish already chosen from the same category
+        self.reuse_decay = reuse_decay          # Remaining weight of an ingredient after it is used
+        self.expiry_bonus = expiry_bonus        # Extra weight for items expiring soon
+        self.expiry_days = expiry_days
+        self.shopping_cost = shopping_cost      # Penalty per ingredient not in the pantry
+
+    def ingredient_weights(self, pantry: List[Dict], week_start: date) -> np.ndarray:
+        """Weight per catalog ingredient: 0 when not in stock"""
+        weights = np.zeros(self.catalog.ingredient_count, dtype=np.float64)
+        soon = week_start + timedelta(days=self.expiry_days)
+        for item in pantry:
+            ingredient = self.catalog.ingredient_index.get(normalize_ingredient(item['name']))
+            if ingredient is None or item.get('quantity') == 0:
+                continue
+            bonus = self.expiry_bonus if item.get('expires') and item['expires'] <= soon else 0.0
+            weights[ingredient] = max(weights[ingredient], 1.0 + bonus)
+        return weights
+
+    def feasible_recipes(self, avoid_ingredients: Iterable[str], max_cooking_time: Optional[int]) -> np.ndarray:
+        catalog = self.catalog
+        feasible = np.ones(len(catalog), dtype=bool)
+        if max_cooking_time:
+            feasible &= catalog.cooking_time <= max_cooking_time
+
+        avoid_ids = catalog.ingredient_ids(avoid_ingredients)
+        if avoid_ids.size:
+            feasible &= catalog.row_sums(np.isin(catalog.indices, avoid_ids).astype(np.float64)) == 0
+        return feasible
+
+    def suggest(self, pantry: List[Dict], days: int, avoid_ingredients: Iterable[str] = (),
+                max_cooking_time: Optional[int] = None, week_start: Optional[date] = None) -> List[Dict]:
+        """Choose up to ``days`` dishes that maximize pantry consumption"""
+        catalog = self.catalog
+        if not len(catalog) or not pantry or days <= 0:
+            return []
+
+        weights = self.ingredient_weights(pantry, week_start or date.today())
+        feasible = self.feasible_recipes(avoid_ingredients, max_cooking_time)
+
+        # Only entries of feasible recipes that use a stocked ingredient can score
+        active = feasible[catalog.rows] & (weights[catalog.indices] > 0)
+        rows = catalog.rows[active]
+        ingredients = catalog.indices[active]
+        if not rows.size:
+            return []
+
+        candidates, rows = np.unique(rows, return_inverse=True)  # rows now index candidates
+        category_counts = np.zeros(len(catalog.category_names), dtype=np.float64)
+        chosen = []
+
+        for _ in range(days):
+            entry_weights = weights[ingredients]
+            coverage = np.bincount(rows, weights=entry_weights, minlength=candidates.size)
+            used = np.bincount(rows, weights=(entry_weights > 0).astype(np.float64), minlength=candidates.size)
+
+            score = coverage - self.shopping_cost * (catalog.ingredient_counts[candidates] - used)
+            score -= self.variety_penalty * category_counts[catalog.category[candidates]]
+            score[coverage <= 0] = -np.inf
+            if chosen:
+                score[np.isin(candidates, chosen)] = -np.inf
+
+            best = int(np.argmax(score))
+            if not np.isfinite(score[best]):
+                break
+
+            recipe = int(candidates[best])
+            chosen.append(recipe)
+            category_counts[catalog.category[recipe]] += 1
+            weights[catalog.recipe_ingredients(recipe)] *= self.reuse_decay
+
+        return [self._describe(recipe, pantry) for recipe in chosen]
+
+    def _describe(self, recipe: int, pantry: List[Dict]) -> Dict:
+        catalog = self.catalog
+        stocked = {normalize_ingredient(item['name']): item['name'] for item in pantry}
+        used = [stocked[catalog.ingredient_names[i]] for i in catalog.recipe_ingredients(recipe)
+                if catalog.ingredient_names[i] in stocked]
+        return {
+            'name': catalog.names[recipe],
+            'cooking_time': int(catalog.cooking_time[recipe]),
+            'pantry_ingredients': used,
+        }
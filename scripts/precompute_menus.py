@@ -0,0 +1,129 @@
+"""
+Precompute default-settings menus ahead of the weekly run.
+
+For every tenant (or the single household when no tenant registry exists)
+the week's menu is generated from rules.yaml default_settings and stored in
+the speculative menu cache. When the weekly run finds no intake, or an
+intake whose settings match the defaults, it uses the stored menu and
+publishes without waiting for OpenAI; a differing intake discards it.
+
+Run it when the machine is otherwise idle, e.g. the day before the weekly
+run. Tenants are skipped while the load average per CPU exceeds --max-load,
+and households that already sent an intake for the week need no default
+menu.
+
+Usage:
+    python -m scripts.precompute_menus [--tenants config/tenants.yaml] [--week-start 2024-01-15]
+"""
+
+import os
+import sys
+import logging
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+from scripts.profiling import add_profile_argument, enable_profiling, finish_profiling
+from scripts.tenants import DEFAULT_TENANTS_PATH, Tenant, TenantRegistry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+GENERATION_BUDGET_SECONDS = 120   # Time left on the run deadline needed to start another menu
+
+
+def system_load() -> float:
+    """One-minute load average per CPU"""
+    return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+
+class MenuPrecomputer:
+    def __init__(self, deadline: Optional[RunDeadline] = None, openai_client=None, week_start: Optional[date] = None,
+                 max_load: Optional[float] = None, load: Callable[[], float] = system_load):
+        self.logger = logging.getLogger(__name__)
+        self.deadline = deadline or RunDeadline.from_env()
+        self.openai_client = openai_client
+        self.week_start = week_start
+        self.max_load = max_load
+        self.load = load
+
+    def idle(self) -> bool:
+        return self.max_load is None or self.load() <= self.max_load
+
+    def precompute(self, intake_path: Optional[str], user_id: Optional[str] = None,
+                   rules_override: Optional[str] = None) -> str:
+        """Precompute one household's menu; returns 'generated', 'cached' or 'intake'"""
+        generator = MenuGenerator(deadline=self.deadline, openai_client=self.openai_client,
+                                  intake_path=intake_path, user_id=user_id, week_start=self.week_start,
+                                  rules_override=rules_override)
+        if generator.intake_data is not None and generator.intake_data.week_start == generator.get_week_start():
+            return 'intake'
+        # Default settings only, a stale intake from an earlier week is ignored
+        generator.intake_data = None
+        return 'generated' if generator.precompute_menu() else 'cached'
+
+    def run(self, households: List[Dict]) -> Dict[str, str]:
+        """Precompute every household ({'id', 'intake_path', 'user_id', 'rules_path'}); outcome per household"""
+        outcomes = {}
+        for household in households:
+            if not self.deadline.has_budget(GENERATION_BUDGET_SECONDS):
+                outcomes[household['id']] = 'skipped: deadline'
+                continue
+            if not self.idle():
+                outcomes[household['id']] = 'skipped: busy'
+                continue
+            try:
+                outcomes[household['id']] = self.precompute(household['intake_path'], household.get('user_id'),
+                                                             household.get('rules_path'))
+            except Exception as e:
+                self.logger.error(f"Precomputing {household['id']} failed: {e}")
+                outcomes[household['id']] = f"failed: {e}"
+            self.logger.info(f"{household['id']}: {outcomes[household['id']]}")
+        return outcomes
+
+
+def tenant_households(tenants: List[Tenant]) -> List[Dict]:
+    return [{'id': tenant.id, 'intake_path': str(tenant.intake_path), 'user_id': tenant.user_id,
+             'rules_path': tenant.rules_path}
+            for tenant in tenants]
+
+
+def main():
+    """Main function to precompute default-settings menus"""
+    parser = argparse.ArgumentParser(description="Precompute default-settings menus for the weekly run")
+    parser.add_argument('--tenants', default=DEFAULT_TENANTS_PATH,
+                        help="Tenant registry YAML (the single household is used when it does not exist)")
+    parser.add_argument('--week-start', type=date.fromisoformat, help="Monday of the week (default: as generate_menu)")
+    parser.add_argument('--max-load', type=float, help="Skip households while the load average per CPU is above this")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'precompute_menus')
+
+    try:
+        if Path(args.tenants).exists():
+            households = tenant_households(list(TenantRegistry.load(args.tenants)))
+        else:
+            households = [{'id': 'default', 'intake_path': 'data/intake.json', 'user_id': None}]
+
+        outcomes = MenuPrecomputer(week_start=args.week_start, max_load=args.max_load).run(households)
+        for household_id, outcome in outcomes.items():
+            print(f"{household_id}: {outcome}")
+        if any(outcome.startswith('failed') for outcome in outcomes.values()):
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"Error precomputing menus: {e}")
+        sys.exit(1)
+    finally:
+        finish_profiling()
+
+
+if __name__ == "__main__":
+    main()
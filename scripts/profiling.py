@@ -0,0 +1,249 @@
+"""
+Per-stage CPU and memory profiling for the pipeline scripts.
+
+Scripts started with --profile enable a process-wide StageProfiler. Each
+stage (load_config, load_intake_data, prompt_build, generation,
+block_building, notion_write, ...) then runs under its own cProfile
+profiler and between two tracemalloc snapshots. For every stage run a
+.pstats file is written (readable with pstats, snakeviz, or flameprof /
+gprof2dot for flame graphs), and report.txt lists wall time, peak memory
+and the top allocation sites per stage.
+
+Stages may nest (e.g. block building inside a Notion write): the outer
+stage's CPU profile is paused while the inner one runs, and its peak memory
+includes the inner stages. The CPU profiler and tracemalloc's peak are
+process-wide, so one thread is profiled at a time: a stage entered on
+another thread while a stage is running (concurrent menu_service jobs)
+runs unprofiled and is counted in the report as skipped.
+
+Worker processes (run_tenants shards) profile into their own worker_<pid>
+subdirectory of the run and save their stage results there; the parent's
+finish_profiling() merges them into its report.
+"""
+
+import os
+import json
+import time
+import cProfile
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+DEFAULT_PROFILE_DIR = 'data/profile'
+STAGES_FILE = 'stages.json'   # Stage results of a worker process, merged by the parent
+TRACEMALLOC_FRAMES = 5
+
+# Allocation sites inside the profiler itself are not interesting
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+]
+
+
+class StageResult(NamedTuple):
+    name: str
+    seconds: float
+    peak_bytes: int
+    allocated_bytes: int
+    top_allocations: List[Tuple[str, int, int]]  # (site, size diff, count diff)
+    pstats_path: Path
+
+
+class _Frame:
+    """A running stage: its CPU profile and the peak memory seen before an inner stage reset it"""
+
+    __slots__ = ('profile', 'peak')
+
+    def __init__(self, profile: cProfile.Profile):
+        self.profile = profile
+        self.peak = 0
+
+
+class StageProfiler:
+    def __init__(self, output_dir, top: int = 10):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.top = top
+        self.results: List[StageResult] = []
+        self.skipped = 0
+        self._stack: List[_Frame] = []
+        self._owner: Optional[int] = None  # Thread whose stages are being profiled
+        self._lock = threading.Lock()
+        self._count = 0
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def _acquire(self) -> bool:
+        """Whether the calling thread may profile; the first stage of a thread claims the profiler"""
+        with self._lock:
+            if self._owner is None:
+                self._owner = threading.get_ident()
+            elif self._owner != threading.get_ident():
+                self.skipped += 1
+                return False
+            return True
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self._acquire():
+            yield
+            return
+
+        stack = self._stack
+        if stack:
+            stack[-1].profile.disable()
+            stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+
+        before = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        tracemalloc.reset_peak()
+        frame = _Frame(cProfile.Profile())
+        stack.append(frame)
+        start = time.perf_counter()
+        frame.profile.enable()
+        try:
+            yield
+        finally:
+            frame.profile.disable()
+            seconds = time.perf_counter() - start
+            peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+            after = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+            stack.pop()
+            self._record(name, frame.profile, before, after, seconds, peak)
+            if stack:
+                stack[-1].profile.enable()
+            else:
+                with self._lock:
+                    self._owner = None
+
+    def _record(self, name: str, profile: cProfile.Profile, before: tracemalloc.Snapshot,
+                after: tracemalloc.Snapshot, seconds: float, peak: int):
+        with self._lock:
+            self._count += 1
+            pstats_path = self.output_dir / f"{self._count:03d}_{name}.pstats"
+
+        profile.dump_stats(str(pstats_path))
+        differences = [stat for stat in after.compare_to(before, 'lineno') if stat.size_diff > 0]
+        top_allocations = [(str(stat.traceback[0]), stat.size_diff, stat.count_diff) for stat in differences[:self.top]]
+        result = StageResult(name, seconds, peak, sum(stat.size_diff for stat in differences), top_allocations,
+                             pstats_path)
+        with self._lock:
+            self.results.append(result)
+
+    def save_results(self) -> Path:
+        """Write the stage results to stages.json for the parent process to merge"""
+        with self._lock:
+            results = [dict(result._asdict(), pstats_path=result.pstats_path.name) for result in self.results]
+        path = self.output_dir / STAGES_FILE
+        tmp_path = path.with_suffix('.json.tmp')
+        tmp_path.write_text(json.dumps({'results': results, 'skipped': self.skipped}), encoding='utf-8')
+        os.replace(tmp_path, path)
+        return path
+
+    def merge_workers(self):
+        """Add the results saved by worker processes in subdirectories of this run"""
+        for path in sorted(self.output_dir.glob(f"*/{STAGES_FILE}")):
+            data = json.loads(path.read_text(encoding='utf-8'))
+            for result in data['results']:
+                self.results.append(StageResult(
+                    result['name'], result['seconds'], result['peak_bytes'], result['allocated_bytes'],
+                    [tuple(allocation) for allocation in result['top_allocations']],
+                    path.parent / result['pstats_path']))
+            self.skipped += data['skipped']
+
+    def write_report(self) -> Path:
+        """Write report.txt with timings and top allocation sites per stage"""
+        lines = [f"Profile written {datetime.now().isoformat(timespec='seconds')}", ""]
+        lines.append(f"{'stage':<24}{'seconds':>10}{'peak MiB':>12}{'alloc MiB':>12}  pstats")
+        for result in self.results:
+            lines.append(f"{result.name:<24}{result.seconds:>10.3f}{result.peak_bytes / 2**20:>12.2f}"
+                         f"{result.allocated_bytes / 2**20:>12.2f}  {self._relative(result.pstats_path)}")
+        if self.skipped:
+            lines.append(f"({self.skipped} stages on other threads ran unprofiled)")
+
+        for result in self.results:
+            lines.extend(["", f"## {self._relative(result.pstats_path.with_suffix(''))}: top allocations"])
+            if not result.top_allocations:
+                lines.append("  (none retained)")
+            for site, size, count in result.top_allocations:
+                lines.append(f"  {size / 1024:>10.1f} KiB {count:>+8d} blocks  {site}")
+
+        report_path = self.output_dir / 'report.txt'
+        report_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return report_path
+
+    def _relative(self, path: Path) -> str:
+        return path.relative_to(self.output_dir).as_posix()
+
+
+_active: Optional[StageProfiler] = None
+
+
+def enable_profiling(output_dir: str = DEFAULT_PROFILE_DIR, label: str = 'run') -> StageProfiler:
+    """Profile every stage of this process into <output_dir>/<label>_<timestamp>/"""
+    global _active
+    run_dir = Path(output_dir) / f"{label}_{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    _active = StageProfiler(run_dir)
+    return _active
+
+
+def enable_worker_profiling(run_dir) -> StageProfiler:
+    """Profile this worker process into <run_dir>/worker_<pid>/, replacing a profiler inherited by fork"""
+    global _active
+    _active = StageProfiler(Path(run_dir) / f"worker_{os.getpid()}")
+    return _active
+
+
+def save_worker_profile():
+    """Save the worker's stage results for the parent's report; workers are not finished explicitly"""
+    if _active is not None:
+        _active.save_results()
+
+
+def profile_dir() -> Optional[Path]:
+    """Run directory of the active profiler, handed to worker processes"""
+    return _active.output_dir if _active is not None else None
+
+
+def finish_profiling() -> Optional[Path]:
+    """Merge worker results, write the report of the active profiler and stop profiling"""
+    global _active
+    if _active is None:
+        return None
+    _active.merge_workers()
+    report_path = _active.write_report()
+    _active = None
+    tracemalloc.stop()
+    print(f"Profile written to {report_path.parent}")
+    return report_path
+
+
+def profile_stage(name: str):
+    """Context manager profiling a stage when profiling is enabled"""
+    return _active.stage(name) if _active is not None else nullcontext()
+
+
+def profiled(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator running a function as a profiled stage"""
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_profile_argument(parser):
+    """Add the shared --profile [DIR] option to a script's argument parser"""
+    parser.add_argument('--profile', nargs='?', const=DEFAULT_PROFILE_DIR, metavar='DIR',
+                        help=f"Profile each stage (cProfile + tracemalloc) into DIR (default: {DEFAULT_PROFILE_DIR})")
@@ -0,0 +1,166 @@
+"""
+Client-side rate limiting for API calls.
+
+Notion allows an average of three requests per second per integration and
+answers bursts above that with HTTP 429, so concurrent callers share one
+token bucket and wait for a token before each request instead of relying
+on retries.
+
+OpenAI limits requests and tokens per minute for the whole API key. When
+several worker processes share the key, SharedRateLimiter keeps both
+buckets in shared memory so the limit holds across processes.
+"""
+
+import time
+import threading
+import multiprocessing
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+NOTION_REQUESTS_PER_SECOND = 3.0
+
+
+class RateLimiter:
+    """Thread-safe token bucket: ``rate`` requests per second on average, bursts up to ``burst``"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` are available; returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def call(self, func: Callable[[], T]) -> T:
+        """Run func once a token is available"""
+        self.acquire()
+        return func()
+
+
+class RateLimitedProxy:
+    """Attribute chain over an SDK client (e.g. notion.pages.create) whose calls wait for the limiter"""
+
+    def __init__(self, target: Any, limiter: RateLimiter):
+        self._target = target
+        self._limiter = limiter
+
+    def __getattr__(self, name: str) -> 'RateLimitedProxy':
+        return RateLimitedProxy(getattr(self._target, name), self._limiter)
+
+    def __call__(self, *args, **kwargs):
+        return self._limiter.call(lambda: self._target(*args, **kwargs))
+
+
+class SharedRateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared by worker processes.
+
+    Create it in the parent process and hand it to workers at process start
+    (e.g. as a pool initializer argument).
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: Optional[float] = None,
+                 context=None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        context = context or multiprocessing.get_context()
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute or 0)
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = context.Lock()
+        # Available requests, available tokens, time of the last refill
+        self._state = context.Array('d', [self.requests_per_minute, self.tokens_per_minute, clock()], lock=False)
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        # Clocks are re-created in the worker
+        del state['clock'], state['sleep']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self.clock = time.monotonic
+        self.sleep = time.sleep
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = max(0.0, now - self._state[2]) / 60
+        self._state[0] = min(self.requests_per_minute, self._state[0] + elapsed * self.requests_per_minute)
+        if self.tokens_per_minute:
+            self._state[1] = min(self.tokens_per_minute, self._state[1] + elapsed * self.tokens_per_minute)
+        self._state[2] = now
+
+    def acquire(self, tokens: float = 0) -> float:
+        """Block until one request and ``tokens`` tokens are available; returns the time spent waiting"""
+        # A request larger than the whole bucket waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                missing_requests = max(0.0, 1 - self._state[0])
+                missing_tokens = max(0.0, tokens - self._state[1]) if tokens else 0.0
+                if not missing_requests and not missing_tokens:
+                    self._state[0] -= 1
+                    self._state[1] -= tokens
+                    return waited
+                delay = max(missing_requests * 60 / self.requests_per_minute,
+                            missing_tokens * 60 / self.tokens_per_minute if missing_tokens else 0.0)
+            self.sleep(delay)
+            waited += delay
+
+    def settle(self, estimated_tokens: float, actual_tokens: float):
+        """Correct the token bucket once the actual usage of a request is known"""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._state[1] = min(self.tokens_per_minute, self._state[1] + estimated_tokens - actual_tokens)
+
+
+def estimate_tokens(request: Dict) -> int:
+    """Upper estimate of a chat completion's tokens: one per prompt character plus max_tokens"""
+    prompt = sum(len(message.get('content') or '') for message in request.get('messages', []))
+    return prompt + int(request.get('max_tokens') or 0)
+
+
+class RateLimitedOpenAI:
+    """OpenAI client whose chat completions wait for the shared RPM/TPM budget"""
+
+    def __init__(self, client: Any, limiter: SharedRateLimiter):
+        self.client = client
+        self.limiter = limiter
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_chat_completion))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def _create_chat_completion(self, **kwargs):
+        estimated = estimate_tokens(kwargs)
+        self.limiter.acquire(estimated)
+        response = self.client.chat.completions.create(**kwargs)
+        usage = getattr(response, 'usage', None)
+        if usage is not None and getattr(usage, 'total_tokens', None):
+            self.limiter.settle(estimated, usage.total_tokens)
+        return response
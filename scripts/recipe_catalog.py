@@ -0,0 +1,89 @@
+"""
+Local recipe catalog stored as NumPy arrays.
+
+Recipes are loaded from a JSON file (see data/recipes_example.json) and
+kept as a sparse recipe × ingredient matrix in CSR form, so that per-recipe
+aggregates over ingredients (pantry coverage, avoided ingredients, amounts)
+are a single vectorized pass over all recipes.
+"""
+
+import json
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+def normalize_ingredient(name: str) -> str:
+    """Canonical spelling used to match ingredient names across sources"""
+    return unicodedata.normalize('NFKC', name).strip().lower()
+
+
+class RecipeCatalog:
+    def __init__(self, records: Iterable[Dict]):
+        names: List[str] = []
+        cooking_times: List[int] = []
+        categories: List[str] = []
+        servings: List[float] = []
+        indptr = [0]
+        indices: List[int] = []
+        quantities: List[float] = []
+        units: List[str] = []
+        self.ingredient_index: Dict[str, int] = {}
+
+        for record in records:
+            names.append(record['name'])
+            cooking_times.append(int(record.get('cooking_time') or 0))
+            categories.append(record.get('category') or '')
+            servings.append(float(record.get('servings') or 2))
+            for ingredient in record.get('ingredients', []):
+                key = normalize_ingredient(ingredient['name'])
+                indices.append(self.ingredient_index.setdefault(key, len(self.ingredient_index)))
+                quantities.append(float(ingredient.get('quantity') or 0))
+                units.append(ingredient.get('unit') or '')
+            indptr.append(len(indices))
+
+        self.names = names
+        self.name_index = {name: i for i, name in enumerate(names)}
+        self.ingredient_names = list(self.ingredient_index)
+        self.cooking_time = np.asarray(cooking_times, dtype=np.int32)
+        self.servings = np.asarray(servings, dtype=np.float64)
+        self.category_names, self.category = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+        self.category = self.category.astype(np.int32)
+
+        # CSR matrix: row r spans indices[indptr[r]:indptr[r + 1]]
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.quantities = np.asarray(quantities, dtype=np.float64)
+        self.units = np.asarray(units, dtype=object)
+        # Recipe of each stored entry, for bincount-based row sums
+        self.rows = np.repeat(np.arange(len(names), dtype=np.int32), np.diff(self.indptr))
+        self.ingredient_counts = np.diff(self.indptr).astype(np.int32)
+
+    @classmethod
+    def load(cls, path) -> 'RecipeCatalog':
+        with open(Path(path), 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def ingredient_count(self) -> int:
+        return len(self.ingredient_names)
+
+    def ingredient_ids(self, names: Iterable[str]) -> np.ndarray:
+        """Ids of the known ingredients among names (unknown names are skipped)"""
+        ids = [self.ingredient_index.get(normalize_ingredient(name)) for name in names]
+        return np.asarray([i for i in ids if i is not None], dtype=np.int32)
+
+    def row_sums(self, entry_values: np.ndarray) -> np.ndarray:
+        """Sum a value per stored entry into a value per recipe"""
+        return np.bincount(self.rows, weights=entry_values, minlength=len(self.names))
+
+    def recipe_ingredients(self, recipe: int) -> np.ndarray:
+        return self.indices[self.indptr[recipe]:self.indptr[recipe + 1]]
+
+    def find(self, name: str) -> Optional[int]:
+        return self.name_index.get(name)
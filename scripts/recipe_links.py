@@ -0,0 +1,269 @@
+"""
+Local full-text index of recipe pages, used to link dishes to recipes.
+
+The index is built from sitemaps and exports the user downloads from their
+priority_recipe_sites:
+
+    .xml / .xml.gz   sitemaps; the title is read from <image:title> or
+                     <news:title>, entries without a title are skipped
+    .jsonl / .json   records with "url" and "title" (or "name")
+    .csv             columns url and title (or name)
+
+Titles are normalized (NFKC, lower case) and stored in an SQLite FTS5 table
+as character bigrams, the usual n-gram tokenization for Japanese text
+without word boundaries: 肉じゃが is indexed as "肉じ じゃ ゃが", and a dish
+name matches every title containing it as a phrase of its bigrams. Unlike
+FTS5's trigram tokenizer, two-character dishes (豚汁, 餃子) are indexed too.
+
+Recipes are numbered by site and then by title length, so the shortest
+title of a site containing a dish (the title closest to the dish name) is
+its first match in the site's rowid range, and FTS5 stops at that match
+instead of ranking all of them. A week's dishes are looked up in one query:
+the first match per dish and site, of which the first priority site wins.
+
+The index is rebuilt as a whole from the sources and replaced atomically,
+so a running generator never reads a half-built index.
+
+Usage:
+    python -m scripts.recipe_links --build exports/cookpad.xml.gz exports/kurashiru.jsonl
+    python -m scripts.recipe_links --lookup 肉じゃが 豚汁 --sites cookpad.com kurashiru.com
+"""
+
+import os
+import re
+import csv
+import sys
+import gzip
+import json
+import sqlite3
+import logging
+import argparse
+import unicodedata
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_RECIPE_LINKS_PATH = 'data/recipe_links.sqlite3'
+
+SCHEMA = """
+CREATE TEMP TABLE sources (
+    url TEXT PRIMARY KEY,
+    site TEXT NOT NULL,
+    title TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE recipes (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE TABLE sites (
+    site TEXT PRIMARY KEY,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE recipe_grams USING fts5(
+    grams, content='', tokenize='unicode61 remove_diacritics 0'
+);
+"""
+
+SEGMENT_PATTERN = re.compile(r'\w+')
+TITLE_TAGS = ('title',)   # Local name of <image:title>, <news:title>, <video:title>
+
+
+class RecipeLink(NamedTuple):
+    url: str
+    title: str
+    site: str
+
+
+def normalize_site(site: str) -> str:
+    """Host name without scheme, path or leading www."""
+    host = urlparse(site if '//' in site else f"//{site}").hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def bigrams(text: str) -> List[str]:
+    """Character bigrams of each word-character run; a one-character run is kept whole"""
+    grams = []
+    for segment in SEGMENT_PATTERN.findall(unicodedata.normalize('NFKC', text).lower()):
+        if len(segment) == 1:
+            grams.append(segment)
+        else:
+            grams.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return grams
+
+
+def match_expression(dish: str) -> Optional[str]:
+    """FTS5 query matching titles that contain every word-character run of the dish"""
+    phrases = []
+    for segment in SEGMENT_PATTERN.findall(unicodedata.normalize('NFKC', dish).lower()):
+        phrases.append('"' + ' '.join(bigrams(segment)) + '"')
+    return ' AND '.join(phrases) or None
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def read_sitemap(path: Path) -> Iterator[Tuple[str, str]]:
+    """(url, title) of every <url> entry with a title, parsed incrementally"""
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(path, 'rb') as f:
+        for _, element in ET.iterparse(f, events=('end',)):
+            if _local_name(element.tag) != 'url':
+                continue
+            url, title = None, None
+            for child in element.iter():
+                name = _local_name(child.tag)
+                if name == 'loc' and url is None and child.text:
+                    url = child.text.strip()
+                elif name in TITLE_TAGS and title is None and child.text:
+                    title = child.text.strip()
+            if url and title:
+                yield url, title
+            element.clear()
+
+
+def read_records(records: Iterable[Dict]) -> Iterator[Tuple[str, str]]:
+    for record in records:
+        url, title = record.get('url'), record.get('title') or record.get('name')
+        if url and title:
+            yield url.strip(), title.strip()
+
+
+def read_source(path) -> Iterator[Tuple[str, str]]:
+    """(url, title) pairs of a sitemap or export file"""
+    path = Path(path)
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if '.xml' in suffixes:
+        yield from read_sitemap(path)
+    elif suffixes[-1:] == ['.jsonl']:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from read_records(json.loads(line) for line in f if line.strip())
+    elif suffixes[-1:] == ['.json']:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from read_records(json.load(f))
+    elif suffixes[-1:] == ['.csv']:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            yield from read_records(csv.DictReader(f))
+    else:
+        raise ValueError(f"Unsupported recipe source: {path} (expected .xml, .xml.gz, .jsonl, .json or .csv)")
+
+
+class RecipeLinkIndex:
+    def __init__(self, path: str = DEFAULT_RECIPE_LINKS_PATH):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Recipe link index not found: {self.path}")
+        self.db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT count(*) FROM recipes").fetchone()[0]
+
+    @classmethod
+    def build(cls, sources: Iterable, path: str = DEFAULT_RECIPE_LINKS_PATH) -> int:
+        """Rebuild the index from source files; returns the number of recipes indexed"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.unlink(missing_ok=True)
+
+        def rows():
+            for source in sources:
+                for url, title in read_source(source):
+                    site = normalize_site(url)
+                    if site:
+                        yield site, title, url
+
+        db = sqlite3.connect(str(tmp_path))
+        try:
+            # A failed build only loses the temporary file
+            db.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+            db.create_function('bigrams', 1, lambda title: ' '.join(bigrams(title)), deterministic=True)
+            with db:
+                db.executemany("INSERT OR IGNORE INTO sources (site, title, url) VALUES (?, ?, ?)", rows())
+                db.execute("INSERT INTO recipes (site, title, url) "
+                           "SELECT site, title, url FROM sources ORDER BY site, length(title), title")
+                db.execute("INSERT INTO sites SELECT site, min(id), max(id) FROM recipes GROUP BY site")
+                db.execute("INSERT INTO recipe_grams (rowid, grams) SELECT id, bigrams(title) FROM recipes")
+                db.execute("INSERT INTO recipe_grams (recipe_grams) VALUES ('optimize')")
+            count = db.execute("SELECT count(*) FROM recipes").fetchone()[0]
+        finally:
+            db.close()
+        os.replace(tmp_path, path)
+        logging.getLogger(__name__).info(f"Indexed {count} recipes in {path}")
+        return count
+
+    def lookup(self, dishes: Iterable[str], sites: Optional[List[str]] = None) -> Dict[str, RecipeLink]:
+        """Best recipe link per dish name, from the sites in priority order (any site when none are given)"""
+        queries = {}
+        for dish in dishes:
+            expression = match_expression(dish)
+            if expression and dish not in queries:
+                queries[dish] = expression
+        if not queries:
+            return {}
+
+        names = list(queries)
+        params: List = []
+        for i, name in enumerate(names):
+            params += [i, queries[name]]
+        sql = f"WITH queries (i, expression) AS (VALUES {', '.join(['(?, ?)'] * len(names))})"
+
+        sites = list(dict.fromkeys(filter(None, (normalize_site(site) for site in sites or []))))
+        if sites:
+            sql += f", priorities (site, priority) AS (VALUES {', '.join(['(?, ?)'] * len(sites))})"
+            for priority, site in enumerate(sites):
+                params += [site, priority]
+        else:
+            sql += ", priorities (site, priority) AS (SELECT site, first_id FROM sites)"
+
+        sql += """
+            , first_matches AS MATERIALIZED (
+                SELECT q.i, p.priority, (
+                    SELECT rowid FROM recipe_grams
+                    WHERE recipe_grams MATCH q.expression AND rowid BETWEEN s.first_id AND s.last_id
+                    ORDER BY rowid LIMIT 1
+                ) AS id
+                FROM queries q, priorities p JOIN sites s ON s.site = p.site
+            )
+            SELECT m.i, r.url, r.title, r.site
+            FROM first_matches m JOIN recipes r ON r.id = m.id
+            WHERE m.priority = (SELECT min(priority) FROM first_matches WHERE i = m.i AND id IS NOT NULL)
+        """
+        return {names[i]: RecipeLink(url, title, site) for i, url, title, site in self.db.execute(sql, params)}
+
+
+def main():
+    """Build the recipe link index or look up dishes in it"""
+    parser = argparse.ArgumentParser(description="Local recipe link index for priority_recipe_sites")
+    parser.add_argument('--index', default=DEFAULT_RECIPE_LINKS_PATH, help="Index database")
+    parser.add_argument('--build', nargs='+', metavar='SOURCE', help="Rebuild from sitemaps/exports")
+    parser.add_argument('--lookup', nargs='+', metavar='DISH', help="Dish names to look up")
+    parser.add_argument('--sites', nargs='+', help="Recipe sites in priority order")
+    args = parser.parse_args()
+
+    try:
+        if args.build:
+            count = RecipeLinkIndex.build(args.build, args.index)
+            print(f"Indexed {count} recipes in {args.index}")
+        if args.lookup:
+            links = RecipeLinkIndex(args.index).lookup(args.lookup, args.sites)
+            for dish in args.lookup:
+                link = links.get(dish)
+                print(f"{dish}: {f'{link.title} <{link.url}>' if link else 'no match'}")
+        if not args.build and not args.lookup:
+            parser.error("nothing to do: pass --build and/or --lookup")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Validated, cached loading of config/rules.yaml.
+
+The rules file is parsed with the C YAML loader when PyYAML was built with
+libyaml, validated against schemas.rules_schema.RulesConfig and kept per
+process:
+
+    stat       every load stats the files; unchanged mtime and size return
+               the compiled rules without reading anything
+    hash       a changed stat re-reads the file, but it is only parsed and
+               validated again when its SHA-256 differs (touch, checkout)
+
+Long-running processes (menu_service, run_tenants workers) therefore pick
+up edits on the next menu without a restart. When an edited file is
+invalid, the last valid rules stay in use and the errors are logged; at
+startup the errors are raised.
+
+A tenant's override file holds only the keys it changes. Mappings are
+merged key by key into config/rules.yaml, any other value replaces the
+default, and the merged rules are validated and cached per (rules,
+override) pair, so the merge happens once per change of either file.
+
+Usage:
+    python -m scripts.rules_config [--rules config/rules.yaml] [--override data/tenants/tanaka/rules.yaml]
+"""
+
+import os
+import sys
+import copy
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+from pydantic import ValidationError
+
+from schemas.intake_validation import format_errors
+from schemas.rules_schema import RulesConfig
+
+try:
+    from yaml import CSafeLoader as RulesLoader
+except ImportError:  # PyYAML without libyaml
+    from yaml import SafeLoader as RulesLoader
+
+DEFAULT_RULES_PATH = 'config/rules.yaml'
+
+
+def merge_rules(base: Dict, override: Dict) -> Dict:
+    """Rules with the override's keys merged in; nested mappings merge, other values replace"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_rules(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def describe_errors(error: ValidationError) -> str:
+    return '; '.join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in format_errors(error))
+
+
+class RulesSource:
+    """Parsed content of one YAML file, re-parsed only when its content changes"""
+
+    _instances: Dict[str, 'RulesSource'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stat: Optional[Tuple[int, int]] = None
+        self.digest: Optional[str] = None
+        self.data: Dict = {}
+
+    @classmethod
+    def for_file(cls, path) -> 'RulesSource':
+        key = str(Path(path).resolve())
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(path)
+            return cls._instances[key]
+
+    def load(self) -> Tuple[str, Dict]:
+        """(content hash, parsed mapping) of the file as it is now"""
+        if not self.path.exists():
+            raise FileNotFoundError(f"Config file not found: {self.path}")
+        with self._lock:
+            stat = os.stat(self.path)
+            if (stat.st_mtime_ns, stat.st_size) != self._stat:
+                content = self.path.read_bytes()
+                digest = hashlib.sha256(content).hexdigest()
+                if digest != self.digest:
+                    data = yaml.load(content, Loader=RulesLoader) or {}
+                    if not isinstance(data, dict):
+                        raise ValueError(f"{self.path} must contain a mapping")
+                    self.digest, self.data = digest, data
+                self._stat = (stat.st_mtime_ns, stat.st_size)
+            return self.digest, self.data
+
+
+class CompiledRules:
+    """Validated rules of one rules file and optional override, reloaded when either changes"""
+
+    _instances: Dict[Tuple[str, Optional[str]], 'CompiledRules'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path=DEFAULT_RULES_PATH, override_path=None):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.override_path = Path(override_path) if override_path else None
+        self._lock = threading.Lock()
+        self._digests: Optional[Tuple[str, Optional[str]]] = None
+        self.rules: Optional[RulesConfig] = None
+        self.data: Dict[str, Any] = {}
+
+    @classmethod
+    def for_file(cls, path=DEFAULT_RULES_PATH, override_path=None) -> 'CompiledRules':
+        """Process-wide compiled rules for a rules file and override"""
+        key = (str(Path(path).resolve()), str(Path(override_path).resolve()) if override_path else None)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(path, override_path)
+            return cls._instances[key]
+
+    def _compile(self) -> Tuple[Tuple[str, Optional[str]], Optional[RulesConfig]]:
+        digest, data = RulesSource.for_file(self.path).load()
+        digests, override = (digest, None), None
+        if self.override_path is not None:
+            override_digest, override = RulesSource.for_file(self.override_path).load()
+            digests = (digest, override_digest)
+        if digests == self._digests:
+            return digests, None
+
+        merged = merge_rules(data, override) if override else data
+        try:
+            return digests, RulesConfig(**merged)
+        except ValidationError as e:
+            sources = f"{self.path} + {self.override_path}" if self.override_path else str(self.path)
+            raise ValueError(f"Invalid rules in {sources}: {describe_errors(e)}") from None
+
+    def get(self) -> RulesConfig:
+        """Current rules; after a failed reload the last valid rules"""
+        with self._lock:
+            try:
+                digests, rules = self._compile()
+            except Exception as e:
+                if self.rules is None:
+                    raise
+                self.logger.error(f"Keeping previous rules: {e}")
+                return self.rules
+            if rules is not None:
+                if self.rules is not None:
+                    self.logger.info(f"Reloaded rules from {self.path}")
+                self.rules, self._digests = rules, digests
+                self.data = rules.model_dump()
+            return self.rules
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Current rules as a plain mapping the caller may modify"""
+        self.get()
+        return copy.deepcopy(self.data)
+
+
+def load_rules(path=DEFAULT_RULES_PATH, override_path=None) -> Dict[str, Any]:
+    """Validated rules as a mapping, with every section and default filled in"""
+    return CompiledRules.for_file(path, override_path).as_dict()
+
+
+def main():
+    """Validate rules.yaml and an optional override file"""
+    parser = argparse.ArgumentParser(description="Validate rules.yaml")
+    parser.add_argument('--rules', default=DEFAULT_RULES_PATH, help="Rules file")
+    parser.add_argument('--override', help="Tenant override file merged over the rules")
+    args = parser.parse_args()
+
+    try:
+        rules = CompiledRules(args.rules, args.override).get()
+        meal_types = [meal.name for meal in rules.meal_types if meal.enabled]
+        enabled = [name for name in ('pantry', 'shopping_list', 'history', 'reuse', 'calendar', 'speculative')
+                   if getattr(rules, name).enabled]
+        print(f"Rules OK: meal types {', '.join(meal_types) or 'none'}; enabled: {', '.join(enabled) or 'none'}")
+
+    except Exception as e:
+        print(f"Error loading rules: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
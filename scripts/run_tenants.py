@@ -0,0 +1,199 @@
+"""
+Generate and publish the weekly menu for every registered tenant.
+
+Tenants are split into shards (see tenants.shard_tenants), one per worker
+process, so prompt building, parsing and block building use every core.
+Within a shard, tenants run on a small thread pool because most of a
+tenant's time is spent waiting on OpenAI and Notion.
+
+Rate limits:
+    Notion   per integration token. A token's tenants always share a shard,
+             so a per-process token bucket per token enforces the limit.
+    OpenAI   per API key, shared by all tenants. Requests and estimated
+             tokens are drawn from one RPM/TPM budget in shared memory.
+
+With --profile each worker process profiles into its own worker_<pid>
+directory of the run, merged into the run's report.txt at the end.
+
+Usage:
+    python -m scripts.run_tenants [--tenants config/tenants.yaml] [--workers 4] [--only tanaka suzuki]
+"""
+
+import os
+import sys
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from openai import OpenAI
+from notion_client import Client
+
+from scripts.archive_menu import NotionArchiver
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+from scripts.notion_update import NotionMenuUpdater
+from scripts.profiling import (add_profile_argument, enable_profiling, enable_worker_profiling, finish_profiling,
+                               profile_dir, profiled, save_worker_profile)
+from scripts.rate_limit import (NOTION_REQUESTS_PER_SECOND, RateLimitedOpenAI, RateLimitedProxy, RateLimiter,
+                                SharedRateLimiter)
+from scripts.tenants import DEFAULT_TENANTS_PATH, Tenant, TenantRegistry, shard_tenants
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(process)d - %(levelname)s - %(message)s'
+)
+
+DEFAULT_OPENAI_RPM = 500
+DEFAULT_OPENAI_TPM = 30000
+TENANT_BUDGET_SECONDS = 900   # Run deadline for one tenant's generate + publish
+
+
+class TenantResult(NamedTuple):
+    tenant_id: str
+    page_id: Optional[str]
+    error: Optional[str]
+
+
+class TenantRunner:
+    """Runs tenants of one shard, sharing one OpenAI client and one Notion client per token"""
+
+    def __init__(self, openai_client, notion_factory: Callable[[Tenant], object], archive: bool = False,
+                 threads: int = 4, budget: float = TENANT_BUDGET_SECONDS, deadline: Optional[RunDeadline] = None):
+        self.logger = logging.getLogger(__name__)
+        self.deadline = deadline or RunDeadline.from_env()
+        self.openai_client = openai_client
+        self.notion_factory = notion_factory
+        self.archive = archive
+        self.threads = threads
+        self.budget = budget
+        self._notion_clients: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def notion_client(self, tenant: Tenant):
+        with self._lock:
+            if tenant.notion_token_key not in self._notion_clients:
+                self._notion_clients[tenant.notion_token_key] = self.notion_factory(tenant)
+            return self._notion_clients[tenant.notion_token_key]
+
+    @profiled('tenant')
+    def run_tenant(self, tenant: Tenant) -> TenantResult:
+        # The tenant's own budget, within what is left of the whole run
+        deadline = self.deadline.capped(self.budget)
+        try:
+            notion = self.notion_client(tenant)
+            if self.archive:
+                NotionArchiver(deadline=deadline, notion_client=notion, database_id=tenant.notion_database_id,
+                               mirror_path=str(tenant.mirror_path)).archive_old_menus()
+
+            generator = MenuGenerator(deadline=deadline, openai_client=self.openai_client,
+                                      intake_path=str(tenant.intake_path), user_id=tenant.user_id,
+                                      rules_override=tenant.rules_path)
+            menu_data = generator.save_menu_data(generator.generate_menu(), output_path=str(tenant.menu_path))
+
+            updater = NotionMenuUpdater(deadline=deadline, notion_client=notion,
+                                        database_id=tenant.notion_database_id, mirror_path=str(tenant.mirror_path))
+            page_id = updater.update_menu(menu_data)
+            self.logger.info(f"Tenant {tenant.id}: published {page_id}")
+            return TenantResult(tenant.id, page_id, None)
+        except Exception as e:
+            self.logger.error(f"Tenant {tenant.id} failed: {e}")
+            return TenantResult(tenant.id, None, str(e))
+
+    def run(self, tenants: List[Tenant]) -> List[TenantResult]:
+        with ThreadPoolExecutor(max_workers=max(1, min(self.threads, len(tenants)))) as executor:
+            return list(executor.map(self.run_tenant, tenants))
+
+
+# Worker process state, set by the pool initializer
+_openai_limiter: Optional[SharedRateLimiter] = None
+
+
+def _init_worker(openai_limiter: SharedRateLimiter, profile_run_dir: Optional[str] = None):
+    global _openai_limiter
+    _openai_limiter = openai_limiter
+    if profile_run_dir is not None:
+        enable_worker_profiling(profile_run_dir)
+
+
+def run_shard(tenants: List[Tenant], archive: bool, threads: int, notion_rps: float,
+              deadline_at: Optional[float] = None) -> List[TenantResult]:
+    """Entry point of a worker process; deadline_at is the run deadline fixed by the parent"""
+    openai_client = RateLimitedOpenAI(OpenAI(api_key=os.getenv('OPENAI_API_KEY')), _openai_limiter)
+
+    def notion_factory(tenant: Tenant):
+        client = Client(auth=tenant.notion_token(), timeout_ms=60000)
+        return RateLimitedProxy(client, RateLimiter(notion_rps))
+
+    try:
+        return TenantRunner(openai_client, notion_factory, archive=archive, threads=threads,
+                            deadline=RunDeadline(deadline_at)).run(tenants)
+    finally:
+        save_worker_profile()
+
+
+def run_tenants(tenants: List[Tenant], workers: int, threads: int = 4, archive: bool = False,
+                openai_rpm: float = DEFAULT_OPENAI_RPM, openai_tpm: float = DEFAULT_OPENAI_TPM,
+                notion_rps: float = NOTION_REQUESTS_PER_SECOND,
+                deadline: Optional[RunDeadline] = None) -> List[TenantResult]:
+    # Read once here: RUN_BUDGET_SECONDS counts from the start of this run, not of each worker
+    deadline = deadline or RunDeadline.from_env()
+    shards = shard_tenants(tenants, workers)
+    limiter = SharedRateLimiter(openai_rpm, openai_tpm)
+    logging.getLogger(__name__).info(f"Running {len(tenants)} tenants in {len(shards)} processes")
+    run_dir = profile_dir()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=len(shards), initializer=_init_worker,
+                             initargs=(limiter, str(run_dir) if run_dir is not None else None)) as executor:
+        futures = [executor.submit(run_shard, shard, archive, threads, notion_rps, deadline.deadline_at)
+                   for shard in shards]
+        for shard, future in zip(shards, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                # A crashed worker fails its whole shard, other shards are unaffected
+                results.extend(TenantResult(tenant.id, None, f"worker failed: {e}") for tenant in shard)
+    return results
+
+
+def main():
+    """Main function to generate and publish menus for all tenants"""
+    parser = argparse.ArgumentParser(description="Generate and publish menus for every tenant")
+    parser.add_argument('--tenants', default=DEFAULT_TENANTS_PATH, help="Tenant registry YAML")
+    parser.add_argument('--only', nargs='+', metavar='ID', help="Run only these tenants")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--threads', type=int, default=4, help="Concurrent tenants per worker process")
+    parser.add_argument('--openai-rpm', type=float, default=DEFAULT_OPENAI_RPM, help="OpenAI requests per minute")
+    parser.add_argument('--openai-tpm', type=float, default=DEFAULT_OPENAI_TPM, help="OpenAI tokens per minute")
+    parser.add_argument('--notion-rps', type=float, default=NOTION_REQUESTS_PER_SECOND,
+                        help="Notion requests per second per token")
+    parser.add_argument('--archive', action='store_true', help="Archive old pages before publishing")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling(args.profile, 'run_tenants')
+
+    try:
+        tenants = TenantRegistry.load(args.tenants).select(args.only)
+        results = run_tenants(tenants, args.workers, threads=args.threads, archive=args.archive,
+                              openai_rpm=args.openai_rpm, openai_tpm=args.openai_tpm, notion_rps=args.notion_rps)
+
+        failed = [result for result in results if result.error]
+        for result in results:
+            print(f"{result.tenant_id}: {'FAILED ' + result.error if result.error else result.page_id}")
+        print(f"{len(results) - len(failed)}/{len(results)} tenants published")
+        if failed:
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"Error running tenants: {e}")
+        sys.exit(1)
+    finally:
+        finish_profiling()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Consolidated weekly shopping list computed locally from the recipe catalog.
+
+Dishes in the structured week plan are matched to catalog recipes, their
+ingredient amounts are scaled to the number of servings (household plus
+guests_expected), converted to base units and summed per ingredient in one
+vectorized pass. Pantry stock is subtracted when available.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from scripts.menu_structure import NO_COOKING_ITEMS
+from scripts.recipe_catalog import RecipeCatalog, normalize_ingredient
+
+# unit -> (base unit, factor to base unit); unlisted units are counted as-is
+UNIT_CONVERSIONS: Dict[str, Tuple[str, float]] = {
+    'g': ('g', 1.0),
+    'kg': ('g', 1000.0),
+    'mg': ('g', 0.001),
+    'ml': ('ml', 1.0),
+    'cc': ('ml', 1.0),
+    'l': ('ml', 1000.0),
+    '大さじ': ('ml', 15.0),
+    '小さじ': ('ml', 5.0),
+    'カップ': ('ml', 200.0),
+    '合': ('ml', 180.0),
+}
+
+# Amounts without a measurable quantity ("塩 少々")
+UNQUANTIFIED_UNITS = {'少々', '適量', 'お好みで'}
+
+
+def normalize_unit(unit: str) -> Tuple[str, float]:
+    """Base unit and conversion factor for a unit string"""
+    key = normalize_ingredient(unit or '')
+    if key in UNIT_CONVERSIONS:
+        return UNIT_CONVERSIONS[key]
+    if key in UNQUANTIFIED_UNITS:
+        return '', 0.0
+    return unit, 1.0
+
+
+def format_quantity(quantity: float, unit: str) -> str:
+    """Human-readable amount, e.g. "1.5kg", "2個" or "" for unquantified items"""
+    if not unit and not quantity:
+        return ''
+    if unit == 'g' and quantity >= 1000:
+        quantity, unit = quantity / 1000, 'kg'
+    elif unit == 'ml' and quantity >= 1000:
+        quantity, unit = quantity / 1000, 'L'
+    rounded = round(quantity, 1)
+    return f"{rounded:g}{unit}"
+
+
+def week_plan_dishes(week_plan: List[Dict]) -> List[str]:
+    """Every cooked dish in the week, one entry per occurrence"""
+    return [
+        dish['name']
+        for day in week_plan
+        for dishes in day['meals'].values()
+        for dish in dishes
+        if dish['name'] not in NO_COOKING_ITEMS
+    ]
+
+
+def build_shopping_list(week_plan: List[Dict], catalog: RecipeCatalog, servings: float,
+                        pantry: Optional[List[Dict]] = None) -> Dict:
+    """Aggregate ingredient amounts for every dish of the week"""
+    dishes = week_plan_dishes(week_plan)
+    recipe_ids = [catalog.find(name) for name in dishes]
+    unmatched = sorted({name for name, recipe in zip(dishes, recipe_ids) if recipe is None})
+    recipes = np.asarray([recipe for recipe in recipe_ids if recipe is not None], dtype=np.int64)
+
+    result = {'servings': servings, 'items': [], 'unmatched_dishes': unmatched}
+    if not recipes.size:
+        return result
+
+    # Catalog entries of every chosen recipe occurrence (CSR row gather)
+    counts = catalog.ingredient_counts[recipes]
+    starts = catalog.indptr[recipes]
+    first_entry = np.cumsum(counts) - counts
+    entries = np.repeat(starts, counts) + np.arange(counts.sum()) - np.repeat(first_entry, counts)
+
+    scale = np.repeat(servings / catalog.servings[recipes], counts)
+    units, unit_inverse = np.unique(catalog.units[entries], return_inverse=True)
+    conversions = [normalize_unit(unit) for unit in units]
+    base_units, base_inverse = np.unique(np.asarray([base for base, _ in conversions], dtype=object),
+                                         return_inverse=True)
+    factors = np.asarray([factor for _, factor in conversions])
+
+    amounts = catalog.quantities[entries] * scale * factors[unit_inverse]
+    entry_base = base_inverse[unit_inverse]
+    keys = catalog.indices[entries].astype(np.int64) * len(base_units) + entry_base
+    item_keys, item_inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(item_inverse, weights=amounts)
+    item_ingredients = item_keys // len(base_units)
+    item_units = base_units[item_keys % len(base_units)]
+
+    keep = np.ones(item_keys.size, dtype=bool)
+    if pantry:
+        keep = _subtract_pantry(catalog, pantry, item_keys, item_ingredients, base_units, totals)
+
+    order = np.argsort([catalog.ingredient_names[i] for i in item_ingredients], kind='stable')
+    result['items'] = [
+        {
+            'name': catalog.ingredient_names[item_ingredients[i]],
+            'quantity': round(float(totals[i]), 1),
+            'unit': item_units[i],
+            'display': format_quantity(float(totals[i]), item_units[i]),
+        }
+        for i in order if keep[i]
+    ]
+    return result
+
+
+def _subtract_pantry(catalog: RecipeCatalog, pantry: List[Dict], item_keys: np.ndarray,
+                     item_ingredients: np.ndarray, base_units: np.ndarray, totals: np.ndarray) -> np.ndarray:
+    """Subtract stock from totals in place; returns which items still need buying"""
+    unquantified = totals <= 0
+    stocked = np.zeros(catalog.ingredient_count, dtype=bool)
+    unit_ids = {unit: i for i, unit in enumerate(base_units)}
+
+    pantry_keys, pantry_amounts = [], []
+    for item in pantry:
+        ingredient = catalog.ingredient_index.get(normalize_ingredient(item['name']))
+        if ingredient is None:
+            continue
+        stocked[ingredient] = True
+        quantity = item.get('quantity')
+        base, factor = normalize_unit(item.get('unit') or '')
+        if quantity is None:
+            # Stock without an amount covers the whole need
+            pantry_keys.extend(ingredient * len(base_units) + u for u in range(len(base_units)))
+            pantry_amounts.extend([np.inf] * len(base_units))
+        elif base in unit_ids:
+            pantry_keys.append(ingredient * len(base_units) + unit_ids[base])
+            pantry_amounts.append(quantity * factor)
+
+    if pantry_keys:
+        pantry_keys = np.asarray(pantry_keys, dtype=np.int64)
+        positions = np.searchsorted(item_keys, pantry_keys)
+        positions = np.minimum(positions, item_keys.size - 1)
+        matched = item_keys[positions] == pantry_keys
+        np.subtract.at(totals, positions[matched], np.asarray(pantry_amounts)[matched])
+
+    return np.where(unquantified, ~stocked[item_ingredients], totals > 1e-9)
@@ -0,0 +1,71 @@
+"""
+Cache of menus generated ahead of time from default settings.
+
+A precompute run (scripts/precompute_menus.py) generates each household's
+menu for the week from rules.yaml default_settings while nothing else is
+running and stores it here with a fingerprint of the settings and meal
+types it was generated for. At job time MenuGenerator compares the
+fingerprint of the settings it would use: when they match (no intake, or an
+intake that changes nothing) the stored menu is used without calling
+OpenAI; otherwise the entry is discarded and the menu is generated as usual.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+DEFAULT_SPECULATIVE_PATH = 'data/speculative'
+
+
+def settings_fingerprint(settings: Dict, meal_types: List[str], model: str) -> str:
+    """Digest of everything that shapes the generated menu"""
+    content = json.dumps({'settings': settings, 'meal_types': meal_types, 'model': model},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class SpeculativeMenuCache:
+    def __init__(self, path: str = DEFAULT_SPECULATIVE_PATH):
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def entry_path(self, user_id: Optional[str], week_start: Union[str, date]) -> Path:
+        week = week_start.isoformat() if isinstance(week_start, date) else week_start
+        household = hashlib.blake2b((user_id or '').encode('utf-8'), digest_size=8).hexdigest()
+        return self.path / f"{week}_{household}.json"
+
+    def load(self, user_id: Optional[str], week_start: Union[str, date]) -> Optional[Dict]:
+        entry_path = self.entry_path(user_id, week_start)
+        if not entry_path.exists():
+            return None
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable precomputed menu {entry_path}: {e}")
+            return None
+
+    def store(self, user_id: Optional[str], week_start: Union[str, date], fingerprint: str, menu_content: str,
+              settings: Dict) -> Path:
+        entry_path = self.entry_path(user_id, week_start)
+        entry = {
+            'user_id': user_id or '',
+            'week_start': week_start.isoformat() if isinstance(week_start, date) else week_start,
+            'fingerprint': fingerprint,
+            'generated_at': datetime.now().isoformat(),
+            'settings': settings,
+            'menu_content': menu_content,
+        }
+        tmp_path = entry_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, entry_path)
+        return entry_path
+
+    def discard(self, user_id: Optional[str], week_start: Union[str, date]):
+        self.entry_path(user_id, week_start).unlink(missing_ok=True)
@@ -0,0 +1,139 @@
+"""
+Registry of households (tenants) served by one deployment.
+
+Each tenant has its own Notion database and integration token (referenced by
+the name of the environment variable holding it) and its own data
+directory for intake.json, generated_menu.json and the Notion mirror.
+A tenant may also have a rules_path, a partial rules.yaml merged over
+config/rules.yaml:
+
+    tenants:
+      - id: tanaka
+        user_id: U012ABC
+        notion_token_env: NOTION_TOKEN_TANAKA
+        notion_database_id: 0123456789abcdef0123456789abcdef
+
+The OpenAI key is shared by all tenants, and so are the menu history,
+reuse statistics and precomputed menus configured in config/rules.yaml.
+Their records are keyed by user_id, which every tenant must therefore have
+and no two tenants may share.
+"""
+
+import os
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import yaml
+from pydantic import BaseModel, Field
+
+DEFAULT_TENANTS_PATH = 'config/tenants.yaml'
+DEFAULT_TENANTS_DIR = 'data/tenants'
+
+
+class Tenant(BaseModel):
+    """One household with its own Notion database"""
+
+    id: str = Field(..., pattern=r'^[A-Za-z0-9_-]+$', description="Stable tenant identifier, used in paths")
+    user_id: str = Field(..., min_length=1, description="Slack user ID keying the tenant's history and cached menus")
+    notion_token_env: str = Field(default='NOTION_TOKEN', description="Environment variable holding the Notion token")
+    notion_database_id: str = Field(..., description="Notion database receiving the tenant's menus")
+    data_dir: Optional[str] = Field(None, description="Directory for intake and generated files")
+    rules_path: Optional[str] = Field(None, description="Override file merged over config/rules.yaml")
+    weight: float = Field(default=1.0, gt=0, description="Relative cost, used to balance shards")
+
+    @property
+    def path(self) -> Path:
+        return Path(self.data_dir or Path(DEFAULT_TENANTS_DIR) / self.id)
+
+    @property
+    def intake_path(self) -> Path:
+        return self.path / 'intake.json'
+
+    @property
+    def menu_path(self) -> Path:
+        return self.path / 'generated_menu.json'
+
+    @property
+    def mirror_path(self) -> Path:
+        return self.path / 'notion_mirror.sqlite3'
+
+    def notion_token(self) -> str:
+        token = os.getenv(self.notion_token_env)
+        if not token:
+            raise ValueError(f"{self.notion_token_env} environment variable is required for tenant {self.id}")
+        return token
+
+    @property
+    def notion_token_key(self) -> str:
+        """Identity of the tenant's Notion integration, the same for variables holding the same token"""
+        token = os.getenv(self.notion_token_env)
+        if not token:  # The tenant fails when it connects
+            return self.notion_token_env
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TenantRegistry:
+    def __init__(self, tenants: List[Tenant]):
+        ids = [tenant.id for tenant in tenants]
+        duplicates = sorted({tenant_id for tenant_id in ids if ids.count(tenant_id) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate tenant ids: {', '.join(duplicates)}")
+        user_ids = [tenant.user_id for tenant in tenants]
+        shared = sorted({user_id for user_id in user_ids if user_ids.count(user_id) > 1})
+        if shared:
+            raise ValueError(f"Tenants share user ids: {', '.join(shared)}")
+        self.tenants = {tenant.id: tenant for tenant in tenants}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TENANTS_PATH) -> 'TenantRegistry':
+        registry_path = Path(path)
+        if not registry_path.exists():
+            raise FileNotFoundError(f"Tenant registry not found: {registry_path}")
+        with open(registry_path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+        return cls([Tenant(**entry) for entry in data.get('tenants', [])])
+
+    def __len__(self) -> int:
+        return len(self.tenants)
+
+    def __iter__(self) -> Iterator[Tenant]:
+        return iter(self.tenants.values())
+
+    def __getitem__(self, tenant_id: str) -> Tenant:
+        return self.tenants[tenant_id]
+
+    def select(self, tenant_ids: Optional[List[str]] = None) -> List[Tenant]:
+        """Tenants by id (all tenants when no ids are given)"""
+        if not tenant_ids:
+            return list(self)
+        unknown = [tenant_id for tenant_id in tenant_ids if tenant_id not in self.tenants]
+        if unknown:
+            raise KeyError(f"Unknown tenants: {', '.join(unknown)}")
+        return [self.tenants[tenant_id] for tenant_id in tenant_ids]
+
+
+def shard_tenants(tenants: List[Tenant], shards: int) -> List[List[Tenant]]:
+    """Split tenants into at most ``shards`` balanced groups.
+
+    Tenants sharing a Notion token always land in the same shard, so the
+    token's rate limiter lives in exactly one process. Tenants are grouped by
+    the token itself, not the variable naming it, since several variables
+    may hold the same integration token. Token groups are
+    assigned heaviest first to the lightest shard.
+    """
+    groups: Dict[str, List[Tenant]] = {}
+    for tenant in tenants:
+        groups.setdefault(tenant.notion_token_key, []).append(tenant)
+
+    # Sort by weight, then by a stable hash so equal groups spread deterministically
+    ordered = sorted(groups.items(), key=lambda item: (-sum(t.weight for t in item[1]),
+                                                       hashlib.sha1(item[0].encode('utf-8')).hexdigest()))
+    count = max(1, min(shards, len(ordered)))
+    result: List[List[Tenant]] = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for _, group in ordered:
+        lightest = loads.index(min(loads))
+        result[lightest].extend(group)
+        loads[lightest] += sum(tenant.weight for tenant in group)
+    return [shard for shard in result if shard]
@@ -0,0 +1,46 @@
+"""
+Validate a JSONL file of intake records against the intake schema.
+
+Usage:
+    python -m scripts.validate_intakes intakes.jsonl [--errors errors.jsonl]
+
+Prints a summary and writes one JSON error record per invalid line.
+"""
+
+import sys
+import json
+import argparse
+
+from schemas.intake_validation import iter_intakes_jsonl
+
+
+def main():
+    """Main function to validate a batch of intakes"""
+    parser = argparse.ArgumentParser(description="Validate a JSONL file of intake records")
+    parser.add_argument('path', help="JSONL file with one intake per line")
+    parser.add_argument('--errors', help="Write per-line errors to this JSONL file (default: stderr)")
+    args = parser.parse_args()
+
+    valid = invalid = 0
+    error_output = open(args.errors, 'w', encoding='utf-8') if args.errors else sys.stderr
+    try:
+        for result in iter_intakes_jsonl(args.path):
+            if result.ok:
+                valid += 1
+                continue
+            invalid += 1
+            error_output.write(json.dumps({'line': result.line, 'errors': result.errors}, ensure_ascii=False) + '\n')
+    except OSError as e:
+        print(f"Error reading intakes: {e}")
+        sys.exit(1)
+    finally:
+        if args.errors:
+            error_output.close()
+
+    print(f"Validated {valid + invalid} intakes: {valid} valid, {invalid} invalid")
+    if invalid:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
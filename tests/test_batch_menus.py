@@ -0,0 +1,202 @@
+"""
+Tests for offline batch generation, against a local stand-in for the Batch API
+"""
+
+import json
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from scripts.batch_menus import BatchMenuRunner
+from scripts.deadline import RunDeadline
+from scripts.tenants import Tenant
+
+RULES = """
+default_settings:
+  days_needed: 7
+  away_days: []
+  avoid_ingredients: []
+  max_cooking_time: 45
+  priority_recipe_sites: [cookpad.com]
+meal_types:
+  - {name: 昼食, enabled: true}
+  - {name: 夕食, enabled: true}
+"""
+
+
+def menu_text(meal_type):
+    return f"### 週の{meal_type}献立\n\n**月曜日 (01/15)**\n- {meal_type}の料理 (調理時間: 20分)\n"
+
+
+class LocalBatchAPI:
+    """In-memory Batch API: batches finish after a number of status checks"""
+
+    def __init__(self, checks_until_done=2, fail=()):
+        self.uploads = {}
+        self.jobs = {}
+        self.checks_until_done = checks_until_done
+        self.fail = set(fail)
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _create_file(self, file, purpose):
+        file_id = f"file-{len(self.uploads)}"
+        self.uploads[file_id] = file.read().decode('utf-8')
+        return SimpleNamespace(id=file_id)
+
+    def _file_content(self, file_id):
+        return SimpleNamespace(text=self.uploads[file_id])
+
+    def _create_batch(self, input_file_id, endpoint, completion_window):
+        batch_id = f"batch-{len(self.jobs)}"
+        self.jobs[batch_id] = {'input': input_file_id, 'checks': 0}
+        return self._batch(batch_id, 'validating')
+
+    def _batch(self, batch_id, status, output_file_id=None, error_file_id=None):
+        requests = self.uploads[self.jobs[batch_id]['input']].splitlines()
+        counts = SimpleNamespace(total=len(requests), completed=len(requests) if status == 'completed' else 0)
+        return SimpleNamespace(id=batch_id, status=status, output_file_id=output_file_id,
+                               error_file_id=error_file_id, request_counts=counts)
+
+    def _retrieve_batch(self, batch_id):
+        job = self.jobs[batch_id]
+        job['checks'] += 1
+        if job['checks'] < self.checks_until_done:
+            return self._batch(batch_id, 'in_progress')
+
+        output, errors = [], []
+        for line in self.uploads[job['input']].splitlines():
+            request = json.loads(line)
+            if request['custom_id'] in self.fail:
+                errors.append({'custom_id': request['custom_id'], 'response': None,
+                               'error': {'code': 'server_error', 'message': 'boom'}})
+                continue
+            meal_type = request['body']['messages'][1]['content'].split('週の')[1].split('献立')[0]
+            body = {'choices': [{'message': {'role': 'assistant', 'content': menu_text(meal_type)}}]}
+            output.append({'custom_id': request['custom_id'], 'response': {'status_code': 200, 'body': body},
+                           'error': None})
+
+        output_id, error_id = f"file-{len(self.uploads)}", f"file-{len(self.uploads) + 1}"
+        self.uploads[output_id] = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in output)
+        self.uploads[error_id] = ''.join(json.dumps(item) + '\n' for item in errors)
+        return self._batch(batch_id, 'completed', output_id, error_id if errors else None)
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config').mkdir()
+    (tmp_path / 'config' / 'rules.yaml').write_text(RULES, encoding='utf-8')
+    tenants = [Tenant(id=tenant_id, notion_database_id=f"db-{tenant_id}", user_id=f"U-{tenant_id}")
+               for tenant_id in ('tanaka', 'suzuki')]
+    for tenant in tenants:
+        tenant.path.mkdir(parents=True)
+        tenant.intake_path.write_text(json.dumps({'week_start': '2024-01-15', 'max_cooking_time': 30}),
+                                      encoding='utf-8')
+    return tmp_path, tenants
+
+
+def make_runner(tenants, api, deadline=None, week_start=date(2024, 1, 15)):
+    return BatchMenuRunner(tenants, deadline=deadline or RunDeadline(), openai_client=api,
+                           notion_factory=lambda tenant: f"notion-{tenant.id}", poll_interval=5,
+                           sleep=lambda seconds: None, week_start=week_start)
+
+
+@patch('scripts.batch_menus.NotionMenuUpdater')
+def test_batch_run_fans_results_out_to_tenants(mock_updater_class, workspace):
+    tmp_path, tenants = workspace
+    mock_updater_class.return_value.update_menu.side_effect = ['page-tanaka', 'page-suzuki']
+    api = LocalBatchAPI()
+
+    state = make_runner(tenants, api).run()
+
+    requests = [json.loads(line) for line in (tmp_path / 'data/batch/requests.jsonl').read_text().splitlines()]
+    assert [request['custom_id'] for request in requests] == [
+        'tanaka/昼食', 'tanaka/夕食', 'suzuki/昼食', 'suzuki/夕食']
+    assert requests[0]['url'] == '/v1/chat/completions'
+    assert '最大調理時間: 30分' in requests[0]['body']['messages'][1]['content']
+
+    assert state['stage'] == 'done'
+    assert state['published'] == {'tanaka': 'page-tanaka', 'suzuki': 'page-suzuki'}
+    menu = json.loads((tmp_path / 'data/tenants/suzuki/generated_menu.json').read_text(encoding='utf-8'))
+    dishes = [dish['name'] for meal in menu['week_plan'][0]['meals'].values() for dish in meal]
+    assert dishes == ['昼食の料理', '夕食の料理']
+    assert mock_updater_class.call_args.kwargs['database_id'] == 'db-suzuki'
+    # Both tenants use the default token, so they share one Notion client
+    assert mock_updater_class.call_args.kwargs['notion_client'] == 'notion-tanaka'
+
+
+@patch('scripts.batch_menus.NotionMenuUpdater')
+def test_batch_run_resumes_without_resubmitting(mock_updater_class, workspace):
+    """A run out of time while the batch is pending resumes polling the same batch"""
+    _, tenants = workspace
+    mock_updater_class.return_value.update_menu.return_value = 'page'
+    api = LocalBatchAPI(checks_until_done=3)
+
+    state = make_runner(tenants, api, deadline=RunDeadline.after(1)).run()
+    assert state['stage'] == 'submitted'
+    assert state['batch_status'] == 'in_progress'
+
+    state = make_runner(tenants, api).run()
+    assert state['stage'] == 'done'
+    assert len(api.jobs) == 1
+    assert mock_updater_class.return_value.update_menu.call_count == 2
+
+
+@patch('scripts.batch_menus.NotionMenuUpdater')
+def test_failed_requests_are_retried_on_publish_only(mock_updater_class, workspace):
+    """Tenants with failed batch requests are reported; published tenants are not published again"""
+    _, tenants = workspace
+    mock_updater_class.return_value.update_menu.return_value = 'page'
+    api = LocalBatchAPI(fail=['suzuki/夕食'])
+
+    state = make_runner(tenants, api).run()
+    assert list(state['published']) == ['tanaka']
+    assert 'boom' in state['failed']['suzuki']
+
+    make_runner(tenants, api).run()
+    assert mock_updater_class.return_value.update_menu.call_count == 1
+
+
+@patch('scripts.batch_menus.NotionMenuUpdater')
+def test_publish_uses_week_and_settings_of_prepared_requests(mock_updater_class, workspace):
+    """A new intake submitted while the batch runs does not change the menu the results are saved as"""
+    tmp_path, tenants = workspace
+    mock_updater_class.return_value.update_menu.return_value = 'page'
+    api = LocalBatchAPI(checks_until_done=3)
+
+    state = make_runner(tenants, api, deadline=RunDeadline.after(1)).run()
+    assert state['prepared']['tanaka']['week_start'] == '2024-01-15'
+    assert state['prepared']['tanaka']['settings']['max_cooking_time'] == 30
+    for tenant in tenants:
+        tenant.intake_path.write_text(json.dumps({'week_start': '2024-01-22', 'max_cooking_time': 60}),
+                                      encoding='utf-8')
+
+    make_runner(tenants, api).run()
+    menu = json.loads((tmp_path / 'data/tenants/tanaka/generated_menu.json').read_text(encoding='utf-8'))
+    assert menu['week_start'] == '2024-01-15'
+    assert menu['week_plan'][0]['date'] == '2024-01-15'
+    assert menu['settings_used']['max_cooking_time'] == 30
+    assert menu['intake_data_available'] is True
+
+
+
+@patch('scripts.batch_menus.NotionMenuUpdater')
+def test_next_week_starts_a_new_batch(mock_updater_class, workspace):
+    """The finished batch of one week is not resumed by the next week's run"""
+    tmp_path, tenants = workspace
+    mock_updater_class.return_value.update_menu.return_value = 'page'
+    api = LocalBatchAPI()
+
+    assert make_runner(tenants, api).run()['stage'] == 'done'
+    for tenant in tenants:
+        tenant.intake_path.write_text(json.dumps({'week_start': '2024-01-22', 'max_cooking_time': 30}),
+                                      encoding='utf-8')
+    state = make_runner(tenants, api, week_start=date(2024, 1, 22)).run()
+
+    assert (state['week_start'], state['stage']) == ('2024-01-22', 'done')
+    assert len(api.jobs) == 2
+    assert mock_updater_class.return_value.update_menu.call_count == 4
+    menu = json.loads((tmp_path / 'data/tenants/tanaka/generated_menu.json').read_text(encoding='utf-8'))
+    assert menu['week_start'] == '2024-01-22'
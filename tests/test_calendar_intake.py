@@ -0,0 +1,171 @@
+"""
+Tests for deriving away days and guests from .ics calendars
+"""
+
+import json
+from datetime import date
+from unittest.mock import Mock
+
+import pytest
+
+from schemas.intake_schema import IntakeData
+from scripts.calendar_intake import CalendarEnricher, CalendarIndex
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+
+WEEK = date(2024, 1, 15)
+
+CALENDAR = """BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//Test//EN
+BEGIN:VEVENT
+UID:old-trip
+DTSTART;VALUE=DATE:20190304
+DTEND;VALUE=DATE:20190306
+SUMMARY:旅行
+END:VEVENT
+BEGIN:VEVENT
+UID:trip
+DTSTART;VALUE=DATE:20240116
+DTEND;VALUE=DATE:20240118
+SUMMARY:大阪へ出
+ 張
+BEGIN:VALARM
+TRIGGER:-PT15M
+DESCRIPTION:来客
+END:VALARM
+END:VEVENT
+BEGIN:VEVENT
+UID:drinks
+DTSTART:20240119T100000Z
+DTEND:20240119T130000Z
+SUMMARY:チームの飲み会
+END:VEVENT
+BEGIN:VEVENT
+UID:lunch
+DTSTART;TZID=Asia/Tokyo:20240115T120000
+DTEND;TZID=Asia/Tokyo:20240115T130000
+SUMMARY:外食ランチ
+END:VEVENT
+BEGIN:VEVENT
+UID:party
+DTSTART;TZID=Asia/Tokyo:20200104T183000
+DTEND;TZID=Asia/Tokyo:20200104T203000
+RRULE:FREQ=WEEKLY;BYDAY=SA
+EXDATE;TZID=Asia/Tokyo:20240113T183000
+SUMMARY:ホームパーティ 2人
+END:VEVENT
+BEGIN:VEVENT
+UID:party
+RECURRENCE-ID;TZID=Asia/Tokyo:20240120T183000
+DTSTART;TZID=Asia/Tokyo:20240121T183000
+DTEND;TZID=Asia/Tokyo:20240121T203000
+SUMMARY:来客３名
+END:VEVENT
+BEGIN:VEVENT
+UID:yoga
+DTSTART;TZID=Asia/Tokyo:20210101T190000
+DTEND;TZID=Asia/Tokyo:20210101T200000
+RRULE:FREQ=DAILY;UNTIL=20211231T100000Z
+SUMMARY:外食
+END:VEVENT
+BEGIN:VEVENT
+UID:cancelled
+DTSTART;TZID=Asia/Tokyo:20240115T190000
+DTEND;TZID=Asia/Tokyo:20240115T210000
+STATUS:CANCELLED
+SUMMARY:外泊
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+@pytest.fixture
+def calendar_path(tmp_path):
+    path = tmp_path / 'calendar.ics'
+    path.write_text(CALENDAR.replace('\n', '\r\n'), encoding='utf-8')
+    return path
+
+
+def test_index_selects_only_events_near_the_week(calendar_path):
+    index = CalendarIndex(calendar_path)
+
+    assert len(index) == 8
+    summaries = [event.get('SUMMARY', [({}, '')])[0][1]
+                 for event in index.read_events(date(2024, 1, 14), date(2024, 1, 22))]
+    # The 2019 trip and the recurrence that ended in 2021 are never parsed
+    assert '旅行' not in summaries
+    assert sorted(summaries) == sorted(['大阪へ出張', 'チームの飲み会', '外食ランチ', 'ホームパーティ 2人',
+                                        '来客３名', '外泊'])
+
+
+def test_availability(calendar_path):
+    availability = CalendarEnricher([calendar_path]).availability(WEEK)
+
+    # Trip covers the dinners of Tue and Wed (DTEND is exclusive), drinks at 19:00 JST on Fri;
+    # lunch out and the cancelled event do not count
+    assert availability.away_days == [1, 2, 4]
+    # The weekly party moved from Saturday to Sunday with more guests
+    assert availability.guests_expected == 3
+
+
+def test_recurrence_and_exdate(calendar_path):
+    enricher = CalendarEnricher([calendar_path])
+
+    assert enricher.availability(date(2024, 1, 22)).guests_expected == 2
+    assert enricher.availability(date(2024, 1, 8)).guests_expected == 0  # EXDATE
+    assert enricher.availability(date(2021, 6, 7)).away_days == list(range(7))
+
+
+def test_enrich_adds_to_manual_entries(calendar_path):
+    intake = IntakeData(week_start=WEEK, away_days=[0], guests_expected=1)
+
+    enriched = CalendarEnricher([calendar_path]).enrich(intake)
+
+    assert enriched.away_days == [0, 1, 2, 4]
+    assert enriched.guests_expected == 3
+    assert CalendarEnricher([calendar_path]).enrich(intake.model_copy(update={'week_start': date(2030, 1, 7)})) \
+        .away_days == [0]
+
+
+def test_generator_applies_calendar_without_intake(calendar_path, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config').mkdir()
+    (tmp_path / 'config' / 'rules.yaml').write_text(
+        "default_settings: {days_needed: 7, away_days: [6], avoid_ingredients: [], max_cooking_time: 60,"
+        " priority_recipe_sites: [cookpad.com]}\n"
+        f"calendar: {{enabled: true, path: {json.dumps(str(calendar_path))}}}\n", encoding='utf-8')
+
+    generator = MenuGenerator(deadline=RunDeadline(), openai_client=Mock(), week_start=WEEK)
+    settings = generator.get_menu_settings()
+
+    assert settings['away_days'] == [1, 2, 4, 6]
+    assert settings['guests_expected'] == 3
+
+
+def test_instance_moved_to_an_earlier_week(tmp_path):
+    """An override moved before its week still hides the instance it replaces"""
+    path = tmp_path / 'moved.ics'
+    path.write_text("\r\n".join([
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT",
+        "UID:dinner",
+        "DTSTART;TZID=Asia/Tokyo:20240101T190000",
+        "DTEND;TZID=Asia/Tokyo:20240101T210000",
+        "RRULE:FREQ=WEEKLY;BYDAY=MO",
+        "SUMMARY:外食",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:dinner",
+        "RECURRENCE-ID;TZID=Asia/Tokyo:20240129T190000",
+        "DTSTART;TZID=Asia/Tokyo:20240119T190000",
+        "DTEND;TZID=Asia/Tokyo:20240119T210000",
+        "SUMMARY:外食",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]) + "\r\n", encoding='utf-8')
+    enricher = CalendarEnricher([path])
+
+    assert enricher.availability(date(2024, 1, 15)).away_days == [0, 4]
+    assert enricher.availability(date(2024, 1, 29)).away_days == []
+    assert enricher.availability(date(2024, 2, 5)).away_days == [0]
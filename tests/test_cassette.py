@@ -0,0 +1,151 @@
+"""
+Tests for recording and replaying API interactions
+"""
+
+import os
+import json
+import pytest
+import httpx
+import requests
+from datetime import date
+from unittest.mock import Mock, patch
+
+from notion_client import APIErrorCode, APIResponseError
+from openai.types.chat import ChatCompletion
+
+from schemas.intake_schema import IntakeData
+from scripts.cassette import Cassette, CassetteMiss, ReplayedError, request_key
+from scripts.fetch_intake import fetch_from_gist
+from scripts.generate_menu import MenuGenerator
+from scripts.notion_update import NotionMenuUpdater
+
+
+@pytest.fixture
+def cassette_env(tmp_path):
+    """Switch the process-wide cassette between modes"""
+    path = str(tmp_path / 'cassette.jsonl')
+
+    def use(mode, **extra):
+        Cassette._instances.clear()
+        return patch.dict(os.environ, {'CASSETTE_MODE': mode, 'CASSETTE_PATH': path, **extra})
+
+    yield use
+    Cassette._instances.clear()
+
+
+def completion(content):
+    return ChatCompletion.model_validate({
+        'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4',
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}],
+    })
+
+
+def test_gist_fetch_replays_without_network(cassette_env):
+    response = Mock()
+    response.json.return_value = {'files': {'intake_2024_01_15.json': {'content': '{"days_needed": 3}'}}}
+
+    with cassette_env('record'), patch('scripts.fetch_intake.requests.get', return_value=response):
+        recorded = fetch_from_gist('gist-1', 'token')
+
+    with cassette_env('replay'), patch('scripts.fetch_intake.requests.get', side_effect=AssertionError("network")):
+        replayed = fetch_from_gist('gist-1', None)
+
+    assert recorded == replayed == {'days_needed': 3}
+
+
+def test_openai_completion_replays_as_response_object(cassette_env):
+    client = Mock()
+    client.chat.completions.create.return_value = completion("**月曜日 (01/15)**\n- 肉じゃが (調理時間: 30分)")
+    intake = IntakeData(week_start=date(2024, 1, 15))
+
+    with cassette_env('record'):
+        recorded = MenuGenerator(openai_client=client, intake_data=intake).request_menu("prompt")
+
+    with cassette_env('replay'), patch.dict(os.environ, {'OPENAI_API_KEY': ''}):
+        generator = MenuGenerator(intake_data=intake)
+        replayed = generator.request_menu("prompt")
+        with pytest.raises(CassetteMiss):
+            generator.openai_client.chat.completions.create(model='gpt-4', messages=[])
+
+    assert replayed == recorded
+
+
+def test_notion_writes_replay_with_errors_and_latency(cassette_env):
+    notion = Mock()
+    notion.pages.create.side_effect = [RuntimeError("rate limited"), {'id': 'page-123'}]
+    menu_data = {'week_start': '2024-01-15', 'generated_at': '2024-01-14T18:00:00',
+                 'menu_content': "- 肉じゃが", 'intake_data_available': False}
+
+    with cassette_env('record'), patch.dict(os.environ, {'NOTION_DATABASE_ID': 'db'}):
+        updater = NotionMenuUpdater(notion_client=notion)
+        with pytest.raises(RuntimeError):
+            updater.notion.pages.create(parent={'database_id': 'db'})
+        assert updater.create_notion_page(menu_data) == 'page-123'
+
+    sleeps = []
+    with cassette_env('replay', CASSETTE_LATENCY='1', CASSETTE_MATCH='loose'), patch.dict(os.environ, {'NOTION_DATABASE_ID': 'db'}), \
+            patch('scripts.cassette.time.sleep', side_effect=sleeps.append):
+        updater = NotionMenuUpdater()
+        with pytest.raises(RuntimeError, match="rate limited"):
+            updater.notion.pages.create(parent={'database_id': 'db'})
+        assert updater.create_notion_page(dict(menu_data, generated_at='2024-01-21T18:00:00')) == 'page-123'
+
+    assert len(sleeps) == 2
+
+
+def test_replay_fails_on_mismatched_request_unless_loose(cassette_env):
+    notion = Mock()
+    notion.pages.create.return_value = {'id': 'page-123'}
+
+    with cassette_env('record'):
+        Cassette.from_env().wrap('notion', notion).pages.create(parent={'database_id': 'db'}, timeout=5)
+
+    with cassette_env('replay'):
+        replayed = Cassette.from_env().wrap('notion', None)
+        with pytest.raises(CassetteMiss, match='matches'):
+            replayed.pages.create(parent={'database_id': 'other'})
+        assert replayed.pages.create(parent={'database_id': 'db'}) == {'id': 'page-123'}
+
+    with cassette_env('replay', CASSETTE_MATCH='loose'):
+        assert Cassette.from_env().wrap('notion', None).pages.create(parent={'database_id': 'other'}) == \
+            {'id': 'page-123'}
+
+
+def test_errors_replay_with_type_and_code(cassette_env):
+    """Callers branching on the error type or its code behave as in the recorded run"""
+    not_found = APIResponseError(APIErrorCode.ObjectNotFound, 404, "Could not find page", httpx.Headers(), '')
+    notion = Mock()
+    notion.pages.retrieve.side_effect = not_found
+    gist = Mock(side_effect=requests.ConnectionError("connection reset"))
+
+    with cassette_env('record'):
+        cassette = Cassette.from_env()
+        with pytest.raises(APIResponseError):
+            cassette.wrap('notion', notion).pages.retrieve(page_id='page-1')
+        with pytest.raises(requests.ConnectionError):
+            cassette.wrap('gist', gist)('https://api.github.com/gists/1')
+
+    with cassette_env('replay'):
+        cassette = Cassette.from_env()
+        with pytest.raises(APIResponseError) as error:
+            cassette.wrap('notion', None).pages.retrieve(page_id='page-1')
+        with pytest.raises(requests.RequestException, match="connection reset"):
+            cassette.wrap('gist', None)('https://api.github.com/gists/1')
+
+    assert (error.value.code, error.value.status, str(error.value)) == ('object_not_found', 404, "Could not find page")
+    assert error.value.code == APIErrorCode.ObjectNotFound
+
+
+def test_unknown_error_type_replays_as_replayed_error(tmp_path):
+    path = tmp_path / 'cassette.jsonl'
+    request = {'args': [], 'kwargs': {}}
+    path.write_text(json.dumps({
+        'service': 'notion', 'method': 'pages.create', 'request': request,
+        'key': request_key('notion', 'pages.create', request),
+        'error': {'module': 'not_loaded.errors', 'type': 'TeapotError', 'message': 'short and stout', 'code': 418},
+    }) + '\n', encoding='utf-8')
+
+    with pytest.raises(ReplayedError, match='TeapotError: short and stout') as error:
+        Cassette(str(path), 'replay').wrap('notion', None).pages.create()
+    assert error.value.code == 418
@@ -0,0 +1,99 @@
+"""
+Tests for the shared run deadline
+"""
+
+import os
+import time
+import pytest
+from unittest.mock import Mock, patch
+
+from scripts.deadline import RunDeadline, DeadlineExceeded
+
+
+def test_unbounded_deadline_keeps_defaults():
+    """Without a deadline the stage defaults apply unchanged"""
+    with patch.dict(os.environ, {}, clear=True):
+        deadline = RunDeadline.from_env()
+
+    assert not deadline.bounded
+    assert deadline.timeout(30) == 30
+    assert deadline.has_budget(10_000)
+
+
+def test_deadline_from_env_iso_timestamp():
+    """RUN_DEADLINE is parsed as an absolute UTC timestamp"""
+    with patch.dict(os.environ, {'RUN_DEADLINE': '2000-01-01T00:00:00Z'}):
+        deadline = RunDeadline.from_env()
+
+    assert deadline.bounded
+    assert deadline.expired()
+
+
+def test_timeout_capped_by_remaining_time():
+    """Timeouts shrink as the run deadline approaches"""
+    deadline = RunDeadline.after(10)
+
+    assert deadline.timeout(30) <= 10
+    assert deadline.timeout(5) == 5
+
+
+def test_retry_stops_when_budget_is_exhausted():
+    """No backoff sleep is started when it would run past the deadline"""
+    deadline = RunDeadline.after(3)
+    func = Mock(side_effect=RuntimeError("boom"))
+
+    with patch('scripts.deadline.time.sleep') as mock_sleep:
+        with pytest.raises(RuntimeError):
+            deadline.retry_with_backoff(func, max_retries=3, base_delay=5)
+
+    assert func.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+def test_retry_refuses_to_start_after_deadline():
+    """An expired deadline fails fast without calling the stage"""
+    deadline = RunDeadline(time.time() - 1)
+    func = Mock()
+
+    with pytest.raises(DeadlineExceeded):
+        deadline.retry_with_backoff(func)
+
+    func.assert_not_called()
+
+
+def test_retry_succeeds_within_budget():
+    """Transient failures are retried while budget remains"""
+    deadline = RunDeadline.after(60)
+    func = Mock(side_effect=[RuntimeError("boom"), "ok"])
+
+    with patch('scripts.deadline.time.sleep'):
+        assert deadline.retry_with_backoff(func, max_retries=3, base_delay=1) == "ok"
+
+    assert func.call_count == 2
+
+
+@patch('scripts.archive_menu.Client')
+def test_archiver_skips_when_budget_exhausted(mock_client_class):
+    """Archiving is skipped entirely when too little time is left"""
+    from scripts.archive_menu import NotionArchiver
+
+    with patch.dict(os.environ, {'NOTION_TOKEN': 'token', 'NOTION_DATABASE_ID': 'db'}):
+        archiver = NotionArchiver(deadline=RunDeadline.after(10))
+        archiver.archive_old_menus()
+
+    mock_client_class.return_value.databases.query.assert_not_called()
+
+
+def test_archiver_counts_only_successful_updates(capsys):
+    """Pages whose status update fails are reported as not archived"""
+    from scripts.archive_menu import NotionArchiver
+
+    notion = Mock()
+    notion.pages.update.side_effect = [{'id': 'page-1'}, RuntimeError("Notion down")]
+    archiver = NotionArchiver(deadline=RunDeadline(), notion_client=notion, database_id='db')
+    with patch.object(archiver, 'get_pages_to_archive', return_value=[('page-1', '2024-01-01'),
+                                                                      ('page-2', '2024-01-08')]):
+        archiver.archive_old_menus()
+
+    assert notion.pages.update.call_count == 2
+    assert "Successfully archived 1 old menu pages" in capsys.readouterr().out
@@ -0,0 +1,86 @@
+"""
+Tests for the streaming Notion database export
+"""
+
+import os
+import json
+import pytest
+from unittest.mock import Mock, patch
+
+from scripts.export_notion import NotionExporter
+from scripts.rate_limit import RateLimiter
+
+
+def make_notion(page_count, fail_on_query=None):
+    """Fake client with page_count pages, two per query page, each with one nested block"""
+    pages = [{'id': f"page-{i}", 'properties': {}} for i in range(page_count)]
+    queries = []
+
+    def query(**kwargs):
+        queries.append(kwargs)
+        if fail_on_query is not None and len(queries) == fail_on_query:
+            raise KeyboardInterrupt  # Simulated crash, not retried
+        start = int(kwargs.get('start_cursor') or 0)
+        has_more = start + 2 < page_count
+        return {'results': pages[start:start + 2], 'has_more': has_more, 'next_cursor': str(start + 2) if has_more else None}
+
+    def children(block_id, **kwargs):
+        if '/' not in block_id:
+            return {'results': [{'id': f"{block_id}/toggle", 'type': 'toggle', 'has_children': True}], 'has_more': False}
+        return {'results': [{'id': f"{block_id}/text", 'type': 'paragraph', 'has_children': False}], 'has_more': False}
+
+    notion = Mock()
+    notion.databases.query.side_effect = query
+    notion.blocks.children.list.side_effect = children
+    return notion, queries
+
+
+@pytest.fixture(autouse=True)
+def database_id():
+    with patch.dict(os.environ, {'NOTION_DATABASE_ID': 'db'}):
+        yield
+
+
+def read_ids(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line)['id'] for line in f]
+
+
+def test_export_streams_pages_with_nested_blocks(tmp_path):
+    notion, queries = make_notion(5)
+    output = tmp_path / 'menus.jsonl'
+
+    written = NotionExporter(notion_client=notion, rate=1000).export(output, tmp_path / 'state.json')
+
+    assert written == 5
+    assert len(queries) == 3
+    assert read_ids(output) == [f"page-{i}" for i in range(5)]
+    record = json.loads(output.read_text(encoding='utf-8').splitlines()[0])
+    assert record['blocks'][0]['children'][0]['id'] == 'page-0/toggle/text'
+    assert json.loads((tmp_path / 'state.json').read_text())['done']
+
+
+def test_export_resumes_from_saved_cursor(tmp_path):
+    output, state = tmp_path / 'menus.jsonl', tmp_path / 'state.json'
+    notion, _ = make_notion(6, fail_on_query=2)
+    with pytest.raises(KeyboardInterrupt):
+        NotionExporter(notion_client=notion, rate=1000).export(output, state)
+    # A partial line from an interrupted batch is discarded on resume
+    with open(output, 'ab') as f:
+        f.write(b'{"id": "partial')
+
+    notion, queries = make_notion(6)
+    written = NotionExporter(notion_client=notion, rate=1000).export(output, state)
+
+    assert written == 4
+    assert queries[0]['start_cursor'] == '2'
+    assert read_ids(output) == [f"page-{i}" for i in range(6)]
+
+
+def test_rate_limiter_spaces_requests():
+    now = [0.0]
+    limiter = RateLimiter(rate=2, burst=1, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+
+    waits = [limiter.acquire() for _ in range(3)]
+
+    assert waits == [0.0, 0.5, 0.5]
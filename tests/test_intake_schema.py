@@ -5,6 +5,7 @@ Basic tests for intake schema validation
 import json
 from datetime import datetime, date
 from schemas.intake_schema import IntakeData, EXAMPLE_INTAKE
+from schemas.intake_validation import iter_intake_lines, validate_intake_json
 
 
 def test_intake_data_creation():
@@ -96,6 +97,32 @@ def test_json_serialization():
     assert parsed['avoid_ingredients'] == ["エビ"]
 
 
+
+def test_validate_intake_json():
+    """Test validation straight from JSON text"""
+    data = validate_intake_json(json.dumps(EXAMPLE_INTAKE, ensure_ascii=False))
+    
+    assert data.week_start == date(2024, 1, 15)
+    assert data.avoid_ingredients == ["エビ", "カニ"]
+
+
+def test_jsonl_streaming_validation():
+    """Test per-line results for a JSONL batch"""
+    lines = [
+        json.dumps({"week_start": "2024-01-15"}).encode(),
+        b"",
+        json.dumps({"week_start": "2024-01-15", "days_needed": 9}).encode(),
+        b"{not json",
+    ]
+    
+    results = list(iter_intake_lines(lines))
+    
+    assert [r.line for r in results] == [1, 3, 4]
+    assert results[0].ok and results[0].intake.days_needed == 7
+    assert results[1].errors[0]['loc'] == ['days_needed']
+    assert results[2].errors[0]['type'] == 'json_invalid'
+
+
 if __name__ == "__main__":
     # Run basic tests
     test_intake_data_creation()
@@ -103,5 +130,7 @@ if __name__ == "__main__":
     test_intake_data_validation()
     test_example_intake_parsing()
     test_json_serialization()
+    test_validate_intake_json()
+    test_jsonl_streaming_validation()
     
     print("All tests passed!")
\ No newline at end of file
@@ -48,27 +48,27 @@ class TestMenuGenerator:
             'memo': 'テスト用メモ'
         }
     
-    @patch('scripts.generate_menu.Path')
-    @patch('builtins.open')
-    @patch('yaml.safe_load')
-    def test_load_config(self, mock_yaml_load, mock_open, mock_path, mock_config):
-        """Test configuration loading"""
-        mock_path.return_value.exists.return_value = True
-        mock_yaml_load.return_value = mock_config
+    def test_load_config(self, mock_config, tmp_path, monkeypatch):
+        """Test configuration loading, validation and defaults"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'config').mkdir()
+        (tmp_path / 'config' / 'rules.yaml').write_text(yaml.safe_dump(mock_config), encoding='utf-8')
         
         with patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'}):
             generator = MenuGenerator()
-            assert generator.config == mock_config
+            assert generator.config['default_settings'] == mock_config['default_settings']
+            assert generator.config['reuse']['enabled'] is False
+            assert generator.get_meal_types() == ['夕食']
     
     @patch('scripts.generate_menu.Path')
     @patch('builtins.open')
     @patch('json.load')
-    @patch('yaml.safe_load')
-    def test_load_intake_data(self, mock_yaml_load, mock_json_load, mock_open, mock_path, mock_config, mock_intake_data):
+    @patch('scripts.generate_menu.load_rules')
+    def test_load_intake_data(self, mock_load_rules, mock_json_load, mock_open, mock_path, mock_config, mock_intake_data):
         """Test intake data loading"""
         # Mock config loading
         mock_path.return_value.exists.side_effect = lambda: True
-        mock_yaml_load.return_value = mock_config
+        mock_load_rules.return_value = mock_config
         mock_json_load.return_value = mock_intake_data
         
         with patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'}):
@@ -77,11 +77,11 @@ class TestMenuGenerator:
             assert generator.intake_data.days_needed == 5
     
     @patch('scripts.generate_menu.Path')
-    @patch('yaml.safe_load')
-    def test_get_menu_settings_with_intake(self, mock_yaml_load, mock_path, mock_config):
+    @patch('scripts.generate_menu.load_rules')
+    def test_get_menu_settings_with_intake(self, mock_load_rules, mock_path, mock_config):
         """Test menu settings generation with intake data"""
         mock_path.return_value.exists.return_value = True
-        mock_yaml_load.return_value = mock_config
+        mock_load_rules.return_value = mock_config
         
         with patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'}):
             generator = MenuGenerator()
@@ -109,11 +109,11 @@ class TestMenuGenerator:
             assert settings['guests_expected'] == 2
     
     @patch('scripts.generate_menu.Path')
-    @patch('yaml.safe_load')
-    def test_get_menu_settings_defaults_only(self, mock_yaml_load, mock_path, mock_config):
+    @patch('scripts.generate_menu.load_rules')
+    def test_get_menu_settings_defaults_only(self, mock_load_rules, mock_path, mock_config):
         """Test menu settings with defaults only (no intake)"""
         mock_path.return_value.exists.return_value = True
-        mock_yaml_load.return_value = mock_config
+        mock_load_rules.return_value = mock_config
         
         with patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'}):
             generator = MenuGenerator()
@@ -126,11 +126,11 @@ class TestMenuGenerator:
             assert settings['avoid_ingredients'] == []
     
     @patch('scripts.generate_menu.Path')
-    @patch('yaml.safe_load')
-    def test_create_menu_prompt(self, mock_yaml_load, mock_path, mock_config):
+    @patch('scripts.generate_menu.load_rules')
+    def test_create_menu_prompt(self, mock_load_rules, mock_path, mock_config):
         """Test menu prompt creation"""
         mock_path.return_value.exists.return_value = True
-        mock_yaml_load.return_value = mock_config
+        mock_load_rules.return_value = mock_config
         
         with patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'}):
             generator = MenuGenerator()
@@ -151,14 +151,24 @@ class TestMenuGenerator:
             assert 'エビ' in prompt
             assert '30分' in prompt
             assert 'cookpad.com' in prompt
+            
+            settings['pantry_hints'] = [{'name': '肉じゃが', 'cooking_time': 30, 'pantry_ingredients': ['じゃがいも', '玉ねぎ']}]
+            prompt = generator.create_menu_prompt(settings)
+            
+            assert '肉じゃが（在庫: じゃがいも・玉ねぎ）' in prompt
+            
+            settings['recent_dishes'] = ['カレーライス', '親子丼']
+            prompt = generator.create_menu_prompt(settings)
+            
+            assert '最近の献立に出た料理（できるだけ避ける）: カレーライス, 親子丼' in prompt
     
     @patch('scripts.generate_menu.Path')
-    @patch('yaml.safe_load')
+    @patch('scripts.generate_menu.load_rules')
     @patch('scripts.generate_menu.OpenAI')
-    def test_generate_menu_api_call(self, mock_openai_class, mock_yaml_load, mock_path, mock_config):
+    def test_generate_menu_api_call(self, mock_openai_class, mock_load_rules, mock_path, mock_config):
         """Test OpenAI API call for menu generation"""
         mock_path.return_value.exists.return_value = True
-        mock_yaml_load.return_value = mock_config
+        mock_load_rules.return_value = mock_config
         
         # Mock OpenAI response
         mock_response = Mock()
@@ -178,6 +188,79 @@ class TestMenuGenerator:
             assert result == "Generated menu content"
             mock_client.chat.completions.create.assert_called_once()
 
+    @patch('scripts.generate_menu.Path')
+    @patch('scripts.generate_menu.load_rules')
+    @patch('scripts.generate_menu.OpenAI')
+    def test_generate_menu_multiple_meal_types(self, mock_openai_class, mock_load_rules, mock_path, mock_config):
+        """Test one request per enabled meal type merged into one week"""
+        mock_path.return_value.exists.return_value = True
+        mock_load_rules.return_value = dict(mock_config, meal_types=[
+            {'name': '朝食', 'enabled': True},
+            {'name': '昼食', 'enabled': False},
+            {'name': '夕食', 'enabled': True},
+        ])
+        
+        def fake_create(**kwargs):
+            prompt = kwargs['messages'][1]['content']
+            dish = 'トースト' if '朝食献立' in prompt else '肉じゃが'
+            response = Mock()
+            response.choices = [Mock()]
+            response.choices[0].message.content = f"**月曜日 (01/15)**\n- {dish} (調理時間: 10分)\n\n**土曜日 (01/20)**\n- 外食・外泊"
+            return response
+        
+        mock_client = Mock()
+        mock_client.chat.completions.create.side_effect = fake_create
+        mock_openai_class.return_value = mock_client
+        
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'}):
+            generator = MenuGenerator()
+            generator.intake_data = None
+            
+            assert generator.get_meal_types() == ['朝食', '夕食']
+            result = generator.generate_menu()
+            menu_data = generator.build_menu_data(result)
+        
+        assert mock_client.chat.completions.create.call_count == 2
+        assert '- 朝食: トースト (調理時間: 10分)' in result
+        assert '- 夕食: 肉じゃが (調理時間: 10分)' in result
+        assert result.count('外食・外泊') == 1
+        monday = menu_data['week_plan'][0]
+        assert monday['meals'] == {
+            '朝食': [{'name': 'トースト', 'cooking_time': 10}],
+            '夕食': [{'name': '肉じゃが', 'cooking_time': 10}],
+        }
+
+    @patch('scripts.generate_menu.Path')
+    @patch('scripts.generate_menu.load_rules')
+    @patch('scripts.generate_menu.OpenAI')
+    def test_generate_menu_regenerates_imbalanced_week(self, mock_openai_class, mock_load_rules, mock_path, mock_config):
+        """Test an imbalanced menu is regenerated once with the issues in the prompt"""
+        mock_path.return_value.exists.return_value = True
+        mock_load_rules.return_value = dict(mock_config, nutrition={'max_regenerations': 1})
+        
+        responses = []
+        for content in ["**月曜日 (01/15)**\n- 唐揚げ (調理時間: 30分)", "**月曜日 (01/15)**\n- 焼き魚 (調理時間: 20分)"]:
+            response = Mock()
+            response.choices = [Mock()]
+            response.choices[0].message.content = content
+            responses.append(response)
+        
+        mock_client = Mock()
+        mock_client.chat.completions.create.side_effect = responses
+        mock_openai_class.return_value = mock_client
+        
+        with patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'}):
+            generator = MenuGenerator()
+            generator.intake_data = None
+            generator.assess_nutrition = Mock(return_value={'balanced': False, 'issues': ['脂質のエネルギー比率が高い']})
+            
+            result = generator.generate_menu()
+        
+        assert '焼き魚' in result
+        assert mock_client.chat.completions.create.call_count == 2
+        retry_prompt = mock_client.chat.completions.create.call_args.kwargs['messages'][1]['content']
+        assert '脂質のエネルギー比率が高い' in retry_prompt
+
 
 def test_day_name_conversion():
     """Test day index to Japanese name conversion"""
@@ -0,0 +1,71 @@
+"""
+Tests for the append-only menu history
+"""
+
+import os
+from datetime import date
+
+from schemas.intake_schema import IntakeData
+from scripts.menu_history import INDEX_ENTRY, MenuHistory
+
+
+def menu(week_start, dish):
+    return {'week_start': week_start, 'week_plan': [{'meals': {'夕食': [{'name': dish, 'cooking_time': 20}]}}]}
+
+
+def test_random_access_by_household_and_week(tmp_path):
+    """The latest record per (user_id, week_start, kind) is returned"""
+    with MenuHistory(tmp_path) as history:
+        history.append_menu(menu('2024-01-08', '肉じゃが'), 'U1')
+        history.append_menu(menu('2024-01-15', 'カレー'), 'U1')
+        history.append_menu(menu('2024-01-15', '親子丼'), 'U1')
+        history.append_menu(menu('2024-01-15', '焼き魚'), 'U2')
+        history.append_intake(IntakeData(week_start=date(2024, 1, 15), user_id='U1', memo='来客あり'))
+
+        assert history.get('U1', '2024-01-15')['week_plan'][0]['meals']['夕食'][0]['name'] == '親子丼'
+        assert history.get('U2', date(2024, 1, 15))['week_plan'][0]['meals']['夕食'][0]['name'] == '焼き魚'
+        assert history.get('U1', '2024-01-15', kind='intake')['memo'] == '来客あり'
+        assert history.get('U3', '2024-01-15') is None
+        assert [m['week_start'] for m in history.recent('U1', '2024-01-22', weeks=3)] == ['2024-01-15', '2024-01-08']
+
+    # Superseded records stay in the log
+    assert [record['kind'] for record in MenuHistory(tmp_path)] == ['menu'] * 4 + ['intake']
+
+
+def test_reader_sees_records_from_other_writers(tmp_path):
+    reader = MenuHistory(tmp_path)
+    MenuHistory(tmp_path).append_menu(menu('2024-01-15', 'カレー'), 'U1')
+
+    assert reader.get('U1', '2024-01-15') is not None
+    # A newer record for a week the reader already indexed supersedes it
+    MenuHistory(tmp_path).append_menu(menu('2024-01-15', '親子丼'), 'U1')
+    assert reader.get('U1', '2024-01-15')['week_plan'][0]['meals']['夕食'][0]['name'] == '親子丼'
+
+
+def test_intake_is_recorded_under_the_menus_household(tmp_path):
+    """A tenant's intake carrying the submitter's own user_id is kept with the tenant's menus"""
+    with MenuHistory(tmp_path) as history:
+        history.append_intake(IntakeData(week_start=date(2024, 1, 15), user_id='U-slack'), 'U-tenant')
+
+        assert history.get('U-tenant', '2024-01-15', kind='intake')['user_id'] == 'U-slack'
+        assert history.get('U-slack', '2024-01-15', kind='intake') is None
+
+
+def test_recovers_missing_index_entries_and_torn_records(tmp_path):
+    """A crash between log and index writes loses nothing that was fully written"""
+    history = MenuHistory(tmp_path)
+    history.append_menu(menu('2024-01-08', '肉じゃが'), 'U1')
+    history.append_menu(menu('2024-01-15', 'カレー'), 'U1')
+
+    # Lose the last index entry and leave half a record at the end of the log
+    with open(history.index_path, 'r+b') as f:
+        f.truncate(INDEX_ENTRY.size)
+    with open(history.log_path, 'ab') as f:
+        f.write(b'MH\x01\x00partial')
+
+    recovered = MenuHistory(tmp_path)
+    assert recovered.get('U1', '2024-01-15') is not None
+
+    recovered.append_menu(menu('2024-01-22', '親子丼'), 'U1')
+    assert os.path.getsize(history.index_path) == 3 * INDEX_ENTRY.size
+    assert [record['week_start'] for record in MenuHistory(tmp_path)] == ['2024-01-08', '2024-01-15', '2024-01-22']
@@ -0,0 +1,194 @@
+"""
+Tests for near-duplicate menu reuse
+"""
+
+import json
+import pytest
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+from scripts.menu_history import MenuHistory
+from scripts.menu_reuse import (MenuRepairer, MenuSimilarityIndex, ReuseStats, canonicalize_settings,
+                                settings_features, similarity)
+from scripts.menu_structure import DAY_NAMES
+from scripts.recipe_catalog import RecipeCatalog
+
+RECIPES = [
+    {'name': '肉じゃが', 'category': '和食', 'cooking_time': 30,
+     'ingredients': [{'name': '牛肉'}, {'name': 'じゃがいも'}, {'name': '玉ねぎ'}]},
+    {'name': '鮭のムニエル', 'category': '洋食', 'cooking_time': 20, 'ingredients': [{'name': '鮭'}]},
+    {'name': '親子丼', 'category': '和食', 'cooking_time': 15, 'ingredients': [{'name': '鶏肉'}, {'name': 'タマネギ'}]},
+    {'name': 'さばの塩焼き', 'category': '和食', 'cooking_time': 15, 'ingredients': [{'name': 'さば'}]},
+    {'name': 'ビーフシチュー', 'category': '洋食', 'cooking_time': 90, 'ingredients': [{'name': '牛肉'}]},
+]
+
+RULES = """
+default_settings:
+  days_needed: 7
+  away_days: []
+  avoid_ingredients: []
+  max_cooking_time: 60
+  priority_recipe_sites: [cookpad.com]
+  dietary_preferences: []
+recipe_catalog: data/recipes.json
+history:
+  enabled: true
+  path: data/history
+reuse:
+  enabled: true
+  max_repaired_fraction: 0.5
+  stats_path: data/reuse_stats.json
+"""
+
+SETTINGS = {'days_needed': 7, 'away_days': [], 'avoid_ingredients': ['えび'], 'max_cooking_time': 45,
+            'priority_recipe_sites': ['cookpad.com'], 'dietary_preferences': []}
+
+
+def week_plan(week_start, dishes):
+    return [{'date': (week_start + timedelta(days=i)).isoformat(), 'day': DAY_NAMES[i], 'meals': {'夕食': [dish]}}
+            for i, dish in enumerate(dishes)]
+
+
+PREVIOUS_DISHES = [{'name': '肉じゃが', 'cooking_time': 30}, {'name': '鮭のムニエル', 'cooking_time': 20}] + \
+                  [{'name': 'お休み', 'cooking_time': None}] * 5
+
+
+@pytest.fixture(autouse=True)
+def clear_indexes():
+    MenuSimilarityIndex._instances.clear()
+    yield
+    MenuSimilarityIndex._instances.clear()
+
+
+def test_canonicalize_settings():
+    """Presentation-only differences disappear; sites keep their priority order"""
+    canonical = canonicalize_settings({
+        'days_needed': 5, 'away_days': [3, 1, 3], 'avoid_ingredients': ['タマネギ', '玉葱 ', 'えび', '海老', 'ＰＥＡＣＨ'],
+        'max_cooking_time': 50, 'priority_recipe_sites': ['www.kurashiru.com', 'cookpad.com', 'kurashiru.com'],
+        'dietary_preferences': ['Vegetarian', 'vegetarian'], 'special_memo': '  来客 　あり ',
+    })
+
+    assert canonical['away_days'] == [1, 3]
+    assert canonical['avoid_ingredients'] == ['peach', 'えび', '玉ねぎ']
+    assert canonical['max_cooking_time'] == 45
+    assert canonical['priority_recipe_sites'] == ['kurashiru.com', 'cookpad.com']
+    assert canonical['dietary_preferences'] == ['vegetarian']
+    assert canonical['special_memo'] == '来客 あり'
+    assert canonicalize_settings(canonical) == canonical
+
+
+def test_similarity_tolerates_memo_wording():
+    base = canonicalize_settings(dict(SETTINGS, special_memo='金曜日は友人が来ます。'))
+    reworded = canonicalize_settings(dict(SETTINGS, special_memo='金曜日は友人が来ます!!'))
+    different = canonicalize_settings(dict(SETTINGS, avoid_ingredients=['牛肉', '豚肉'], max_cooking_time=20,
+                                                   special_memo='子供の誕生日'))
+
+    assert similarity(settings_features(base), settings_features(reworded)) == 1.0
+    assert similarity(settings_features(base), settings_features(different)) < 0.5
+
+
+def test_repair_replaces_offending_dishes():
+    catalog = RecipeCatalog(RECIPES)
+    plan = week_plan(date(2024, 1, 8), PREVIOUS_DISHES)
+    settings = canonicalize_settings(dict(SETTINGS, avoid_ingredients=['たまねぎ']))
+
+    repaired, count = MenuRepairer(catalog, max_repaired_fraction=0.5).repair(plan, settings)
+
+    # 肉じゃが contains 玉ねぎ; 親子丼 (タマネギ) is excluded too, leaving the other 和食 recipe
+    assert [day['meals']['夕食'][0]['name'] for day in repaired[:2]] == ['さばの塩焼き', '鮭のムニエル']
+    assert count == 1
+    assert plan[0]['meals']['夕食'][0]['name'] == '肉じゃが'
+    # One of two cooked dishes is more than the default share repair may replace
+    assert MenuRepairer(catalog).repair(plan, settings) is None
+    # Nothing is left to replace a dish served recently
+    assert MenuRepairer(catalog).repair(plan, dict(settings, recent_dishes=['鮭のムニエル'])) is None
+    # Without a catalog only dishes that need no replacement pass
+    assert MenuRepairer(None).repair(plan, settings) == (plan, 0)
+    assert MenuRepairer(None).repair(plan, dict(settings, max_cooking_time=20)) is None
+
+
+def test_index_matches_same_structure_only(tmp_path):
+    with MenuHistory(tmp_path) as history:
+        history.append_menu({'week_start': '2024-01-08', 'meal_types': ['夕食'], 'settings_used': SETTINGS,
+                             'week_plan': week_plan(date(2024, 1, 8), PREVIOUS_DISHES)}, 'U1')
+        index = MenuSimilarityIndex.for_history(history)
+
+        assert len(index) == 1
+        assert index.query(canonicalize_settings(SETTINGS), ['夕食']).score == 1.0
+        assert index.query(canonicalize_settings(SETTINGS), ['夕食'], exclude_user='U1',
+                           exclude_weeks=['2024-01-08']) is None
+        assert index.query(canonicalize_settings(SETTINGS), ['夕食'], exclude_user='U2',
+                           exclude_weeks=['2024-01-08']).score == 1.0
+        assert index.query(canonicalize_settings(dict(SETTINGS, days_needed=5)), ['夕食']) is None
+        assert index.query(canonicalize_settings(SETTINGS), ['昼食', '夕食']) is None
+        assert index.query(canonicalize_settings(dict(SETTINGS, dietary_preferences=['vegan'])), ['夕食']) is None
+
+        history.append_menu({'week_start': '2024-01-15', 'meal_types': ['夕食'], 'settings_used': SETTINGS,
+                             'week_plan': week_plan(date(2024, 1, 15), PREVIOUS_DISHES)}, 'U2')
+        assert len(MenuSimilarityIndex.for_history(history)) == 2
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config').mkdir()
+    (tmp_path / 'config' / 'rules.yaml').write_text(RULES, encoding='utf-8')
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'recipes.json').write_text(json.dumps(RECIPES, ensure_ascii=False), encoding='utf-8')
+    with MenuHistory(tmp_path / 'data' / 'history') as history:
+        history.append_menu({'week_start': '2024-01-08', 'meal_types': ['夕食'], 'settings_used': SETTINGS,
+                             'week_plan': week_plan(date(2024, 1, 8), PREVIOUS_DISHES)}, 'U1')
+    return tmp_path
+
+
+def generator_for(intake, client):
+    with open('data/intake.json', 'w', encoding='utf-8') as f:
+        json.dump(dict(intake, week_start='2024-01-22', user_id='U2', priority_recipe_sites=['cookpad.com']), f, ensure_ascii=False)
+    return MenuGenerator(deadline=RunDeadline(), openai_client=client)
+
+
+def test_near_duplicate_intake_reuses_repaired_menu(workspace):
+    client = Mock()
+    generator = generator_for({'avoid_ingredients': ['海老', 'タマネギ'], 'max_cooking_time': 50}, client)
+
+    menu_content = generator.generate_menu()
+    menu_data = generator.build_menu_data(menu_content)
+
+    client.chat.completions.create.assert_not_called()
+    assert menu_data['week_plan'][0]['date'] == '2024-01-22'
+    assert menu_data['week_plan'][0]['meals']['夕食'][0]['name'] == 'さばの塩焼き'
+    assert menu_data['reused_from']['week_start'] == '2024-01-08'
+    assert menu_data['reused_from']['repaired_dishes'] == 1
+    stats = ReuseStats('data/reuse_stats.json').load()
+    assert (stats['lookups'], stats['hit'], stats['repaired_dishes']) == (1, 1, 1)
+
+
+def test_dissimilar_intake_is_generated(workspace):
+    client = Mock()
+    client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content='fresh menu'))])
+    generator = generator_for({'avoid_ingredients': ['牛肉', '豚肉', '鶏肉'], 'max_cooking_time': 20}, client)
+
+    assert generator.generate_menu() == 'fresh menu'
+    stats = ReuseStats('data/reuse_stats.json')
+    assert stats.load()['below_threshold'] == 1
+    assert 'Hit rate: 0.0%' in stats.report()
+
+
+def test_unchanged_settings_do_not_reuse_own_previous_week(workspace):
+    """Week after week with the same settings, a household gets a new menu instead of last week's"""
+    rules = RULES.replace('  path: data/history\n', '  path: data/history\n  avoid_recent_weeks: 1\n')
+    (workspace / 'config' / 'rules.yaml').write_text(rules, encoding='utf-8')
+    client = Mock()
+    client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content='fresh menu'))])
+    with open('data/intake.json', 'w', encoding='utf-8') as f:
+        json.dump(dict(SETTINGS, week_start='2024-01-15', user_id='U1'), f, ensure_ascii=False)
+    generator = MenuGenerator(deadline=RunDeadline(), openai_client=client)
+
+    assert generator.generate_menu() == 'fresh menu'
+    assert generator.reused_from is None
+    assert ReuseStats('data/reuse_stats.json').load()['no_candidate'] == 1
@@ -0,0 +1,221 @@
+"""
+Tests for the long-running menu service
+"""
+
+import json
+import asyncio
+import pytest
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from scripts.menu_service import MenuService
+
+
+async def http_request(port, method, path, body=None, content_length=None):
+    """Send one HTTP request to the service and return (status, json body)"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    if content_length is None:
+        content_length = len(payload)
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {content_length}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, _, content = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ')[1])
+    return status, json.loads(content)
+
+
+async def wait_for_job(port, job_id, timeout=5):
+    for _ in range(int(timeout / 0.05)):
+        status, job = await http_request(port, 'GET', f'/jobs/{job_id}')
+        if job['status'] in ('done', 'failed'):
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+@pytest.fixture
+def service():
+    return MenuService(port=0, workers=2, openai_client=Mock(), notion_client=Mock())
+
+
+@patch('scripts.menu_service.NotionMenuUpdater')
+@patch('scripts.menu_service.MenuGenerator')
+def test_submit_intake_runs_job(mock_generator_class, mock_updater_class, service):
+    """A valid intake is queued, generated with warm clients and published"""
+    mock_generator_class.return_value.generate_menu.return_value = "menu"
+    mock_generator_class.return_value.build_menu_data.return_value = {'week_start': '2024-01-15'}
+    mock_updater_class.return_value.update_menu.return_value = "page-123"
+
+    async def scenario():
+        await service.start()
+        try:
+            status, accepted = await http_request(service.port, 'POST', '/intake',
+                                                  {'week_start': '2024-01-15', 'days_needed': 5})
+            assert status == 202
+            return await wait_for_job(service.port, accepted['job_id'])
+        finally:
+            await service.stop()
+
+    job = asyncio.run(scenario())
+
+    assert job['status'] == 'done'
+    assert job['page_id'] == 'page-123'
+    assert mock_generator_class.call_args.kwargs['openai_client'] is service.openai_client
+    assert mock_updater_class.call_args.kwargs['notion_client'] is service.notion_client
+
+
+def test_invalid_intake_rejected(service):
+    """Schema violations are reported without queueing a job"""
+    async def scenario():
+        await service.start()
+        try:
+            return await http_request(service.port, 'POST', '/intake',
+                                      {'week_start': '2024-01-15', 'days_needed': 9})
+        finally:
+            await service.stop()
+
+    status, body = asyncio.run(scenario())
+
+    assert status == 422
+    assert body['errors'][0]['loc'] == ['days_needed']
+    assert service.jobs == {}
+
+
+def test_status_reports_queue_depth(service):
+    """Status exposes queue depth and worker pool size"""
+    async def scenario():
+        await service.start()
+        try:
+            return await http_request(service.port, 'GET', '/status')
+        finally:
+            await service.stop()
+
+    status, body = asyncio.run(scenario())
+
+    assert status == 200
+    assert body['queue_depth'] == 0
+    assert body['workers'] == 2
+
+
+def test_unknown_job_returns_404(service):
+    async def scenario():
+        await service.start()
+        try:
+            return await http_request(service.port, 'GET', '/jobs/missing')
+        finally:
+            await service.stop()
+
+    status, _ = asyncio.run(scenario())
+    assert status == 404
+
+
+def test_invalid_content_length_is_rejected(service):
+    async def scenario():
+        await service.start()
+        try:
+            return [await http_request(service.port, 'POST', '/intake', {'week_start': '2024-01-15'}, length)
+                    for length in ('abc', '-5', '+5')]
+        finally:
+            await service.stop()
+
+    for status, body in asyncio.run(scenario()):
+        assert status == 400
+        assert body['error'] == "Invalid Content-Length"
+
+
+def test_webhook_stores_and_deduplicates(tmp_path):
+    """Webhook intakes are persisted once per conversation and week"""
+    from scripts.intake_store import IntakeStore
+
+    service = MenuService(port=0, openai_client=Mock(), notion_client=Mock(),
+                          intake_store=IntakeStore(str(tmp_path)), webhook_token='secret')
+    intake = {'week_start': '2024-01-15', 'conversation_id': 'conv_abc123', 'days_needed': 5}
+
+    async def scenario():
+        await service.start()
+        try:
+            unauthorized = await http_request(service.port, 'POST', '/webhook/intake', intake)
+            service.webhook_token = None
+            first = await http_request(service.port, 'POST', '/webhook/intake', intake)
+            second = await http_request(service.port, 'POST', '/webhook/intake', intake)
+            return unauthorized, first, second
+        finally:
+            await service.stop()
+
+    unauthorized, first, second = asyncio.run(scenario())
+
+    assert unauthorized[0] == 401
+    assert first == (202, {'status': 'stored'})
+    assert second == (200, {'status': 'duplicate'})
+    assert (tmp_path / 'intakes' / '2024-01-15' / 'conv_abc123.json').exists()
+    assert json.loads((tmp_path / 'intake.json').read_text())['days_needed'] == 5
+    assert service.jobs == {}
+
+
+
+def test_intake_store_reports_stale_and_keeps_latest_week(tmp_path):
+    """An older, changed re-delivery is stale; a late intake for an earlier week does not replace intake.json"""
+    from schemas.intake_schema import IntakeData
+    from scripts.intake_store import IntakeStore
+
+    store = IntakeStore(str(tmp_path))
+    newer = IntakeData(week_start='2024-01-22', conversation_id='c1', days_needed=5,
+                       timestamp='2024-01-20T10:00:00+09:00')
+    older = newer.model_copy(update={'days_needed': 3, 'timestamp': newer.timestamp - timedelta(hours=1)})
+    previous_week = IntakeData(week_start='2024-01-15', conversation_id='c2', days_needed=4)
+
+    assert store.save(newer)[0] == 'stored'
+    assert store.save(newer)[0] == 'duplicate'
+    assert store.save(older)[0] == 'stale'
+    assert store.save(previous_week)[0] == 'stored'
+
+    assert (tmp_path / 'intakes' / '2024-01-15' / 'c2.json').exists()
+    latest = json.loads((tmp_path / 'intake.json').read_text())
+    assert (latest['week_start'], latest['days_needed']) == ('2024-01-22', 5)
+
+
+def test_webhook_intake_rejected_by_full_queue_is_not_stored(tmp_path):
+    """A redelivery after a 503 is generated instead of being answered as a duplicate"""
+    from scripts.intake_store import IntakeStore
+    from scripts.menu_service import HTTPError
+
+    service = MenuService(port=0, openai_client=Mock(), notion_client=Mock(),
+                          intake_store=IntakeStore(str(tmp_path)), webhook_trigger=True, webhook_token='')
+    body = json.dumps({'week_start': '2024-01-15', 'conversation_id': 'c1'}).encode('utf-8')
+
+    with patch.object(service, 'submit', side_effect=HTTPError(503, "Job queue is full")):
+        with pytest.raises(HTTPError):
+            asyncio.run(service.handle_webhook_intake(body, {}))
+    assert not (tmp_path / 'intake.json').exists()
+
+    with patch.object(service, 'submit', return_value=Mock(job_id='job-1')):
+        assert asyncio.run(service.handle_webhook_intake(body, {})) == (202, {'status': 'stored', 'job_id': 'job-1'})
+    assert (tmp_path / 'intakes' / '2024-01-15' / 'c1.json').exists()
+
+@patch('scripts.menu_service.NotionMenuUpdater')
+@patch('scripts.menu_service.MenuGenerator')
+def test_webhook_triggers_generation(mock_generator_class, mock_updater_class, tmp_path):
+    """With webhook_trigger the stored intake is generated immediately"""
+    from scripts.intake_store import IntakeStore
+
+    mock_updater_class.return_value.update_menu.return_value = "page-123"
+    service = MenuService(port=0, openai_client=Mock(), notion_client=Mock(),
+                          intake_store=IntakeStore(str(tmp_path)), webhook_trigger=True, webhook_token='')
+
+    async def scenario():
+        await service.start()
+        try:
+            status, body = await http_request(service.port, 'POST', '/webhook/intake',
+                                              {'week_start': '2024-01-15', 'conversation_id': 'c1'})
+            assert status == 202
+            return await wait_for_job(service.port, body['job_id'])
+        finally:
+            await service.stop()
+
+    job = asyncio.run(scenario())
+    assert job['status'] == 'done'
@@ -0,0 +1,50 @@
+"""
+Tests for parsing and rendering structured week plans
+"""
+
+from datetime import date
+
+from scripts.menu_structure import parse_dish, parse_week_plan, merge_week_plans, render_week_plan
+
+
+MENU_CONTENT = """
+### 2024年01月15日週の夕食献立
+
+**月曜日 (01/15)**
+- 肉じゃが (調理時間: 30分)
+- 味噌汁（調理時間：10分）
+
+**土曜日 (01/20)**
+- 外食・外泊
+"""
+
+
+def test_parse_dish():
+    assert parse_dish("肉じゃが (調理時間: 30分)") == {'name': '肉じゃが', 'cooking_time': 30}
+    assert parse_dish("お休み") == {'name': 'お休み', 'cooking_time': None}
+
+
+def test_parse_week_plan():
+    plan = parse_week_plan(MENU_CONTENT, date(2024, 1, 15))
+
+    assert len(plan) == 7
+    assert plan[0]['date'] == '2024-01-15'
+    assert [d['name'] for d in plan[0]['meals']['夕食']] == ['肉じゃが', '味噌汁']
+    assert plan[0]['meals']['夕食'][1]['cooking_time'] == 10
+    assert plan[1]['meals'] == {}
+    assert plan[5]['meals']['夕食'][0]['name'] == '外食・外泊'
+
+
+def test_merge_and_render_round_trip():
+    week_start = date(2024, 1, 15)
+    plans = {
+        '朝食': parse_week_plan("**月曜日 (01/15)**\n- トースト (調理時間: 5分)", week_start, ['朝食']),
+        '夕食': parse_week_plan(MENU_CONTENT, week_start, ['夕食']),
+    }
+
+    content = render_week_plan(merge_week_plans(plans, week_start), "2024年01月15日週の献立")
+    reparsed = parse_week_plan(content, week_start, ['朝食', '夕食'])
+
+    assert content.startswith("### 2024年01月15日週の献立")
+    assert reparsed[0]['meals']['朝食'] == [{'name': 'トースト', 'cooking_time': 5}]
+    assert len(reparsed[0]['meals']['夕食']) == 2
@@ -0,0 +1,133 @@
+"""
+Tests for the local Notion menu database mirror
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from scripts.notion_mirror import NotionMenuMirror
+
+
+def make_page(page_id, week_start, status="Current", edited="2024-01-20T10:00:00.000Z"):
+    return {
+        'id': page_id,
+        'last_edited_time': edited,
+        'archived': False,
+        'properties': {
+            'Week Start': {'date': {'start': week_start}},
+            'Status': {'select': {'name': status}},
+        }
+    }
+
+
+@pytest.fixture
+def notion():
+    return Mock()
+
+
+@pytest.fixture
+def mirror(notion, tmp_path):
+    mirror = NotionMenuMirror(notion, 'db', path=str(tmp_path / 'mirror.sqlite3'))
+    yield mirror
+    mirror.close()
+
+
+def test_initial_sync_paginates(mirror, notion):
+    """The first sync pulls every page across result pages"""
+    notion.databases.query.side_effect = [
+        {'results': [make_page('p1', '2024-01-01')], 'has_more': True, 'next_cursor': 'c1'},
+        {'results': [make_page('p2', '2024-01-15', edited="2024-01-21T09:00:00.000Z")], 'has_more': False},
+    ]
+
+    assert mirror.sync() == 2
+    assert 'filter' not in notion.databases.query.call_args_list[0].kwargs
+    assert notion.databases.query.call_args_list[1].kwargs['start_cursor'] == 'c1'
+    assert mirror.watermark == "2024-01-21T09:00:00.000Z"
+
+
+def test_incremental_sync_uses_watermark(mirror, notion):
+    """Later syncs only ask for pages edited since the last one"""
+    notion.databases.query.return_value = {'results': [make_page('p1', '2024-01-01')], 'has_more': False}
+    mirror.sync()
+    notion.databases.query.return_value = {'results': [], 'has_more': False}
+    mirror.sync()
+
+    query_filter = notion.databases.query.call_args.kwargs['filter']
+    assert query_filter['last_edited_time'] == {'on_or_after': "2024-01-20T10:00:00.000Z"}
+
+
+def test_local_lookups(mirror, notion):
+    """Week and cutoff lookups are answered from the local index"""
+    notion.databases.query.return_value = {'results': [
+        make_page('old', '2023-12-25'),
+        make_page('done', '2023-12-18', status="Archived"),
+        make_page('current', '2024-01-15'),
+    ], 'has_more': False}
+    mirror.sync()
+
+    assert mirror.page_for_week('2024-01-15') == 'current'
+    assert mirror.page_for_week('2024-02-05') is None
+    assert mirror.pages_before('2024-01-01') == [('old', '2023-12-25')]
+
+
+def test_writes_update_mirror(mirror):
+    """Pages returned by writes are applied without re-querying"""
+    mirror.record_page(make_page('p1', '2024-01-15'))
+    assert mirror.page_for_week('2024-01-15') == 'p1'
+
+    mirror.record_page(make_page('p1', '2024-01-15', status="Archived"))
+    assert mirror.pages_before('2024-02-01') == []
+
+    mirror.remove_page('p1')
+    assert mirror.page_for_week('2024-01-15') is None
+
+
+class NotFound(Exception):
+    code = 'object_not_found'
+
+
+def test_trashed_pages_are_dropped_on_lookup(mirror, notion):
+    """Pages deleted in the Notion UI never come back from sync and are checked before use"""
+    notion.databases.query.return_value = {'results': [
+        make_page('deleted', '2024-01-15', edited="2024-01-21T10:00:00.000Z"),
+        make_page('trashed', '2024-01-15', edited="2024-01-20T10:00:00.000Z"),
+        make_page('live', '2024-01-15', edited="2024-01-19T10:00:00.000Z"),
+    ], 'has_more': False}
+    mirror.sync()
+    pages = {'trashed': dict(make_page('trashed', '2024-01-15'), in_trash=True), 'live': make_page('live', '2024-01-15')}
+
+    def retrieve(page_id):
+        if page_id not in pages:
+            raise NotFound(page_id)
+        return pages[page_id]
+
+    notion.pages.retrieve.side_effect = retrieve
+
+    assert mirror.live_page_for_week('2024-01-15') == 'live'
+    assert mirror.page_for_week('2024-01-15') == 'live'
+
+    pages.clear()
+    assert mirror.live_page_for_week('2024-01-15') is None
+    assert notion.pages.retrieve.call_count == 4
+
+
+def test_archiver_forgets_pages_deleted_in_notion(notion, tmp_path):
+    """A page Notion no longer has is dropped from the mirror instead of failing every run"""
+    from scripts.archive_menu import NotionArchiver
+    from scripts.deadline import RunDeadline
+
+    notion.databases.query.side_effect = [{'results': [make_page('gone', '2024-01-01')], 'has_more': False},
+                                          RuntimeError("timeout"), {'results': [], 'has_more': False}]
+    notion.pages.update.side_effect = NotFound()
+    archiver = NotionArchiver(deadline=RunDeadline(), notion_client=notion, database_id='db',
+                              mirror_path=str(tmp_path / 'mirror.sqlite3'))
+    archiver.mirror.sync()
+
+    with patch('scripts.deadline.time.sleep'):
+        assert archiver.get_pages_to_archive() == [('gone', '2024-01-01')]
+    assert not archiver.update_page_status('gone')
+    assert archiver.mirror.pages_before('2030-01-01') == []
+    # The sync that timed out once was retried under the run deadline
+    assert notion.databases.query.call_count == 3
+    assert archiver.mirror.retry == archiver.deadline.retry_with_backoff
+    archiver.mirror.close()
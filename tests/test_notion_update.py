@@ -0,0 +1,148 @@
+"""
+Tests for Notion page creation
+"""
+
+import os
+import pytest
+from datetime import date
+from unittest.mock import Mock, patch
+
+from scripts.notion_update import NotionMenuUpdater, MAX_CHILDREN_PER_REQUEST, MAX_RICH_TEXT_LENGTH
+
+
+@pytest.fixture
+def notion():
+    client = Mock()
+    client.pages.create.return_value = {'id': 'page-123'}
+    return client
+
+
+@pytest.fixture
+def updater(notion):
+    with patch.dict(os.environ, {'NOTION_DATABASE_ID': 'db'}):
+        yield NotionMenuUpdater(notion_client=notion)
+
+
+def make_menu_data(menu_content):
+    return {
+        'week_start': '2024-01-15',
+        'generated_at': '2024-01-14T18:00:00',
+        'menu_content': menu_content,
+        'intake_data_available': False
+    }
+
+
+def test_small_menu_created_in_one_request(updater, notion):
+    """Menus within the block limit are created with a single request"""
+    content = "**月曜日 (01/15)**\n- 肉じゃが (調理時間: 30分)"
+
+    assert updater.create_notion_page(make_menu_data(content)) == 'page-123'
+
+    children = notion.pages.create.call_args.kwargs['children']
+    assert [block['type'] for block in children] == ['heading_2', 'divider', 'heading_3', 'bulleted_list_item']
+    notion.blocks.children.append.assert_not_called()
+
+
+def test_large_menu_appended_in_batches(updater, notion):
+    """Blocks beyond the per-request limit are appended in order"""
+    content = '\n'.join(f"- 料理{i} (調理時間: 10分)" for i in range(250))
+
+    updater.create_notion_page(make_menu_data(content))
+
+    first = notion.pages.create.call_args.kwargs['children']
+    appended = [call.kwargs['children'] for call in notion.blocks.children.append.call_args_list]
+    assert len(first) == MAX_CHILDREN_PER_REQUEST
+    assert [len(batch) for batch in appended] == [100, 52]
+    assert all(call.kwargs['block_id'] == 'page-123' for call in notion.blocks.children.append.call_args_list)
+
+    items = [block['bulleted_list_item']['rich_text'][0]['text']['content']
+             for batch in [first] + appended for block in batch if block['type'] == 'bulleted_list_item']
+    assert items == [f"料理{i} (調理時間: 10分)" for i in range(250)]
+
+
+def test_failed_append_archives_partial_page(updater, notion):
+    """A page whose remaining blocks cannot be appended is archived"""
+    notion.blocks.children.append.side_effect = RuntimeError("boom")
+    content = '\n'.join(f"- 料理{i}" for i in range(150))
+
+    with patch('scripts.deadline.time.sleep'):
+        with pytest.raises(RuntimeError):
+            updater.create_notion_page(make_menu_data(content))
+
+    notion.pages.update.assert_called_once_with(page_id='page-123', archived=True)
+
+
+def test_failed_cleanup_reraises_append_error(updater, notion):
+    """When the partial page cannot be archived either, the append error is raised"""
+    notion.blocks.children.append.side_effect = RuntimeError("append failed")
+    notion.pages.update.side_effect = ConnectionError("archive failed")
+    content = '\n'.join(f"- 料理{i}" for i in range(150))
+
+    with patch('scripts.deadline.time.sleep'):
+        with pytest.raises(RuntimeError, match="append failed"):
+            updater.create_notion_page(make_menu_data(content))
+
+    assert notion.pages.update.called
+
+
+def test_long_paragraph_split_at_rich_text_limit(updater):
+    """Paragraphs longer than the rich text limit become several segments"""
+    memo = "あ" * (MAX_RICH_TEXT_LENGTH * 2 + 10)
+
+    blocks = updater.build_menu_blocks(memo, date(2024, 1, 15))
+
+    segments = blocks[-1]['paragraph']['rich_text']
+    assert [len(s['text']['content']) for s in segments] == [MAX_RICH_TEXT_LENGTH, MAX_RICH_TEXT_LENGTH, 10]
+
+
+def test_shopping_list_rendered_as_checklist(updater, notion):
+    """The shopping list follows the menu as unchecked to-do items"""
+    menu_data = make_menu_data("**月曜日 (01/15)**\n- 肉じゃが (調理時間: 30分)")
+    menu_data['shopping_list'] = {
+        'servings': 3,
+        'items': [{'name': '牛肉', 'quantity': 225.0, 'unit': 'g', 'display': '225g'}],
+        'unmatched_dishes': ['謎の料理'],
+    }
+
+    updater.create_notion_page(menu_data)
+
+    children = notion.pages.create.call_args.kwargs['children']
+    todos = [block['to_do'] for block in children if block['type'] == 'to_do']
+    assert [todo['rich_text'][0]['text']['content'] for todo in todos] == ['牛肉 225g']
+    assert not todos[0]['checked']
+    assert '謎の料理' in children[-1]['paragraph']['rich_text'][0]['text']['content']
+
+
+def test_dishes_linked_to_recipes(updater, notion):
+    """Dish names in menu bullets link to the recipes found for them"""
+    menu_data = make_menu_data("**月曜日 (01/15)**\n- 夕食: 肉じゃが (調理時間: 30分)\n- 夕食: 謎の料理 (調理時間: 10分)")
+    menu_data['meal_types'] = ['朝食', '夕食']
+    menu_data['recipe_links'] = {'肉じゃが': {'url': 'https://cookpad.com/recipe/1', 'title': '簡単肉じゃが',
+                                             'site': 'cookpad.com'}}
+
+    updater.create_notion_page(menu_data)
+
+    children = notion.pages.create.call_args.kwargs['children']
+    linked, plain = [block['bulleted_list_item']['rich_text'] for block in children
+                     if block['type'] == 'bulleted_list_item']
+    assert [segment['text']['content'] for segment in linked] == ['夕食: ', '肉じゃが', ' (調理時間: 30分)']
+    assert linked[1]['text']['link'] == {'url': 'https://cookpad.com/recipe/1'}
+    assert 'link' not in linked[0]['text'] and 'link' not in linked[2]['text']
+    assert [segment['text'] for segment in plain] == [{'content': '夕食: 謎の料理 (調理時間: 10分)'}]
+
+
+def test_update_menu_ignores_page_trashed_in_notion(notion, tmp_path):
+    """A mirrored page trashed in the Notion UI is not archived again, the new page is still created"""
+    with patch.dict(os.environ, {'NOTION_DATABASE_ID': 'db'}):
+        updater = NotionMenuUpdater(notion_client=notion, mirror_path=str(tmp_path / 'mirror.sqlite3'))
+    updater.mirror.record_page({'id': 'old-page', 'last_edited_time': '2024-01-14T10:00:00.000Z',
+                                'properties': {'Week Start': {'date': {'start': '2024-01-15'}}}})
+    notion.databases.query.return_value = {'results': [], 'has_more': False}
+    notion.pages.retrieve.return_value = {'id': 'old-page', 'archived': True, 'in_trash': True}
+    notion.pages.create.return_value = {'id': 'page-123', 'last_edited_time': '2024-01-15T10:00:00.000Z',
+                                        'properties': {'Week Start': {'date': {'start': '2024-01-15'}}}}
+
+    assert updater.update_menu(make_menu_data("**月曜日 (01/15)**\n- 肉じゃが (調理時間: 30分)")) == 'page-123'
+
+    notion.pages.update.assert_not_called()
+    assert updater.mirror.page_for_week('2024-01-15') == 'page-123'
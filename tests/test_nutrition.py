@@ -0,0 +1,98 @@
+"""
+Tests for nutrition balance scoring
+"""
+
+from datetime import date
+
+import numpy as np
+
+from scripts.menu_structure import parse_week_plan
+from scripts.nutrition import FoodComposition, NutritionScorer
+from scripts.recipe_catalog import RecipeCatalog
+
+
+CATALOG = RecipeCatalog([
+    {'name': '焼き魚', 'servings': 1, 'ingredients': [
+        {'name': '鮭', 'quantity': 1, 'unit': '切れ'},
+        {'name': 'キャベツ', 'quantity': 100, 'unit': 'g'},
+    ]},
+    {'name': '豚の生姜焼き', 'servings': 2, 'ingredients': [
+        {'name': '豚肉', 'quantity': 200, 'unit': 'g'},
+        {'name': '醤油', 'quantity': 1, 'unit': '大さじ'},
+    ]},
+    {'name': '冷奴', 'servings': 1, 'ingredients': [
+        {'name': '豆腐', 'quantity': 0.5, 'unit': '丁'},
+        {'name': 'しょうが', 'quantity': 0, 'unit': '少々'},
+    ]},
+])
+
+COMPOSITION = FoodComposition([
+    {'name': '鮭', 'group': '魚', 'energy': 124, 'protein': 22.0, 'fat': 4.0, 'carbohydrate': 0.0,
+     'unit_grams': {'切れ': 100}},
+    {'name': 'キャベツ', 'group': '野菜', 'energy': 21, 'protein': 1.0, 'fat': 0.0, 'carbohydrate': 5.0},
+    {'name': '豚肉', 'group': '肉', 'energy': 250, 'protein': 18.0, 'fat': 20.0, 'carbohydrate': 0.0},
+    {'name': '醤油', 'group': '調味料', 'energy': 77, 'protein': 8.0, 'fat': 0.0, 'carbohydrate': 8.0},
+    {'name': '豆腐', 'group': '豆腐・大豆製品', 'energy': 73, 'protein': 7.0, 'fat': 5.0, 'carbohydrate': 1.5,
+     'unit_grams': {'丁': 300}},
+])
+
+SOURCES = ['魚', '肉', '豆腐・大豆製品']
+
+
+def week(*dinners):
+    lines = []
+    for day, dishes in zip(['月', '火', '水', '木', '金', '土', '日'], dinners):
+        lines.append(f"**{day}曜日**")
+        lines.extend(f"- {dish}" for dish in dishes)
+    return parse_week_plan('\n'.join(lines), date(2024, 1, 15))
+
+
+def test_recipe_nutrients_per_serving():
+    """Count units use unit_grams, liquids 1 g/ml and servings divide the totals"""
+    scorer = NutritionScorer(CATALOG, COMPOSITION, SOURCES)
+
+    fish, pork, tofu = scorer.recipe_nutrients[:3]
+    assert fish[1] == 23.0                              # 100 g salmon + 100 g cabbage
+    assert pork[1] == (36.0 + 15 * 0.08) / 2            # 200 g pork + 15 ml soy sauce, 2 servings
+    assert tofu[1] == 10.5                              # Half a 300 g block; 少々 counts as nothing
+    assert scorer.recipe_sources[0].tolist() == [22.0, 0.0, 0.0]
+    assert scorer.recipe_vegetables[:3].tolist() == [100.0, 0.0, 0.0]
+
+
+def test_batch_scoring_flags_protein_streak_and_vegetables():
+    """Weeks are scored independently in one batch"""
+    scorer = NutritionScorer(CATALOG, COMPOSITION, SOURCES, energy_ratio={
+        'protein': (0, 100), 'fat': (0, 100), 'carbohydrate': (0, 100)
+    }, max_same_protein_days=2, min_vegetable_grams=30)
+    varied = week(['焼き魚'], ['豚の生姜焼き'], ['冷奴'], ['焼き魚'], ['豚の生姜焼き'], ['お休み'], ['外食・外泊'])
+    monotonous = week(*[['豚の生姜焼き']] * 4)
+
+    result = scorer.score([varied, monotonous])
+
+    assert result.imbalanced.tolist() == [False, True]
+    assert result.max_streak.tolist() == [1, 4]
+    assert result.main_source[0].tolist() == [0, 1, 2, 0, 1, -1, -1]
+    assert result.flags['vegetables_low'].tolist() == [False, True]
+    assert np.allclose(result.weekly[1], result.daily[1, 0] * 4)
+    assert scorer.describe(result, 1) == [
+        "同じたんぱく源（肉）が4日続いている",
+        "たんぱく源に魚・豆腐・大豆製品が使われていない",
+        "野菜が少ない（1食あたり平均0g、目安 30g）",
+    ]
+
+
+def test_energy_ratio_and_unknown_dishes():
+    """Energy ratios include the staple; weeks mostly outside the catalog are not flagged"""
+    scorer = NutritionScorer(CATALOG, COMPOSITION, SOURCES, staple='キャベツ', staple_grams=100)
+    fish_only = week(['焼き魚'])
+    unknown = week(['焼き魚'], ['謎の料理'], ['謎の料理'])
+
+    assessment = scorer.assess(fish_only)
+    result = scorer.score([unknown])
+
+    # 24 g protein, 4 g fat, 10 g carbohydrate per serving
+    assert assessment['energy_ratio'] == {'protein': 55.8, 'fat': 20.9, 'carbohydrate': 23.3}
+    assert not assessment['balanced']
+    assert assessment['issues'][0].startswith('たんぱく質のエネルギー比率が高い')
+    assert result.coverage[0] == 1 / 3
+    assert not result.imbalanced[0]
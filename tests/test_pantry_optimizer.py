@@ -0,0 +1,63 @@
+"""
+Tests for pantry-aware dish selection
+"""
+
+import json
+from datetime import date
+
+from scripts.recipe_catalog import RecipeCatalog
+from scripts.pantry_optimizer import PantryOptimizer, load_pantry
+
+
+def make_catalog():
+    return RecipeCatalog([
+        {'name': '肉じゃが', 'category': '和食', 'cooking_time': 30,
+         'ingredients': [{'name': '牛肉'}, {'name': 'じゃがいも'}, {'name': '玉ねぎ'}]},
+        {'name': 'ポテトサラダ', 'category': '洋食', 'cooking_time': 20,
+         'ingredients': [{'name': 'じゃがいも'}, {'name': '卵'}, {'name': 'マヨネーズ'}]},
+        {'name': 'エビチリ', 'category': '中華', 'cooking_time': 20,
+         'ingredients': [{'name': 'エビ'}, {'name': '玉ねぎ'}, {'name': '卵'}]},
+        {'name': 'ローストビーフ', 'category': '洋食', 'cooking_time': 90,
+         'ingredients': [{'name': '牛肉'}, {'name': '玉ねぎ'}, {'name': 'じゃがいも'}, {'name': '卵'}]},
+        {'name': '焼き魚', 'category': '和食', 'cooking_time': 15,
+         'ingredients': [{'name': '鮭'}]},
+    ])
+
+
+def test_suggest_respects_constraints():
+    """Avoided ingredients and cooking time exclude recipes"""
+    pantry = [{'name': n, 'quantity': 1} for n in ['玉ねぎ', 'じゃがいも', '卵', '牛肉']]
+
+    hints = PantryOptimizer(make_catalog()).suggest(
+        pantry, days=5, avoid_ingredients=['エビ'], max_cooking_time=30, week_start=date(2024, 1, 15)
+    )
+
+    names = [hint['name'] for hint in hints]
+    assert names[0] == '肉じゃが'
+    assert 'エビチリ' not in names
+    assert 'ローストビーフ' not in names
+    assert '焼き魚' not in names  # Uses nothing from the pantry
+    assert hints[0]['pantry_ingredients'] == ['牛肉', 'じゃがいも', '玉ねぎ']
+
+
+def test_expiring_items_preferred():
+    """Items expiring soon weigh more than other stock"""
+    catalog = RecipeCatalog([
+        {'name': 'A', 'ingredients': [{'name': '豆腐'}]},
+        {'name': 'B', 'ingredients': [{'name': '卵'}]},
+    ])
+    pantry = [
+        {'name': '豆腐', 'quantity': 1, 'expires': date(2024, 1, 16)},
+        {'name': '卵', 'quantity': 6, 'expires': None},
+    ]
+
+    hints = PantryOptimizer(catalog).suggest(pantry, days=1, week_start=date(2024, 1, 15))
+    assert [hint['name'] for hint in hints] == ['A']
+
+
+def test_load_pantry_formats(tmp_path):
+    (tmp_path / 'pantry.json').write_text(json.dumps({'卵': 6}), encoding='utf-8')
+    (tmp_path / 'pantry.csv').write_text("name,quantity,unit,expires\n豆腐,1,丁,2024-01-16\n", encoding='utf-8')
+
+    assert load_pantry(tmp_path / 'pantry.json') == [{'name': '卵', 'quantity': 6.0, 'unit': '', 'expires': None}]
+    assert load_pantry(tmp_path / 'pantry.csv')[0]['expires'] == date(2024, 1, 16)
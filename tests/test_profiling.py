@@ -0,0 +1,133 @@
+"""
+Tests for per-stage profiling
+"""
+
+import os
+import pstats
+import multiprocessing
+import threading
+import tracemalloc
+import pytest
+from datetime import date
+from unittest.mock import Mock, patch
+
+from schemas.intake_schema import IntakeData
+from scripts.generate_menu import MenuGenerator
+from scripts.notion_update import NotionMenuUpdater
+from scripts.profiling import (StageProfiler, enable_profiling, enable_worker_profiling, finish_profiling, profile_dir,
+                               profile_stage, save_worker_profile)
+
+
+@pytest.fixture(autouse=True)
+def stop_tracing():
+    yield
+    tracemalloc.stop()
+
+
+def test_stages_write_pstats_and_report(tmp_path):
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message.content = "**月曜日 (01/15)**\n- 肉じゃが (調理時間: 30分)"
+    openai_client = Mock()
+    openai_client.chat.completions.create.return_value = response
+    notion = Mock()
+    notion.pages.create.return_value = {'id': 'page-123'}
+
+    profiler = enable_profiling(str(tmp_path), 'test')
+    try:
+        generator = MenuGenerator(openai_client=openai_client, intake_data=IntakeData(week_start=date(2024, 1, 15)))
+        with patch.object(generator, 'get_history', return_value=None):
+            menu_data = generator.build_menu_data(generator.generate_menu())
+        with patch.dict(os.environ, {'NOTION_DATABASE_ID': 'db'}):
+            NotionMenuUpdater(notion_client=notion).create_notion_page(menu_data)
+        with profile_stage('allocate'):
+            retained = [bytearray(1024) for _ in range(1000)]
+    finally:
+        report_path = finish_profiling()
+
+    stages = [result.name for result in profiler.results]
+    for stage in ('load_config', 'prompt_build', 'generation', 'block_building', 'notion_write', 'allocate'):
+        assert stage in stages
+    # Nested stages finish before the stage that contains them
+    assert stages.index('block_building') < stages.index('notion_write')
+
+    for result in profiler.results:
+        assert pstats.Stats(str(result.pstats_path)).total_calls >= 0
+    allocate = next(result for result in profiler.results if result.name == 'allocate')
+    assert allocate.allocated_bytes >= 1024 * 1000
+    assert 'test_profiling.py' in allocate.top_allocations[0][0]
+
+    report = report_path.read_text(encoding='utf-8')
+    assert 'generation' in report and 'top allocations' in report
+    assert len(retained) == 1000
+
+
+def test_profile_stage_is_noop_when_disabled():
+    with profile_stage('anything'):
+        pass
+    assert finish_profiling() is None
+
+
+def test_outer_peak_includes_inner_stages(tmp_path):
+    profiler = StageProfiler(tmp_path)
+    with profiler.stage('outer'):
+        buffer = bytearray(8 * 2**20)
+        del buffer
+        with profiler.stage('inner'):
+            pass
+    inner, outer = profiler.results
+    assert outer.peak_bytes >= 8 * 2**20 > inner.peak_bytes
+
+
+def test_concurrent_stages_run_unprofiled(tmp_path):
+    profiler = StageProfiler(tmp_path)
+    entered, release = threading.Event(), threading.Event()
+    ran = []
+
+    def worker():
+        with profiler.stage('worker'):
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    entered.wait(5)
+    try:
+        with profiler.stage('main'):
+            ran.append(sum(range(1000)))
+    finally:
+        release.set()
+        thread.join()
+    with profiler.stage('after'):
+        pass
+
+    assert ran == [499500]
+    assert [result.name for result in profiler.results] == ['worker', 'after']
+    assert profiler.skipped == 1
+    assert 'ran unprofiled' in profiler.write_report().read_text(encoding='utf-8')
+
+
+def _profiled_worker(run_dir):
+    enable_worker_profiling(run_dir)
+    with profile_stage('tenant'):
+        sum(range(1000))
+    save_worker_profile()
+
+
+def test_worker_profiles_are_merged_into_report(tmp_path):
+    """Forked workers profile into their own directory instead of the parent's, and reach its report"""
+    profiler = enable_profiling(str(tmp_path), 'test')
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_profiled_worker, args=(str(profile_dir()),)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with profile_stage('parent'):
+        pass
+    report_path = finish_profiling()
+
+    paths = sorted(str(result.pstats_path.relative_to(profiler.output_dir)) for result in profiler.results)
+    assert paths == sorted(['001_parent.pstats'] + [f"worker_{worker.pid}/001_tenant.pstats" for worker in workers])
+    report = report_path.read_text(encoding='utf-8')
+    assert f"worker_{workers[0].pid}/001_tenant.pstats" in report
@@ -0,0 +1,101 @@
+"""
+Tests for the local recipe link index
+"""
+
+import gzip
+import json
+from datetime import date
+from unittest.mock import Mock
+
+import pytest
+
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+from scripts.recipe_links import RecipeLinkIndex, bigrams, match_expression, normalize_site
+
+SITEMAP = """<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"
+        xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">
+  <url>
+    <loc>https://cookpad.com/recipe/1</loc>
+    <image:image><image:loc>https://img.cookpad.com/1.jpg</image:loc><image:title>簡単！肉じゃが</image:title></image:image>
+  </url>
+  <url>
+    <loc>https://cookpad.com/recipe/2</loc>
+    <image:image><image:title>我が家の肉じゃが　甘辛味</image:title></image:image>
+  </url>
+  <url><loc>https://cookpad.com/recipe/3</loc></url>
+  <url>
+    <loc>https://cookpad.com/recipe/4</loc>
+    <image:image><image:title>具だくさん豚汁</image:title></image:image>
+  </url>
+</urlset>
+"""
+
+EXPORT = [
+    {'url': 'https://www.kurashiru.com/recipes/10', 'title': '肉じゃが'},
+    {'url': 'https://www.kurashiru.com/recipes/11', 'title': 'ふわふわ親子丼'},
+    {'url': 'https://www.kurashiru.com/recipes/12', 'name': '鮭のムニエル'},
+    {'url': 'https://www.kurashiru.com/recipes/10', 'title': '重複した肉じゃが'},
+]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    with gzip.open(tmp_path / 'cookpad.xml.gz', 'wt', encoding='utf-8') as f:
+        f.write(SITEMAP)
+    (tmp_path / 'kurashiru.jsonl').write_text(
+        '\n'.join(json.dumps(record, ensure_ascii=False) for record in EXPORT), encoding='utf-8')
+    (tmp_path / 'rakuten.csv').write_text(
+        "url,title\nhttps://recipe.rakuten.co.jp/recipe/20/,親子丼\n", encoding='utf-8')
+
+    path = tmp_path / 'recipe_links.sqlite3'
+    count = RecipeLinkIndex.build([tmp_path / 'cookpad.xml.gz', tmp_path / 'kurashiru.jsonl',
+                                   tmp_path / 'rakuten.csv'], path)
+    # The sitemap entry without a title and the duplicate URL are skipped
+    assert count == 7
+    return path
+
+
+def test_bigram_tokens():
+    assert bigrams('肉じゃが') == ['肉じ', 'じゃ', 'ゃが']
+    assert bigrams('ＮＹ風 豚汁！') == ['ny', 'y風', '豚汁']
+    assert match_expression('鮭 ムニエル') == '"鮭" AND "ムニ ニエ エル"'
+    assert normalize_site('https://www.kurashiru.com/recipes') == 'kurashiru.com'
+    assert normalize_site('recipe.rakuten.co.jp') == 'recipe.rakuten.co.jp'
+
+
+def test_lookup_follows_site_priority(index_path):
+    index = RecipeLinkIndex(index_path)
+
+    links = index.lookup(['肉じゃが', '豚汁', '親子丼', 'ムニエル', 'ビーフストロガノフ'],
+                         ['cookpad.com', 'www.kurashiru.com'])
+
+    # The first priority site wins over an exact title elsewhere; within a site the shortest title wins
+    assert links['肉じゃが'].url == 'https://cookpad.com/recipe/1'
+    assert links['豚汁'].title == '具だくさん豚汁'
+    assert links['親子丼'].url == 'https://www.kurashiru.com/recipes/11'
+    assert links['ムニエル'].title == '鮭のムニエル'
+    assert 'ビーフストロガノフ' not in links
+
+    assert index.lookup(['親子丼'], ['recipe.rakuten.co.jp'])['親子丼'].url == 'https://recipe.rakuten.co.jp/recipe/20/'
+    assert index.lookup(['肉じゃが'], ['kurashiru.com'])['肉じゃが'].title == '肉じゃが'
+    assert index.lookup([], ['cookpad.com']) == {}
+
+
+def test_generator_adds_links_to_menu_data(index_path, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config').mkdir()
+    (tmp_path / 'config' / 'rules.yaml').write_text(
+        "default_settings: {priority_recipe_sites: [kurashiru.com, cookpad.com]}\n"
+        f"recipe_links: {{enabled: true, path: {json.dumps(str(index_path))}}}\n", encoding='utf-8')
+
+    generator = MenuGenerator(deadline=RunDeadline(), openai_client=Mock(), intake_path=None,
+                              week_start=date(2024, 1, 15))
+    menu_data = generator.build_menu_data(
+        "**月曜日 (01/15)**\n- 肉じゃが (調理時間: 30分)\n\n**火曜日 (01/16)**\n- 豚汁 (調理時間: 20分)\n- 外食・外泊")
+
+    assert menu_data['recipe_links'] == {
+        '肉じゃが': {'url': 'https://www.kurashiru.com/recipes/10', 'title': '肉じゃが', 'site': 'kurashiru.com'},
+        '豚汁': {'url': 'https://cookpad.com/recipe/4', 'title': '具だくさん豚汁', 'site': 'cookpad.com'},
+    }
@@ -0,0 +1,149 @@
+"""
+Tests for validated, cached loading of rules.yaml
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+import yaml
+
+from scripts import rules_config
+from scripts.rules_config import CompiledRules, RulesSource, load_rules, merge_rules
+
+REPO_RULES = Path(__file__).parent.parent / 'config' / 'rules.yaml'
+
+RULES = """
+default_settings:
+  days_needed: 7
+  max_cooking_time: 60
+  avoid_ingredients: [エビ]
+meal_types:
+  - {name: 夕食, enabled: true}
+pantry:
+history:
+  enabled: true
+  avoid_recent_weeks: 2
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    RulesSource._instances.clear()
+    CompiledRules._instances.clear()
+    yield
+    RulesSource._instances.clear()
+    CompiledRules._instances.clear()
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Number of YAML parses so far"""
+    count = [0]
+    original = yaml.load
+
+    def counting_load(*args, **kwargs):
+        count[0] += 1
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(rules_config.yaml, 'load', counting_load)
+    return count
+
+
+def write(path: Path, content: str, mtime_offset: int = 0):
+    path.write_text(content, encoding='utf-8')
+    # Distinct mtimes even on file systems with coarse timestamps
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset * 1_000_000_000))
+
+
+def test_shipped_rules_are_valid():
+    rules = CompiledRules(REPO_RULES).get()
+
+    assert rules.default_settings.days_needed == 7
+    assert rules.calendar.meal_window == ('18:00', '21:00')
+    assert rules.nutrition.energy_ratio['fat'] == (20, 30)
+
+
+def test_defaults_and_empty_sections(tmp_path):
+    path = tmp_path / 'rules.yaml'
+    write(path, RULES)
+
+    config = load_rules(path)
+
+    assert config['default_settings']['dietary_preferences'] == []
+    assert config['pantry'] == {'enabled': False, 'path': 'data/pantry.json', 'max_hints': 7}
+    assert config['history']['avoid_recent_weeks'] == 2
+    assert config['reuse']['enabled'] is False
+    # Callers get their own copy
+    config['default_settings']['avoid_ingredients'].append('カニ')
+    assert load_rules(path)['default_settings']['avoid_ingredients'] == ['エビ']
+
+
+def test_typos_fail_at_load(tmp_path):
+    path = tmp_path / 'rules.yaml'
+    write(path, "default_settings:\n  max_cookin_time: 30\ncalendar:\n  meal_window: [18:00, 21:00]\n")
+
+    with pytest.raises(ValueError) as error:
+        load_rules(path)
+
+    assert 'default_settings.max_cookin_time' in str(error.value)
+    assert 'calendar.meal_window.0' in str(error.value)
+    with pytest.raises(FileNotFoundError):
+        load_rules(tmp_path / 'missing.yaml')
+
+
+def test_cached_until_content_changes(tmp_path, parses):
+    path = tmp_path / 'rules.yaml'
+    write(path, RULES)
+
+    for _ in range(3):
+        assert load_rules(path)['default_settings']['max_cooking_time'] == 60
+    assert parses[0] == 1
+
+    # Touched without changes: re-read and hashed, not parsed
+    write(path, RULES, mtime_offset=5)
+    load_rules(path)
+    assert parses[0] == 1
+
+    write(path, RULES.replace('max_cooking_time: 60', 'max_cooking_time: 30'), mtime_offset=10)
+    assert load_rules(path)['default_settings']['max_cooking_time'] == 30
+    assert parses[0] == 2
+
+
+def test_invalid_edit_keeps_previous_rules(tmp_path):
+    path = tmp_path / 'rules.yaml'
+    write(path, RULES)
+    compiled = CompiledRules.for_file(path)
+    assert compiled.get().history.enabled
+
+    write(path, RULES.replace('days_needed: 7', 'days_needed: 9'), mtime_offset=5)
+    assert compiled.get().default_settings.days_needed == 7
+
+    write(path, RULES.replace('days_needed: 7', 'days_needed: 5'), mtime_offset=10)
+    assert compiled.get().default_settings.days_needed == 5
+
+
+def test_tenant_override_is_merged_once(tmp_path, parses):
+    path = tmp_path / 'rules.yaml'
+    override = tmp_path / 'tanaka.yaml'
+    write(path, RULES)
+    write(override, "default_settings:\n  avoid_ingredients: [卵]\nreuse:\n  enabled: true\n")
+
+    for _ in range(3):
+        config = load_rules(path, override)
+    base = load_rules(path)
+
+    assert config['default_settings']['avoid_ingredients'] == ['卵']
+    assert config['default_settings']['max_cooking_time'] == 60
+    assert config['reuse']['enabled'] and config['history']['enabled']
+    assert not base['reuse']['enabled']
+    # The base file is parsed once for both, the override once
+    assert parses[0] == 2
+
+
+def test_merge_rules():
+    base = {'a': {'x': 1, 'y': [1, 2]}, 'b': 1}
+
+    assert merge_rules(base, {'a': {'y': [3]}, 'c': 2}) == {'a': {'x': 1, 'y': [3]}, 'b': 1, 'c': 2}
+    assert base == {'a': {'x': 1, 'y': [1, 2]}, 'b': 1}
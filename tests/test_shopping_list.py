@@ -0,0 +1,74 @@
+"""
+Tests for the locally computed shopping list
+"""
+
+from datetime import date
+
+from scripts.menu_structure import parse_week_plan
+from scripts.recipe_catalog import RecipeCatalog
+from scripts.shopping_list import build_shopping_list, format_quantity
+
+
+CATALOG = RecipeCatalog([
+    {'name': '肉じゃが', 'servings': 2, 'ingredients': [
+        {'name': '牛肉', 'quantity': 150, 'unit': 'g'},
+        {'name': 'じゃがいも', 'quantity': 2, 'unit': '個'},
+        {'name': '醤油', 'quantity': 2, 'unit': '大さじ'},
+    ]},
+    {'name': '牛丼', 'servings': 2, 'ingredients': [
+        {'name': '牛肉', 'quantity': 0.2, 'unit': 'kg'},
+        {'name': '醤油', 'quantity': 30, 'unit': 'ml'},
+        {'name': '紅しょうが', 'quantity': 0, 'unit': '適量'},
+    ]},
+])
+
+MENU = """
+**月曜日 (01/15)**
+- 肉じゃが (調理時間: 30分)
+
+**火曜日 (01/16)**
+- 牛丼 (調理時間: 15分)
+- 謎の料理 (調理時間: 5分)
+
+**水曜日 (01/17)**
+- 外食・外泊
+"""
+
+
+def items_by_name(shopping_list):
+    return {item['name']: item for item in shopping_list['items']}
+
+
+def test_aggregates_across_units_and_scales_servings():
+    plan = parse_week_plan(MENU, date(2024, 1, 15))
+
+    shopping_list = build_shopping_list(plan, CATALOG, servings=4)
+    items = items_by_name(shopping_list)
+
+    assert items['牛肉']['quantity'] == 700.0      # (150g + 200g) x 2
+    assert items['牛肉']['unit'] == 'g'
+    assert items['醤油']['quantity'] == 120.0      # (30ml + 30ml) x 2
+    assert items['じゃがいも']['display'] == '4個'
+    assert items['紅しょうが']['display'] == ''
+    assert shopping_list['unmatched_dishes'] == ['謎の料理']
+
+
+def test_pantry_is_subtracted():
+    plan = parse_week_plan(MENU, date(2024, 1, 15))
+    pantry = [
+        {'name': '牛肉', 'quantity': 0.2, 'unit': 'kg'},
+        {'name': 'じゃがいも', 'quantity': 5, 'unit': '個'},
+        {'name': '醤油', 'quantity': None, 'unit': ''},
+        {'name': '紅しょうが', 'quantity': 1, 'unit': '袋'},
+    ]
+
+    items = items_by_name(build_shopping_list(plan, CATALOG, servings=2, pantry=pantry))
+
+    assert set(items) == {'牛肉'}
+    assert items['牛肉']['quantity'] == 150.0      # 350g needed, 200g in stock
+
+
+def test_format_quantity():
+    assert format_quantity(1500, 'g') == '1.5kg'
+    assert format_quantity(2, '個') == '2個'
+    assert format_quantity(0, '') == ''
@@ -0,0 +1,92 @@
+"""
+Tests for precomputed default-settings menus
+"""
+
+import json
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from scripts.deadline import RunDeadline
+from scripts.generate_menu import MenuGenerator
+from scripts.precompute_menus import MenuPrecomputer
+
+RULES = """
+default_settings:
+  days_needed: 7
+  away_days: []
+  avoid_ingredients: []
+  max_cooking_time: 60
+  priority_recipe_sites: [cookpad.com]
+  dietary_preferences: []
+speculative:
+  enabled: true
+  path: data/speculative
+"""
+
+WEEK = date(2024, 1, 15)
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def openai_client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'config').mkdir()
+    (tmp_path / 'config' / 'rules.yaml').write_text(RULES, encoding='utf-8')
+    client = Mock()
+    client.chat.completions.create.side_effect = [completion('precomputed menu'), completion('fresh menu')]
+    return client
+
+
+def write_intake(path, **fields):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'week_start': WEEK.isoformat(), **fields}), encoding='utf-8')
+
+
+def job_menu(openai_client, intake_path='data/intake.json'):
+    generator = MenuGenerator(deadline=RunDeadline(), openai_client=openai_client, intake_path=intake_path,
+                              user_id='U1', week_start=WEEK)
+    return generator.generate_menu()
+
+
+def test_precomputed_menu_is_used_without_intake(openai_client):
+    precomputer = MenuPrecomputer(deadline=RunDeadline(), openai_client=openai_client, week_start=WEEK)
+    households = [{'id': 'home', 'intake_path': 'data/intake.json', 'user_id': 'U1'}]
+
+    assert precomputer.run(households) == {'home': 'generated'}
+    assert precomputer.run(households) == {'home': 'cached'}
+    assert job_menu(openai_client) == 'precomputed menu'
+    assert openai_client.chat.completions.create.call_count == 1
+
+
+def test_matching_intake_reuses_precomputed_menu(openai_client, tmp_path):
+    MenuPrecomputer(deadline=RunDeadline(), openai_client=openai_client, week_start=WEEK).precompute(
+        'data/intake.json', 'U1')
+    write_intake(tmp_path / 'data' / 'intake.json', priority_recipe_sites=['cookpad.com'])
+
+    assert job_menu(openai_client) == 'precomputed menu'
+
+
+def test_differing_intake_discards_precomputed_menu(openai_client, tmp_path):
+    MenuPrecomputer(deadline=RunDeadline(), openai_client=openai_client, week_start=WEEK).precompute(
+        'data/intake.json', 'U1')
+    write_intake(tmp_path / 'data' / 'intake.json', priority_recipe_sites=['cookpad.com'], max_cooking_time=20)
+
+    assert job_menu(openai_client) == 'fresh menu'
+    assert list((tmp_path / 'data' / 'speculative').iterdir()) == []
+
+
+def test_precompute_skips_households_with_intake_and_busy_machine(openai_client, tmp_path):
+    write_intake(tmp_path / 'data' / 'a' / 'intake.json')
+    households = [{'id': 'a', 'intake_path': 'data/a/intake.json'}, {'id': 'b', 'intake_path': 'data/b/intake.json'}]
+
+    precomputer = MenuPrecomputer(deadline=RunDeadline(), openai_client=openai_client, week_start=WEEK,
+                                  max_load=0.5, load=lambda: 0.9)
+    assert precomputer.run(households) == {'a': 'skipped: busy', 'b': 'skipped: busy'}
+
+    precomputer.load = lambda: 0.1
+    assert precomputer.run(households) == {'a': 'intake', 'b': 'generated'}
@@ -0,0 +1,183 @@
+"""
+Tests for the tenant registry, sharding and the multi-tenant runner
+"""
+
+import time
+import multiprocessing
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+from scripts.deadline import RunDeadline
+from scripts.rate_limit import RateLimitedOpenAI, SharedRateLimiter, estimate_tokens
+from scripts.run_tenants import TenantRunner
+from scripts.tenants import Tenant, TenantRegistry, shard_tenants
+
+
+def make_tenant(tenant_id, token='NOTION_TOKEN', weight=1.0):
+    return Tenant(id=tenant_id, user_id=f"U-{tenant_id}", notion_token_env=token, notion_database_id=f"db-{tenant_id}",
+                  weight=weight)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_registry_load(tmp_path):
+    """Tenants are read from YAML with per-tenant data directories"""
+    path = tmp_path / 'tenants.yaml'
+    path.write_text(
+        "tenants:\n"
+        "  - {id: tanaka, user_id: U1, notion_database_id: db1, notion_token_env: NOTION_TOKEN_TANAKA}\n"
+        "  - {id: suzuki, user_id: U2, notion_database_id: db2, data_dir: /srv/suzuki}\n",
+        encoding='utf-8'
+    )
+    registry = TenantRegistry.load(str(path))
+
+    assert len(registry) == 2
+    assert str(registry['tanaka'].intake_path) == 'data/tenants/tanaka/intake.json'
+    assert str(registry['suzuki'].menu_path) == '/srv/suzuki/generated_menu.json'
+    assert [tenant.id for tenant in registry.select(['suzuki'])] == ['suzuki']
+    with pytest.raises(KeyError):
+        registry.select(['sato'])
+
+
+def test_registry_rejects_duplicates_and_bad_ids():
+    with pytest.raises(ValueError):
+        TenantRegistry([make_tenant('a'), make_tenant('a')])
+    with pytest.raises(ValueError):
+        make_tenant('../etc')
+
+
+def test_registry_requires_distinct_user_ids(tmp_path):
+    """Tenants without a user_id would share one household's history and cached menus"""
+    path = tmp_path / 'tenants.yaml'
+    path.write_text("tenants:\n"
+                    "  - {id: tanaka, notion_database_id: db1}\n"
+                    "  - {id: suzuki, notion_database_id: db2}\n", encoding='utf-8')
+    with pytest.raises(ValueError, match='user_id'):
+        TenantRegistry.load(str(path))
+
+    with pytest.raises(ValueError, match='share user ids: U1'):
+        TenantRegistry([Tenant(id='tanaka', user_id='U1', notion_database_id='db1'),
+                        Tenant(id='suzuki', user_id='U1', notion_database_id='db2')])
+
+
+def test_shard_keeps_token_together_and_balances():
+    """Tenants sharing a Notion token land in one shard; shards are balanced by weight"""
+    tenants = [make_tenant('a1', 'TOKEN_A'), make_tenant('a2', 'TOKEN_A'), make_tenant('b', 'TOKEN_B', weight=2),
+               make_tenant('c', 'TOKEN_C'), make_tenant('d', 'TOKEN_D')]
+    shards = shard_tenants(tenants, 2)
+
+    assert len(shards) == 2
+    assert sorted(tenant.id for shard in shards for tenant in shard) == ['a1', 'a2', 'b', 'c', 'd']
+    for shard in shards:
+        tokens = {tenant.notion_token_env for tenant in shard}
+        if 'TOKEN_A' in tokens:
+            assert {'a1', 'a2'} <= {tenant.id for tenant in shard}
+    assert sorted(sum(tenant.weight for tenant in shard) for shard in shards) == [3, 3]
+    assert len(shard_tenants(tenants[:2], 8)) == 1
+
+
+
+def test_shard_groups_variables_holding_the_same_token(monkeypatch):
+    monkeypatch.setenv('TOKEN_TANAKA', 'secret_same')
+    monkeypatch.setenv('TOKEN_SUZUKI', 'secret_same')
+    monkeypatch.setenv('TOKEN_SATO', 'secret_other')
+    tenants = [make_tenant('tanaka', 'TOKEN_TANAKA'), make_tenant('suzuki', 'TOKEN_SUZUKI'),
+               make_tenant('sato', 'TOKEN_SATO')]
+
+    shards = shard_tenants(tenants, 3)
+
+    assert sorted(sorted(tenant.id for tenant in shard) for shard in shards) == [['sato'], ['suzuki', 'tanaka']]
+
+def test_shared_limiter_waits_for_requests_and_tokens():
+    clock = FakeClock()
+    limiter = SharedRateLimiter(requests_per_minute=2, tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+
+    assert limiter.acquire(400) == 0
+    assert limiter.acquire(400) == 0
+    # Request bucket empty: one request refills in 30 seconds
+    assert limiter.acquire(100) == pytest.approx(30)
+    # 600 tokens left; the next request refills in 30 seconds, by then the tokens have too
+    assert limiter.acquire(900) == pytest.approx(30)
+    # Overestimated requests return their unused tokens
+    clock.now += 60
+    limiter.settle(900, 100)
+    assert limiter.acquire(1000) == 0
+
+
+def _drain(limiter, count):
+    for _ in range(count):
+        limiter.acquire(10)
+
+
+def test_shared_limiter_is_shared_across_processes():
+    limiter = SharedRateLimiter(requests_per_minute=1000, tokens_per_minute=100000,
+                                context=multiprocessing.get_context('fork'))
+    processes = [multiprocessing.get_context('fork').Process(target=_drain, args=(limiter, 50)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    # 100 requests were taken from the one budget (a little refill is allowed for elapsed time)
+    assert limiter._state[0] < 1000 - 90
+
+
+def test_rate_limited_openai_settles_actual_usage():
+    clock = FakeClock()
+    limiter = SharedRateLimiter(requests_per_minute=60, tokens_per_minute=10000, clock=clock, sleep=clock.sleep)
+    client = Mock()
+    client.chat.completions.create.return_value = SimpleNamespace(usage=SimpleNamespace(total_tokens=150))
+    request = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': 'x' * 500}], 'max_tokens': 2000}
+
+    RateLimitedOpenAI(client, limiter).chat.completions.create(**request)
+
+    assert estimate_tokens(request) == 2500
+    client.chat.completions.create.assert_called_once_with(**request)
+    assert limiter._state[1] == pytest.approx(10000 - 150)
+
+
+@patch('scripts.run_tenants.NotionMenuUpdater')
+@patch('scripts.run_tenants.MenuGenerator')
+def test_runner_uses_tenant_paths_and_one_client_per_token(mock_generator_class, mock_updater_class):
+    tenants = [make_tenant('a1', 'TOKEN_A'), make_tenant('a2', 'TOKEN_A'), make_tenant('b', 'TOKEN_B')]
+    mock_generator_class.return_value.save_menu_data.return_value = {'week_start': '2024-01-15'}
+    mock_updater_class.return_value.update_menu.side_effect = ['page-a1', 'page-a2', RuntimeError('Notion down')]
+    factory = Mock(side_effect=lambda tenant: f"client-{tenant.notion_token_env}")
+
+    results = TenantRunner(Mock(), factory, threads=1).run(tenants)
+
+    assert [(r.tenant_id, r.page_id, r.error) for r in results] == [
+        ('a1', 'page-a1', None), ('a2', 'page-a2', None), ('b', None, 'Notion down')]
+    assert factory.call_count == 2
+    generator_kwargs = mock_generator_class.call_args_list[0].kwargs
+    assert generator_kwargs['intake_path'] == 'data/tenants/a1/intake.json'
+    updater_kwargs = mock_updater_class.call_args_list[2].kwargs
+    assert updater_kwargs['notion_client'] == 'client-TOKEN_B'
+    assert updater_kwargs['database_id'] == 'db-b'
+    assert updater_kwargs['mirror_path'] == 'data/tenants/b/notion_mirror.sqlite3'
+
+
+
+@patch('scripts.run_tenants.NotionMenuUpdater')
+@patch('scripts.run_tenants.MenuGenerator')
+def test_tenant_budget_is_capped_by_run_deadline(mock_generator_class, mock_updater_class):
+    """A tenant never gets more time than the whole run has left"""
+    mock_generator_class.return_value.save_menu_data.return_value = {'week_start': '2024-01-15'}
+    run_deadline = RunDeadline.after(60)
+
+    TenantRunner(Mock(), Mock(), threads=1, budget=900, deadline=run_deadline).run([make_tenant('a')])
+    TenantRunner(Mock(), Mock(), threads=1, budget=10, deadline=run_deadline).run([make_tenant('b')])
+
+    first, second = [call.kwargs['deadline'] for call in mock_generator_class.call_args_list]
+    assert first.deadline_at == run_deadline.deadline_at
+    assert second.deadline_at < time.time() + 11